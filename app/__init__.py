@@ -1,26 +1,60 @@
+import os
+
 from flask import Flask
+from .commands import register_commands
 from .config import Config
 from .extensions import db, migrate, jwt
+from .utils.catalog_cache import catalog_cache
+from .utils.db_profile import configure_db_profile, init_db_profile
+from .utils.jobs import jobs
+from .utils.json_provider import init_json
+from .utils.metrics import metrics
+from .utils.order_codes import order_code_seq
+from .utils.passwords import password_hasher, HasherBusy
+from .utils.profiling import request_profiler
+from .utils.revocation import revocation_list
+from .utils.query_counter import init_query_counter
+from .utils.suggest import suggest_index
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    init_json(app)
+    if not app.config.get("UPLOAD_FOLDER"):
+        app.config["UPLOAD_FOLDER"] = os.path.join(app.root_path, "static", "uploads")
 
+    configure_db_profile(app)
     db.init_app(app)
+    init_db_profile(app, db)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    init_query_counter(app)
+    catalog_cache.init_app(app)
+    order_code_seq.init_app(app)
+    password_hasher.init_app(app)
+    jobs.init_app(app)
+    revocation_list.init_app(app, jwt)
+    metrics.init_app(app)
+    request_profiler.init_app(app)
 
     from .routes.auth import bp as auth_bp
     from .routes.products import bp as products_bp
     from .routes.cart import bp as cart_bp
     from .routes.orders import bp as orders_bp
     from .routes.admin import bp as admin_bp
+    from .routes.media import bp as media_bp
+    from .routes.metrics import bp as metrics_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(products_bp)
     app.register_blueprint(cart_bp)
     app.register_blueprint(orders_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(media_bp)
+    app.register_blueprint(metrics_bp)
+
+    suggest_index.init_app(app)
+    register_commands(app)
 
     @app.get("/")
     def home():
@@ -51,6 +85,10 @@ def create_app():
         </body>
         </html>
         """
+    @app.errorhandler(HasherBusy)
+    def hasher_busy(e):
+        return {"message": "Server busy, please retry"}, 503, {"Retry-After": "1"}
+
     @app.get("/health")
     def health():
         return {"status": "ok"}
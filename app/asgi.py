@@ -0,0 +1,304 @@
+"""
+Optional ASGI serving mode: `uvicorn asgi:app` (asgi.py sits next to run.py).
+
+The I/O-bound read endpoints run as native async handlers on an async
+SQLAlchemy engine (aiosqlite), so a request waiting on SQLite doesn't pin a
+worker thread:
+
+  GET /api/products, /api/products/search
+  GET /api/cart
+  GET /api/orders/list, /api/orders/<id>, /api/orders/track/<code>
+
+They build the same statements as the Flask views (app.utils.serializers),
+share the in-process catalog cache and ETags, and return the same JSON.
+Everything else goes to the regular Flask app through a2wsgi, which runs it
+on a pool of ASGI_WSGI_THREADS threads: auth, cart/order writes, admin,
+media and /metrics. The same happens when a fast-path request has a
+missing or invalid JWT, so Flask-JWT-Extended still writes those error
+responses. Tokens are decoded with the Flask app's JWT config and checked
+against the shared revocation list.
+
+The query budget, metrics and profiler hooks only see the requests that
+fall through to Flask.
+
+Needs the optional packages in requirements-async.txt.
+"""
+import re
+from urllib.parse import parse_qsl
+
+try:
+    from a2wsgi import WSGIMiddleware
+    from sqlalchemy.ext.asyncio import create_async_engine
+except ImportError as e:  # pragma: no cover - optional dependency
+    raise ImportError(f"ASGI mode needs the optional packages in requirements-async.txt: {e}") from e
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags
+
+from app.extensions import db
+from app.models import Order, Product
+from app.utils.catalog_cache import VERSION_SELECT as CATALOG_VERSION_SELECT, catalog_cache
+from app.utils.db_profile import READ_BIND, hook_pragmas
+from app.utils.pagination import (
+    PaginationError, parse_page_args, parse_limit, split_page,
+    encode_offset_cursor, decode_offset_cursor,
+)
+from app.utils.revocation import revocation_list
+from app.utils.search import SEARCH_IDS_SQL, build_match_query
+from app.utils.serializers import (
+    ORDER_COLS, attach_order_items, cart_row_dicts, cart_select, order_dict,
+    order_items_select, product_dicts, product_rows_select,
+)
+
+_POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle")
+
+
+class _Request:
+    __slots__ = ("scope", "args", "headers")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.args = MultiDict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+
+    @property
+    def if_none_match(self):
+        return parse_etags(self.headers.get("if-none-match"))
+
+    @property
+    def base_url(self):
+        """Same as Flask's request.url_root without the trailing slash."""
+        host = self.headers.get("host")
+        if not host:
+            server = self.scope.get("server") or ("localhost", 80)
+            host = f"{server[0]}:{server[1]}"
+        return f"{self.scope.get('scheme', 'http')}://{host}{self.scope.get('root_path', '')}".rstrip("/")
+
+
+class _Response:
+    __slots__ = ("status", "body", "headers")
+
+    def __init__(self, body, status=200, headers=None):
+        self.status = status
+        self.body = body
+        self.headers = [("content-type", "application/json"), ("content-length", str(len(body)))]
+        self.headers += list((headers or {}).items())
+
+    async def send(self, send):
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in self.headers]})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+class AsyncApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get("ASGI_WSGI_THREADS", 10))
+        self.engine = self._create_engine()
+        self.routes = [
+            ("/api/products", self.product_list),
+            ("/api/products/search", self.product_search),
+            ("/api/cart", self.get_cart),
+            ("/api/orders/list", self.my_orders),
+            (r"/api/orders/(?P<order_id>\d+)", self.get_my_order),
+            ("/api/orders/track/(?P<order_code>[^/]+)", self.track_order),
+        ]
+        self.routes = [(re.compile(f"^{path}$"), handler) for path, handler in self.routes]
+
+    def _create_engine(self):
+        app = self.flask_app
+        with app.app_context():
+            read_only = READ_BIND in db.engines
+            sync_engine = db.engines[READ_BIND] if read_only else db.engine
+        options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {}
+        kwargs = {k: options[k] for k in _POOL_OPTIONS if k in options}
+        timeout = (options.get("connect_args") or {}).get("timeout")
+        if timeout is not None:
+            kwargs["connect_args"] = {"timeout": timeout}
+        engine = create_async_engine(sync_engine.url.set(drivername="sqlite+aiosqlite"), **kwargs)
+        hook_pragmas(app, engine.sync_engine, read_only=read_only)
+        return engine
+
+    # ---------- ASGI ----------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http" and scope["method"] == "GET":
+            for pattern, handler in self.routes:
+                m = pattern.match(scope["path"])
+                if m:
+                    response = await handler(_Request(scope), **m.groupdict())
+                    if response is not None:
+                        return await response.send(send)
+                    break
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ---------- helpers ----------
+    def _json(self, obj, status=200, headers=None):
+        return _Response(self.flask_app.json.response(obj).get_data(), status, headers)
+
+    def _identity(self, req):
+        """User id from a valid access token, or None to let Flask answer the request."""
+        auth = req.headers.get("authorization", "")
+        if not auth.startswith("Bearer "):
+            return None
+        with self.flask_app.app_context():
+            try:
+                claims = decode_token(auth[7:])
+            except Exception:
+                return None
+            identity_claim = self.flask_app.config.get("JWT_IDENTITY_CLAIM", "sub")
+        if claims.get("type") != "access" or revocation_list.is_revoked(claims["jti"]):
+            return None
+        return int(claims[identity_claim])
+
+    async def _catalog_token(self):
+        rows = await self._rows(CATALOG_VERSION_SELECT)
+        return catalog_cache.observe(rows[0][0] if rows else 0)
+
+    async def _rows(self, stmt, params=None):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(stmt, params)).all()
+
+    @staticmethod
+    def _cached(body, etag, status=200):
+        return _Response(body, status, {"etag": f'"{etag}"', "cache-control": "no-cache"})
+
+    # ---------- products ----------
+    async def product_list(self, req):
+        try:
+            limit, after_id = parse_page_args(req.args)
+        except PaginationError as e:
+            return self._json({"message": str(e)}, 400)
+
+        category_id = req.args.get("category_id")
+        if category_id:
+            if not category_id.isdigit():
+                return None  # Flask's error response
+            category_id = int(category_id)
+
+        token = await self._catalog_token()
+        etag = catalog_cache.etag_for(token)
+        if etag in req.if_none_match:
+            return self._cached(b"", etag, 304)
+
+        base_url = req.base_url
+        cache_key = ("products", base_url, category_id, limit, after_id)
+        body = catalog_cache.get(cache_key, token)
+        if body is not None:
+            return self._cached(body, etag)
+
+        stmt = product_rows_select()
+        if category_id:
+            stmt = stmt.where(Product.category_id == category_id)
+        if after_id is not None:
+            stmt = stmt.where(Product.id < after_id)
+        rows = await self._rows(stmt.order_by(Product.id.desc()).limit(limit + 1))
+        products, next_cursor = split_page(rows, limit)
+
+        body = self._json({"items": product_dicts(products, base_url), "next_cursor": next_cursor}).body
+        catalog_cache.set(cache_key, body, token)
+        return self._cached(body, etag)
+
+    async def product_search(self, req):
+        match = build_match_query(req.args.get("q", ""))
+        if not match:
+            return self._json({"message": "q required"}, 400)
+        try:
+            limit = parse_limit(req.args)
+            after = req.args.get("after")
+            offset = decode_offset_cursor(after) if after else 0
+        except PaginationError as e:
+            return self._json({"message": str(e)}, 400)
+
+        token = await self._catalog_token()
+        etag = catalog_cache.etag_for(token)
+        if etag in req.if_none_match:
+            return self._cached(b"", etag, 304)
+
+        base_url = req.base_url
+        cache_key = ("search", base_url, match, limit, offset)
+        body = catalog_cache.get(cache_key, token)
+        if body is not None:
+            return self._cached(body, etag)
+
+        ids = [r[0] for r in await self._rows(SEARCH_IDS_SQL, {"match": match, "limit": limit + 1, "offset": offset})]
+        next_cursor = None
+        if len(ids) > limit:
+            ids = ids[:limit]
+            next_cursor = encode_offset_cursor(offset + limit)
+
+        by_id = {}
+        if ids:
+            by_id = {p.id: p for p in await self._rows(product_rows_select().where(Product.id.in_(ids)))}
+        products = [by_id[i] for i in ids if i in by_id]
+
+        body = self._json({"items": product_dicts(products, base_url), "next_cursor": next_cursor}).body
+        catalog_cache.set(cache_key, body, token)
+        return self._cached(body, etag)
+
+    # ---------- cart / orders ----------
+    async def get_cart(self, req):
+        user_id = self._identity(req)
+        if user_id is None:
+            return None
+        return self._json(cart_row_dicts(await self._rows(cart_select(user_id))))
+
+    async def _order_dicts(self, stmt):
+        orders = [order_dict(r) for r in await self._rows(stmt)]
+        if orders:
+            attach_order_items(orders, await self._rows(order_items_select([o["id"] for o in orders])))
+        return orders
+
+    async def my_orders(self, req):
+        user_id = self._identity(req)
+        if user_id is None:
+            return None
+        stmt = select(*ORDER_COLS).where(Order.user_id == user_id).order_by(Order.id.desc())
+        return self._json(await self._order_dicts(stmt))
+
+    async def get_my_order(self, req, order_id):
+        user_id = self._identity(req)
+        if user_id is None:
+            return None
+        orders = await self._order_dicts(
+            select(*ORDER_COLS).where(Order.id == int(order_id), Order.user_id == user_id))
+        if not orders:
+            return self._json({"message": "Order not found"}, 404)
+        return self._json(orders[0])
+
+    async def track_order(self, req, order_code):
+        user_id = self._identity(req)
+        if user_id is None:
+            return None
+        rows = await self._rows(
+            select(Order.order_code, Order.status, Order.total, Order.created_at)
+            .where(Order.order_code == order_code, Order.user_id == user_id))
+        if not rows:
+            return self._json({"message": "Order not found"}, 404)
+        o = rows[0]
+        return self._json({
+            "order_code": o.order_code,
+            "status": o.status,
+            "total": o.total,
+            "created_at": o.created_at.isoformat()
+        })
+
+
+def create_asgi_app(flask_app=None):
+    if flask_app is None:
+        from app import create_app
+        flask_app = create_app()
+    return AsyncApp(flask_app)
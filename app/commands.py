@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import signal
+import time
+
+import click
+
+from app.extensions import db
+from app.seed import seed
+from app.utils import analytics, datagen, loadbench, microbench, prefork
+from app.utils.catalog_cache import invalidate_catalog
+from app.utils.jobs import JobWorker, jobs
+from app.utils.query_plans import check_query_plans
+from app.utils.suggest import suggest_index
+
+
+def register_commands(app):
+    @app.cli.command("analytics-backfill")
+    def analytics_backfill():
+        """Rebuild the daily sales rollups from order history."""
+        analytics.backfill()
+        click.echo("Sales rollups rebuilt.")
+
+    @app.cli.command("seed")
+    def seed_cmd():
+        """Admin account plus a couple of demo categories/products."""
+        seed(app)
+        click.echo("Seeded.")
+
+    @app.cli.command("seed-bulk")
+    @click.option("--users", default=10000, show_default=True)
+    @click.option("--products", default=1000, show_default=True)
+    @click.option("--orders", default=50000, show_default=True)
+    @click.option("--categories", default=20, show_default=True)
+    @click.option("--carts", type=int, default=None, help="Users with an open cart [default: users/20].")
+    @click.option("--days", default=365, show_default=True, help="Order history length.")
+    @click.option("--end-date", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Last order day [default: today].")
+    @click.option("--seed", "rng_seed", default=1, show_default=True, help="RNG seed.")
+    @click.option("--batch-size", default=50000, show_default=True, help="Rows per INSERT batch/transaction.")
+    def seed_bulk(users, products, orders, categories, carts, days, end_date, rng_seed, batch_size):
+        """Deterministic production-scale synthetic data (appends to the DB)."""
+        seed(app)
+        t0 = time.perf_counter()
+        stats = datagen.generate(users=users, products=products, orders=orders, categories=categories,
+                                 carts=carts, days=days, seed=rng_seed,
+                                 end_date=end_date.date() if end_date else None,
+                                 batch_size=batch_size, progress=click.echo)
+        suggest_index.bump_version()  # running servers pick up the new products
+        invalidate_catalog()
+        db.session.commit()
+        summary = ", ".join(f"{n:,} {name}" for name, n in stats.items())
+        click.echo(f"Inserted {summary} in {time.perf_counter() - t0:.1f}s "
+                   f"(synthetic users log in with password '{datagen.DEFAULT_PASSWORD}').")
+
+    @app.cli.command("check-query-plans")
+    @click.option("-v", "--verbose", is_flag=True, help="Print every plan, not just regressions.")
+    def check_query_plans_cmd(verbose):
+        """EXPLAIN the SQL hot endpoints issue; fail on full table scans."""
+        reports = check_query_plans(app)
+        failed = [r for r in reports if r.scans]
+        for r in reports:
+            if verbose or r.scans:
+                click.echo(f"[{'SCAN' if r.scans else 'ok'}] {r.label}: {' '.join(r.sql.split())[:160]}")
+                for detail in r.plan:
+                    click.echo(f"    {detail}")
+        click.echo(f"{len(reports)} statements checked, {len(failed)} with full table scans.")
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command("bench")
+    @click.option("--collection", default=None, help="Postman collection (default: the one in the repo root).")
+    @click.option("--url", default=None, help="Benchmark a running server instead of starting one.")
+    @click.option("--port", default=5055, show_default=True, help="Port for the locally started server.")
+    @click.option("--server", "server_mode", type=click.Choice(loadbench.SERVERS), default="wsgi", show_default=True,
+                  help="Serving mode of the locally started server.")
+    @click.option("-c", "--concurrency", default=8, show_default=True, help="Virtual users.")
+    @click.option("-d", "--duration", default=30.0, show_default=True, help="Measured seconds.")
+    @click.option("--warmup", default=5.0, show_default=True, help="Unmeasured seconds before recording.")
+    @click.option("--weights", "weights_file", type=click.Path(exists=True), help="JSON {step label: weight}.")
+    @click.option("--seed", default=1, show_default=True, help="RNG seed for the request mix.")
+    @click.option("-o", "--out", default="bench-result.json", show_default=True, help="Result file.")
+    @click.option("--baseline", type=click.Path(exists=True), help="Earlier result to compare against.")
+    @click.option("--tolerance", default=0.2, show_default=True, help="Allowed p95/rps regression (0.2 = 20%).")
+    def bench(collection, url, port, server_mode, concurrency, duration, warmup, weights_file, seed, out, baseline, tolerance):
+        """Weighted load test from the Postman collection; fails on regressions."""
+        collection = collection or os.path.join(os.path.dirname(app.root_path), "Y4S1.postman_collection_v2.json")
+        weights = None
+        if weights_file:
+            with open(weights_file, encoding="utf-8") as f:
+                weights = json.load(f)
+        steps, skipped = loadbench.load_scenario(app, collection, weights)
+        for line in skipped:
+            click.echo(f"skipped (no matching route): {line}", err=True)
+
+        server = None
+        if url is None:
+            server = loadbench.start_local_server(app, port, server=server_mode)
+            url = f"http://127.0.0.1:{port}"
+        try:
+            runner = loadbench.LoadRunner(app, url, concurrency=concurrency, duration=duration,
+                                          warmup=warmup, seed=seed)
+            result = runner.run(steps)
+        except loadbench.BenchError as e:
+            raise click.ClickException(str(e))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        click.echo(loadbench.format_table(result))
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        click.echo(f"Results written to {out}")
+
+        if baseline:
+            with open(baseline, encoding="utf-8") as f:
+                problems = loadbench.compare(result, json.load(f), tolerance)
+            for p in problems:
+                click.echo(f"REGRESSION {p}", err=True)
+            if problems:
+                raise SystemExit(1)
+            click.echo("No regressions against baseline.")
+
+    @app.cli.command("bench-suggest")
+    @click.option("-n", "--requests", default=20000, show_default=True, help="Lookups to time.")
+    @click.option("--max-prefix", default=5, show_default=True, help="Longest random prefix, in characters.")
+    @click.option("--limit", default=10, show_default=True, help="Suggestions per lookup.")
+    @click.option("--seed", default=1, show_default=True, help="RNG seed for the prefixes.")
+    def bench_suggest(requests, max_prefix, limit, seed):
+        """Suggest index build time and lookup p50/p95/p99 on the current catalog."""
+        try:
+            r = microbench.suggest_latency(app, requests=requests, max_prefix=max_prefix, limit=limit, seed=seed)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"{r['products']:,} products, {r['keys']:,} keys: build {r['build_ms']} ms, "
+                   f"upsert {r['upsert_ms']} ms, remove {r['remove_ms']} ms")
+        for label in ("index", "endpoint"):
+            s = r[label]
+            click.echo(f"{label:<9} n={s['n']:<6} p50 {s['p50_us']:>8} us  p95 {s['p95_us']:>8} us  "
+                       f"p99 {s['p99_us']:>8} us  max {s['max_us']:>9} us")
+
+    @app.cli.command("bench-passwords")
+    @click.option("-d", "--duration", default=10.0, show_default=True, help="Seconds per pass.")
+    @click.option("-c", "--concurrency", type=int, default=None, help="Calling threads [default: 2 x pool workers].")
+    @click.option("--email", default="admin@ecom.com", show_default=True,
+                  help="Account for the login pass; empty to skip it.")
+    @click.option("--password", default="admin123", show_default=True)
+    def bench_passwords(duration, concurrency, email, password):
+        """Password verifications and logins per second (and per core) with the configured hash method."""
+        try:
+            r = microbench.password_throughput(app, duration=duration, concurrency=concurrency,
+                                               email=email or None, password=password)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"{r['method']}: pool of {r['pool_workers']} on {r['cores']} cores, "
+                   f"{r['concurrency']} callers")
+        for label in ("verify", "login"):
+            if label in r:
+                s = r[label]
+                click.echo(f"{label:<7} {s['per_s']:>8}/s  {s['per_core_s']:>7}/s per core  "
+                           f"p50 {s['p50_us'] / 1000:.1f} ms  p99 {s['p99_us'] / 1000:.1f} ms")
+
+    @app.cli.command("serve")
+    @click.option("-b", "--host", default="127.0.0.1", show_default=True, help="Interface to bind.")
+    @click.option("-p", "--port", default=5000, show_default=True, help="Port to bind.")
+    @click.option("-w", "--workers", default=os.cpu_count() or 2, show_default=True, help="Worker processes.")
+    @click.option("--max-requests", default=0, show_default=True,
+                  help="Recycle a worker after this many requests (0 = never).")
+    @click.option("--max-requests-jitter", default=0, show_default=True,
+                  help="Random extra requests per worker so they don't all recycle at once.")
+    @click.option("--max-memory", default=0, show_default=True,
+                  help="Recycle a worker whose RSS passes this many MB (0 = no limit).")
+    @click.option("--timeout", default=30.0, show_default=True,
+                  help="Kill a worker whose heartbeat is this many seconds late.")
+    @click.option("--graceful-timeout", default=30.0, show_default=True,
+                  help="Seconds a stopping worker gets to finish in-flight requests.")
+    @click.option("--status-file", default=None, help="Keep per-worker status as JSON in this file.")
+    @click.option("--access-log", is_flag=True, help="Log every request.")
+    def serve(host, port, workers, max_requests, max_requests_jitter, max_memory, timeout,
+              graceful_timeout, status_file, access_log):
+        """Pre-fork server: preloaded app, N workers, recycling, HUP = graceful reload."""
+        if app.debug:
+            click.echo("warning: debug mode is on; unset FLASK_DEBUG in production", err=True)
+        logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(process)d] %(message)s")
+        if not access_log:
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        if not suggest_index.ready:
+            suggest_index.preload(app)  # once here; forked workers inherit it
+        if jobs.tasks and not jobs.is_eager() and not jobs.live_workers():
+            click.echo("warning: no `flask worker` is running; background jobs "
+                       f"({', '.join(sorted(jobs.tasks))}) will wait in the queue until one is started", err=True)
+        prefork.PreforkServer(
+            app, host=host, port=port, workers=workers, max_requests=max_requests,
+            max_requests_jitter=max_requests_jitter, max_memory_mb=max_memory, timeout=timeout,
+            graceful_timeout=graceful_timeout, status_file=status_file,
+        ).run()
+
+    @app.cli.command("worker")
+    @click.option("-t", "--threads", default=4, show_default=True, help="Jobs run at once.")
+    @click.option("--batch", default=10, show_default=True, help="Max jobs claimed per round trip.")
+    @click.option("--visibility", default=300.0, show_default=True,
+                  help="Lease seconds; an unfinished job is retried by another worker after this.")
+    @click.option("--poll", default=1.0, show_default=True, help="Seconds between polls when idle.")
+    @click.option("--once", is_flag=True, help="Exit when no job is due (cron / tests).")
+    def worker(threads, batch, visibility, poll, once):
+        """Run queued background jobs until SIGTERM/Ctrl-C."""
+        logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(process)d] %(message)s")
+        runner = JobWorker(app, jobs, threads=threads, batch=batch, visibility=visibility, poll_interval=poll)
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: runner.stop())
+        click.echo(f"worker {runner.worker_id}: {threads} threads, jobs: {', '.join(sorted(jobs.tasks)) or '-'}")
+        processed = runner.run(once=once)
+        click.echo("stopped: " + ", ".join(f"{n} {status}" for status, n in processed.items()))
+
+    @app.cli.command("jobs-status")
+    @click.option("--requeue-dead", is_flag=True, help="Put dead-lettered jobs back in the queue.")
+    @click.option("--name", default=None, help="Only requeue jobs with this name.")
+    def jobs_status(requeue_dead, name):
+        """Job counts by name and status; optionally retry the dead letters."""
+        if requeue_dead:
+            click.echo(f"requeued {jobs.requeue_dead(name)} dead jobs")
+        for row in jobs.stats():
+            click.echo(f"{row['name']:<30} {row['status']:<8} {row['count']:>8}  oldest run_at {row['oldest_run_at']}")
+        workers = jobs.live_workers()
+        for w in workers:
+            click.echo(f"worker {w.worker_id}: up since {w.started_at}, last seen {w.seen_at}")
+        if not workers:
+            click.echo("no live workers (start one with `flask worker`)")
@@ -4,5 +4,70 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///ecom.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # "production": WAL + tuned pragmas + explicit pool (see app/utils/db_profile.py)
+    DB_PROFILE = os.getenv("DB_PROFILE", "default")
+    # optional read engine for GET/HEAD requests, e.g. the same SQLite file
+    # read-only: sqlite:///file:/abs/path/ecom.db?mode=ro&uri=true
+    READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+    # orjson-backed JSON provider when orjson is installed
+    FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
 
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-jwt-secret")
+    # seconds between pulls of tokens revoked by other workers
+    JWT_REVOCATION_REFRESH = float(os.getenv("JWT_REVOCATION_REFRESH", 5))
+
+    # werkzeug method string: "scrypt:N:r:p" or "pbkdf2:sha256:iterations".
+    # Existing hashes made with other params are upgraded on next login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 0)) or os.cpu_count()
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 0)) or None
+    PASSWORD_HASH_WAIT_TIMEOUT = float(os.getenv("PASSWORD_HASH_WAIT_TIMEOUT", 2.0))
+
+    # in-process cache of serialized /api/products responses
+    CATALOG_CACHE_MAX_BYTES = int(os.getenv("CATALOG_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+    # build the /api/products/suggest prefix index inside create_app instead of
+    # on the first suggest request (`flask serve` builds it before forking)
+    SUGGEST_INDEX_PRELOAD = os.getenv("SUGGEST_INDEX_PRELOAD", "0") == "1"
+    # seconds between checks for product writes made by other workers
+    SUGGEST_INDEX_REFRESH = float(os.getenv("SUGGEST_INDEX_REFRESH", 5))
+
+    # rows per INSERT/commit in POST /api/admin/products/import
+    PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", 1000))
+
+    # order codes reserved per DB round trip (per process)
+    ORDER_CODE_BLOCK_SIZE = int(os.getenv("ORDER_CODE_BLOCK_SIZE", 100))
+
+    # product images; defaults to app/static/uploads (served at /media/<name>)
+    UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER")
+    # behind nginx: internal location that maps to UPLOAD_FOLDER, e.g. "/_uploads"
+    # (X-Accel-Redirect); for Apache/lighttpd set USE_X_SENDFILE=1 instead
+    IMAGE_ACCEL_REDIRECT_PREFIX = os.getenv("IMAGE_ACCEL_REDIRECT_PREFIX", "")
+    USE_X_SENDFILE = os.getenv("USE_X_SENDFILE", "0") == "1"
+
+    # /metrics: admin JWT or this static bearer token (for the Prometheus scraper)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # shared dir for per-process metric files when running several workers
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+
+    # per-request profiles (X-Profile header from admins, or random sampling);
+    # defaults to <instance>/profiles
+    PROFILE_DIR = os.getenv("PROFILE_DIR")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.001))
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 200))
+
+    # asgi.py: threads running the Flask (WSGI) routes that have no async handler
+    ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 10))
+
+    # durable job queue (app/utils/jobs.py), run by `flask worker` next to
+    # `flask serve`; JOBS_EAGER=1 runs jobs in-process after the commit and the
+    # response instead (no worker needed), unset = only in debug/testing mode
+    JOBS_EAGER = {"1": True, "0": False}.get(os.getenv("JOBS_EAGER", ""))
+    JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+    # retry delay: JOBS_BACKOFF * 2^(attempt-1) seconds, capped at JOBS_BACKOFF_MAX
+    JOBS_BACKOFF = float(os.getenv("JOBS_BACKOFF", 10))
+    JOBS_BACKOFF_MAX = float(os.getenv("JOBS_BACKOFF_MAX", 3600))
+    # seconds finished jobs are kept before the worker prunes them
+    JOBS_KEEP_DONE = float(os.getenv("JOBS_KEEP_DONE", 86400))
@@ -1,6 +1,6 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from .extensions import db
+from .utils.passwords import password_hasher
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(120), nullable=False)
@@ -11,10 +11,13 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password: str):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        return password_hasher.needs_rehash(self.password_hash)
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -25,15 +28,18 @@ class Product(db.Model):
     name = db.Column(db.String(140), nullable=False)
     description = db.Column(db.Text, default="")
     price = db.Column(db.Float, nullable=False)
-    stock = db.Column(db.Integer, default=0)
+    stock = db.Column(db.Integer, default=0, index=True)
     image_url = db.Column(db.String(255), default="")
-    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), nullable=False, index=True)
 
     category = db.relationship("Category", backref="products")
 
 class CartItem(db.Model):
+    # one row per product in a cart; add_to_cart upserts against it
+    __table_args__ = (db.Index("ix_cart_item_user_id_product_id", "user_id", "product_id", unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
     qty = db.Column(db.Integer, default=1)
 
@@ -41,22 +47,81 @@ class CartItem(db.Model):
     product = db.relationship("Product")
 
 class Order(db.Model):
+    __table_args__ = (db.Index("ix_order_status_created_at", "status", "created_at"),)
+
     id = db.Column(db.Integer, primary_key=True)
     order_code = db.Column(db.String(30), unique=True, nullable=False, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     status = db.Column(db.String(30), default="pending")  # pending/paid/shipped/delivered/canceled
     total = db.Column(db.Float, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     user = db.relationship("User", backref="orders")
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False, index=True)
-    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False, index=True)
     name_snapshot = db.Column(db.String(140), nullable=False)
     price_snapshot = db.Column(db.Float, nullable=False)
     qty = db.Column(db.Integer, nullable=False)
 
     order = db.relationship("Order", backref="items")
     product = db.relationship("Product")
+
+class CodeSequence(db.Model):
+    # named counters for block-allocated order codes (app/utils/order_codes.py)
+    name = db.Column(db.String(40), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+
+class RevokedToken(db.Model):
+    # logged-out JWTs; served from memory by app/utils/revocation.py
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class DailySales(db.Model):
+    # per-day, per-status order rollup, kept current by app/utils/analytics.py
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(30), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class DailyProductSales(db.Model):
+    # per-day units/revenue per product, canceled orders excluded
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class Job(db.Model):
+    # durable background jobs, claimed and run by `flask worker` (app/utils/jobs.py)
+    __table_args__ = (db.Index("ix_job_status_run_at", "status", "run_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    # queued -> running -> done, or back to queued (retry) / dead (dead letter)
+    status = db.Column(db.String(10), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    # queued: not before this time; running: lease expiry, then another worker may take it
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class WorkerHeartbeat(db.Model):
+    # one row per running `flask worker`, refreshed while it polls; lets the
+    # web processes notice queued jobs that nobody is going to run
+    worker_id = db.Column(db.String(64), primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class CacheVersion(db.Model):
+    # version counters of in-process caches shared by every worker: a write
+    # bumps the row in its own transaction, other processes poll it and
+    # rebuild (app/utils/suggest.py, app/utils/catalog_cache.py)
+    name = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
@@ -1,12 +1,21 @@
-import os
+import csv
+from datetime import date
 from sqlite3 import IntegrityError
-from uuid import uuid4
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required
-from werkzeug.utils import secure_filename
+from sqlalchemy import insert, select
 
+from app.utils import analytics
+from app.utils.catalog_cache import invalidate_catalog
 from app.utils.decorators import admin_required
+from app.utils.images import save_product_image
+from app.utils.suggest import suggest_index
+from app.utils.inventory import restore_order_stock, reserve_order_stock
+from app.utils.profiling import request_profiler, to_collapsed, to_speedscope
+from app.utils.product_io import RowError, detect_format, iter_rows, validate_row, export_chunks
+from app.utils.query_counter import query_budget
+from app.utils.serializers import ORDER_COLS, order_dicts, user_dicts
 from app.extensions import db
 from app.models import User, Category, Product, Order
 
@@ -41,18 +50,9 @@ def create_product():
     if not name or price is None or stock is None or category_id is None:
         return jsonify({"message": "name, price, stock, category_id required"}), 400
 
-    # handle file upload if provided
+    # handle file upload if provided (stored once per content hash)
     if image_file:
-        upload_dir = os.path.join(current_app.root_path, "static", "uploads")
-        os.makedirs(upload_dir, exist_ok=True)
-
-        filename = secure_filename(image_file.filename)
-        ext = os.path.splitext(filename)[1].lower() or ".jpg"
-        new_name = f"{uuid4().hex}{ext}"
-        save_path = os.path.join(upload_dir, new_name)
-
-        image_file.save(save_path)
-        image_url = f"/static/uploads/{new_name}"
+        image_url = save_product_image(image_file)
 
     p = Product(
         name=name,
@@ -63,7 +63,10 @@ def create_product():
         category_id=int(category_id)
     )
     db.session.add(p)
+    version = suggest_index.bump_version()
+    invalidate_catalog()
     db.session.commit()
+    suggest_index.upsert(p.id, p.name, version=version)
 
     return jsonify({"message": "Product created", "id": p.id, "image_url": p.image_url}), 201
 
@@ -106,27 +109,16 @@ def update_product(pid):
     if category_id is not None:
         p.category_id = int(category_id)
 
-    # file upload (same folder as create)
+    # file upload (same storage as create)
     if image_file:
-        import os
-        from uuid import uuid4
-        from werkzeug.utils import secure_filename
-        from flask import current_app
-
-        upload_dir = os.path.join(current_app.root_path, "static", "uploads")
-        os.makedirs(upload_dir, exist_ok=True)
-
-        filename = secure_filename(image_file.filename)
-        ext = os.path.splitext(filename)[1].lower() or ".jpg"
-        new_name = f"{uuid4().hex}{ext}"
-        save_path = os.path.join(upload_dir, new_name)
-
-        image_file.save(save_path)
-        p.image_url = f"/static/uploads/{new_name}"
+        p.image_url = save_product_image(image_file)
     elif image_url is not None:
         p.image_url = (image_url or "").strip()
 
+    version = suggest_index.bump_version()
+    invalidate_catalog()
     db.session.commit()
+    suggest_index.upsert(p.id, p.name, version=version)
     return jsonify({"message": "Product updated", "id": p.id, "image_url": p.image_url}), 200
 
 @bp.delete("/products/<int:pid>")
@@ -137,18 +129,102 @@ def delete_product(pid):
     if not p:
         return jsonify({"message": "Product not found"}), 404
     db.session.delete(p)
+    version = suggest_index.bump_version()
+    invalidate_catalog()
     db.session.commit()
+    suggest_index.remove(pid, version=version)
     return jsonify({"message": "Product deleted"}), 200
 
+# ---------- Bulk product import / export ----------
+MAX_REPORTED_ERRORS = 1000
+
+@bp.post("/products/import")
+@jwt_required()
+@admin_required
+def import_products():
+    fmt = detect_format(request.content_type, request.args.get("format"))
+    if not fmt:
+        return jsonify({"message": "send text/csv or application/x-ndjson"}), 415
+
+    chunk_size = current_app.config["PRODUCT_IMPORT_CHUNK_SIZE"]
+    category_ids = {cid for (cid,) in db.session.query(Category.id)}
+    inserted, error_count, errors, batch = 0, 0, [], []
+    row_no, stream_error = 0, None
+
+    def flush():
+        # one multi-row INSERT and one commit per chunk
+        db.session.execute(insert(Product), batch)
+        suggest_index.bump_version()
+        invalidate_catalog()
+        db.session.commit()
+
+    try:
+        for row_no, row in iter_rows(request.stream, fmt):
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                batch.append(validate_row(row, category_ids))
+            except RowError as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"row": row_no, "error": str(e)})
+                continue
+            if len(batch) >= chunk_size:
+                flush()
+                inserted += len(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # the body can't be read past this point; keep the valid rows before it,
+        # so a client can resend from `failed_at_row`
+        stream_error = "body is not valid UTF-8" if isinstance(e, UnicodeDecodeError) else f"malformed CSV: {e}"
+    if batch:
+        flush()
+        inserted += len(batch)
+
+    if inserted:
+        suggest_index.rebuild()
+
+    if stream_error:
+        error_count += 1
+        errors.append({"row": row_no + 1, "error": stream_error})
+        return jsonify({
+            "message": f"Import stopped: {stream_error}",
+            "inserted": inserted,
+            "failed_at_row": row_no + 1,
+            "error_count": error_count,
+            "errors": errors
+        }), 400
+
+    return jsonify({
+        "message": "Import finished",
+        "inserted": inserted,
+        "error_count": error_count,
+        "errors": errors
+    }), 200
+
+@bp.get("/products/export")
+@jwt_required()
+@admin_required
+def export_products():
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"message": "format must be csv/ndjson"}), 400
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    chunks = export_chunks(db.session, Product.__table__, fmt)
+    return current_app.response_class(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=products.{fmt}"}
+    )
+
 # ---------- Customers / Users ----------
 @bp.get("/users")
+@query_budget(1)
 @jwt_required()
 @admin_required
 def list_users():
-    users = User.query.order_by(User.id.desc()).all()
-    return jsonify([{
-        "id": u.id, "full_name": u.full_name, "email": u.email, "role": u.role, "created_at": u.created_at.isoformat()
-    } for u in users])
+    return jsonify(user_dicts())
 
 @bp.post("/users")
 @jwt_required()
@@ -207,6 +283,7 @@ def delete_user(user_id):
 
 # ---------- Category CRUD ----------
 @bp.get("/categories")
+@query_budget(1)
 @jwt_required()
 @admin_required
 def list_categories():
@@ -239,6 +316,7 @@ def create_category():
         return jsonify({"message": "Category exists"}), 409
     c = Category(name=name)
     db.session.add(c)
+    invalidate_catalog()
     db.session.commit()
     return jsonify({"message": "Category created", "id": c.id}), 201
 
@@ -262,6 +340,7 @@ def update_category(cat_id):
         return jsonify({"message": "Category exists"}), 409
 
     c.name = name
+    invalidate_catalog()
     db.session.commit()
 
     return jsonify({"message": "Category updated", "id": c.id, "name": c.name}), 200
@@ -283,49 +362,55 @@ def delete_category(cat_id):
 
     try:
         db.session.delete(c)
+        invalidate_catalog()
         db.session.commit()
         return jsonify({"message": "Category deleted"}), 200
     except IntegrityError:
         db.session.rollback()
         return jsonify({"message": "Cannot delete category (used by other records)"}), 400
 
+# ---------- Analytics ----------
+@bp.get("/analytics")
+@query_budget(4)
+@jwt_required()
+@admin_required
+def sales_analytics():
+    try:
+        start, end = analytics.default_range()
+        if request.args.get("from"):
+            start = date.fromisoformat(request.args["from"])
+        if request.args.get("to"):
+            end = date.fromisoformat(request.args["to"])
+        top = int(request.args.get("top", 10))
+        low_stock = int(request.args.get("low_stock", 5))
+    except ValueError:
+        return jsonify({"message": "from/to must be YYYY-MM-DD, top/low_stock integers"}), 400
+    if start > end:
+        return jsonify({"message": "from must be before to"}), 400
+    if not 1 <= top <= 100:  # goes into LIMIT, where SQLite reads a negative value as no limit
+        return jsonify({"message": "top must be between 1 and 100"}), 400
+
+    return jsonify(analytics.summary(start, end, top=top, low_stock=low_stock)), 200
+
 # ---------- Order management ----------
 @bp.get("/orders")
+@query_budget(1)
 @jwt_required()
 @admin_required
 def all_orders():
-    orders = Order.query.order_by(Order.id.desc()).all()
-    return jsonify([{
-        "id": o.id,
-        "order_code": o.order_code,
-        "customer_id": o.user_id,
-        "status": o.status,
-        "total": o.total,
-        "created_at": o.created_at.isoformat()
-    } for o in orders])
+    stmt = select(*ORDER_COLS).order_by(Order.id.desc())
+    return jsonify(order_dicts(stmt, with_customer=True))
 
 @bp.get("/orders/<int:oid>")
+@query_budget(2)
 @jwt_required()
 @admin_required
 def admin_get_order(oid):
-    o = Order.query.get(oid)
-    if not o:
+    orders = order_dicts(select(*ORDER_COLS).where(Order.id == oid), with_customer=True, with_items=True)
+    if not orders:
         return jsonify({"message": "Order not found"}), 404
 
-    return jsonify({
-        "id": o.id,
-        "order_code": o.order_code,
-        "customer_id": o.user_id,
-        "status": o.status,
-        "total": o.total,
-        "created_at": o.created_at.isoformat(),
-        "items": [{
-            "product_id": it.product_id,
-            "name": it.name_snapshot,
-            "price": it.price_snapshot,
-            "qty": it.qty
-        } for it in o.items]
-    }), 200
+    return jsonify(orders[0]), 200
 
 @bp.put("/orders/<int:oid>/status")
 @jwt_required()
@@ -339,9 +424,51 @@ def update_order_status(oid):
     allowed = ["pending", "paid", "shipped", "delivered", "canceled"]
     if status not in allowed:
         return jsonify({"message": f"status must be one of {allowed}"}), 400
+
+    # keep stock in step with cancellation (checkout already decremented it);
+    # once shipped the goods are gone, so there is nothing to put back
+    if status == "canceled" and o.status != "canceled":
+        if o.status not in ("pending", "paid"):
+            return jsonify({"message": f"Cannot cancel a {o.status} order"}), 409
+        restore_order_stock(o.id)
+    elif o.status == "canceled" and status != "canceled":
+        if not reserve_order_stock(o.id):
+            db.session.rollback()
+            return jsonify({"message": "Insufficient stock to reopen order"}), 409
+    analytics.move_order(o, status)
     o.status = status
     db.session.commit()
     return jsonify({"message": "Order status updated"}), 200
 
+# ---------- Request profiles ----------
+@bp.get("/profiles")
+@jwt_required()
+@admin_required
+def list_profiles():
+    try:
+        limit = min(int(request.args.get("limit", 50)), 500)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    return jsonify(request_profiler.recent(limit)), 200
 
-
+@bp.get("/profiles/<profile_id>")
+@jwt_required()
+@admin_required
+def get_profile(profile_id):
+    data = request_profiler.load(profile_id)
+    if data is None:
+        return jsonify({"message": "Profile not found"}), 404
+
+    fmt = request.args.get("format", "json").lower()
+    if fmt == "collapsed":
+        return current_app.response_class(
+            to_collapsed(data), mimetype="text/plain",
+            headers={"Content-Disposition": f"attachment; filename=profile-{profile_id}.folded"}
+        )
+    if fmt == "speedscope":
+        resp = jsonify(to_speedscope(data))
+        resp.headers["Content-Disposition"] = f"attachment; filename=profile-{profile_id}.speedscope.json"
+        return resp
+    if fmt != "json":
+        return jsonify({"message": "format must be json/collapsed/speedscope"}), 400
+    return jsonify(data), 200
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt
 # from run.extensions import db
 from app.extensions import db
 
 from app.models import User
+from app.utils.revocation import revocation_list
 
 bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
@@ -37,6 +38,12 @@ def login():
     if not user or not user.check_password(password):
         return jsonify({"message": "Invalid credentials"}), 401
 
+    # hashing params changed in Config since this hash was made: upgrade it now,
+    # while we have the plaintext
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+
     token = create_access_token(identity=str(user.id), additional_claims={"role": user.role})
     return jsonify({
         "access_token": token,
@@ -46,5 +53,7 @@ def login():
 @bp.post("/logout")
 @jwt_required()
 def logout():
-    # JWT stateless example: frontend just delete token
+    # revoke this token's jti until it would have expired anyway
+    claims = get_jwt()
+    revocation_list.revoke(claims["jti"], claims["exp"])
     return jsonify({"message": "Logged out Success"}), 200
@@ -1,22 +1,23 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import delete, select, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app.extensions import db
 from app.models import CartItem, Product
+from app.utils.query_counter import query_budget
+from app.utils.serializers import cart_dicts
 
 bp = Blueprint("cart", __name__, url_prefix="/api/cart")
 
 @bp.get("")
+@query_budget(1)
 @jwt_required()
 def get_cart():
     user_id = int(get_jwt_identity())
-    items = CartItem.query.filter_by(user_id=user_id).all()
-    return jsonify([{
-        "id": i.id,
-        "qty": i.qty,
-        "product": {"id": i.product.id, "name": i.product.name, "price": i.product.price, "image_url": i.product.image_url}
-    } for i in items])
+    return jsonify(cart_dicts(user_id))
 
 @bp.post("/add")
+@query_budget(1)
 @jwt_required()
 def add_to_cart():
     user_id = int(get_jwt_identity())
@@ -27,17 +28,20 @@ def add_to_cart():
     if product_id <= 0 or qty <= 0:
         return jsonify({"message": "product_id and qty must be valid"}), 400
 
-    product = Product.query.get(product_id)
-    if not product:
+    # one statement: the SELECT yields no row for an unknown product, and a
+    # line already in the cart is bumped atomically by the unique index
+    stmt = sqlite_insert(CartItem).from_select(
+        ["user_id", "product_id", "qty"],
+        select(literal(user_id), Product.id, literal(qty)).where(Product.id == product_id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CartItem.user_id, CartItem.product_id],
+        set_={"qty": CartItem.qty + stmt.excluded.qty},
+    )
+    if not db.session.execute(stmt).rowcount:
+        db.session.rollback()
         return jsonify({"message": "Product not found"}), 404
 
-    item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-    if item:
-        item.qty += qty
-    else:
-        item = CartItem(user_id=user_id, product_id=product_id, qty=qty)
-        db.session.add(item)
-
     db.session.commit()
     return jsonify({"message": "Added to cart"}), 200
 
@@ -71,6 +75,85 @@ def remove_item(item_id):
     db.session.commit()
     return jsonify({"message": "Removed"}), 200
 
+BATCH_OPS = ("add", "set", "remove")
+MAX_BATCH_OPS = 500
+
+@bp.post("/batch")
+@query_budget(5)
+@jwt_required()
+def batch_cart():
+    """
+    Apply a list of cart edits in one transaction and return the new cart.
+    Body: {"ops": [{"op": "add"|"set"|"remove", "product_id": 1, "qty": 2}, ...]}
+    add increments, set overwrites (qty 0 removes), remove drops the line
+    (a no-op when it isn't in the cart). Ops run in order; any invalid op
+    rejects the whole batch.
+    """
+    user_id = int(get_jwt_identity())
+    ops = (request.get_json() or {}).get("ops")
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"message": "ops must be a non-empty list"}), 400
+    if len(ops) > MAX_BATCH_OPS:
+        return jsonify({"message": f"at most {MAX_BATCH_OPS} ops per batch"}), 400
+
+    parsed = []
+    for i, op in enumerate(ops):
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind not in BATCH_OPS:
+            return jsonify({"message": f"ops[{i}]: op must be one of {', '.join(BATCH_OPS)}"}), 400
+        try:
+            product_id = int(op.get("product_id", 0))
+            qty = int(op.get("qty", 1 if kind == "add" else 0))
+        except (TypeError, ValueError):
+            return jsonify({"message": f"ops[{i}]: product_id and qty must be integers"}), 400
+        if product_id <= 0 or qty < 0 or (kind == "add" and qty == 0):
+            return jsonify({"message": f"ops[{i}]: product_id and qty must be valid"}), 400
+        parsed.append((kind, product_id, qty))
+
+    # every referenced product in one IN query
+    wanted = {product_id for _, product_id, _ in parsed}
+    found = set(db.session.scalars(select(Product.id).where(Product.id.in_(wanted))))
+    missing = sorted(wanted - found)
+    if missing:
+        return jsonify({"message": "Product not found", "product_ids": missing}), 404
+
+    # fold the ops per product: adds alone stay a relative delta, a set/remove
+    # makes the result absolute (later adds then count on top of it)
+    deltas, absolute = {}, {}
+    for kind, product_id, qty in parsed:
+        if kind == "add":
+            if product_id in absolute:
+                absolute[product_id] += qty
+            else:
+                deltas[product_id] = deltas.get(product_id, 0) + qty
+        else:
+            deltas.pop(product_id, None)
+            absolute[product_id] = qty if kind == "set" else 0
+
+    # written as statements, never read-modify-write: an add that lands in a
+    # concurrent request between here and the commit is kept, and a line
+    # removed concurrently is just not there to delete
+    upsert = sqlite_insert(CartItem)
+    key = [CartItem.user_id, CartItem.product_id]
+    if deltas:
+        db.session.execute(
+            upsert.on_conflict_do_update(index_elements=key, set_={"qty": CartItem.qty + upsert.excluded.qty}),
+            [{"user_id": user_id, "product_id": pid, "qty": qty} for pid, qty in deltas.items()],
+        )
+    sets = [{"user_id": user_id, "product_id": pid, "qty": qty} for pid, qty in absolute.items() if qty]
+    if sets:
+        db.session.execute(
+            upsert.on_conflict_do_update(index_elements=key, set_={"qty": upsert.excluded.qty}),
+            sets,
+        )
+    removed = [pid for pid, qty in absolute.items() if not qty]
+    if removed:
+        db.session.execute(
+            delete(CartItem).where(CartItem.user_id == user_id, CartItem.product_id.in_(removed))
+        )
+    db.session.commit()
+    return jsonify(cart_dicts(user_id)), 200
+
 @bp.delete("/clear")
 @jwt_required()
 def clear_cart():
@@ -0,0 +1,73 @@
+import mimetypes
+import os
+import re
+
+from flask import Blueprint, request, jsonify, current_app, send_file
+
+from app.utils.images import VARIANTS, ALLOWED_EXTS, upload_dir, variant_name
+
+bp = Blueprint("media", __name__, url_prefix="/media")
+
+ONE_YEAR = 365 * 24 * 3600
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*(\.[A-Za-z0-9]+)?$")
+
+def _send(name: str, immutable: bool):
+    path = os.path.join(upload_dir(), name)
+    if not os.path.isfile(path):
+        return jsonify({"message": "Image not found"}), 404
+
+    # uploads are write-once (content-hash names), so the name is a strong ETag
+    etag = name
+    max_age = ONE_YEAR if immutable else 60
+    mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    accel_prefix = current_app.config.get("IMAGE_ACCEL_REDIRECT_PREFIX")
+    if accel_prefix:
+        # nginx sends the bytes (sendfile, ranges); we only answer conditionals
+        if request.if_none_match.contains(etag):
+            resp = current_app.response_class(status=304)
+        else:
+            resp = current_app.response_class(mimetype=mimetype)
+            resp.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{name}"
+        resp.set_etag(etag)
+    else:
+        # send_file handles If-None-Match/Range and goes zero-copy through
+        # wsgi.file_wrapper, or X-Sendfile when USE_X_SENDFILE is on
+        resp = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=max_age)
+
+    resp.cache_control.no_cache = None
+    resp.cache_control.public = True
+    resp.cache_control.max_age = max_age
+    if immutable:
+        resp.cache_control.immutable = True
+    return resp
+
+@bp.get("/<name>")
+def image(name):
+    if not _NAME_RE.match(name):
+        return jsonify({"message": "Image not found"}), 404
+    return _send(name, immutable=True)
+
+@bp.get("/<stem>/<variant>")
+def image_variant(stem, variant):
+    if variant not in VARIANTS or not _NAME_RE.match(stem) or "." in stem:
+        return jsonify({"message": "Image not found"}), 404
+
+    folder = upload_dir()
+    accept = request.accept_mimetypes
+    formats = ["webp", "jpg"] if accept["image/webp"] >= accept["image/jpeg"] and accept["image/webp"] else ["jpg", "webp"]
+    for fmt in formats:
+        name = variant_name(stem, variant, fmt)
+        if os.path.isfile(os.path.join(folder, name)):
+            resp = _send(name, immutable=True)
+            resp.vary.add("Accept")
+            return resp
+
+    # variant not generated yet: serve the original, briefly cacheable
+    for ext in ALLOWED_EXTS:
+        name = f"{stem}{ext}"
+        if os.path.isfile(os.path.join(folder, name)):
+            resp = _send(name, immutable=False)
+            resp.vary.add("Accept")
+            return resp
+    return jsonify({"message": "Image not found"}), 404
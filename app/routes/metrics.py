@@ -0,0 +1,29 @@
+import hmac
+
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+from app.utils.metrics import metrics
+
+bp = Blueprint("metrics", __name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _scraper_token_ok():
+    # Prometheus can't log in: it may send the static METRICS_TOKEN instead of an admin JWT
+    expected = current_app.config.get("METRICS_TOKEN")
+    auth = request.headers.get("Authorization", "")
+    return bool(expected) and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:], expected)
+
+@bp.get("/metrics")
+def prometheus_metrics():
+    if not _scraper_token_ok():
+        try:
+            verify_jwt_in_request()
+        except (JWTExtendedException, PyJWTError):
+            return jsonify({"message": "Admin access required"}), 401
+        if get_jwt().get("role") != "admin":
+            return jsonify({"message": "Admin access required"}), 403
+    return current_app.response_class(metrics.render(), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
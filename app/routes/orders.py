@@ -1,87 +1,108 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select, insert, func, literal
 from app.extensions import db
-from app.models import CartItem, Order, OrderItem
+from app.models import CartItem, Order, OrderItem, Product
+from app.utils import analytics
+from app.utils.inventory import cart_lines, reserve_cart_stock, short_stock_products, restore_order_stock
+from app.utils.order_codes import next_order_code
+from app.utils.query_counter import query_budget
+from app.utils.serializers import ORDER_COLS, order_dicts
+from app.utils.suggest import suggest_index
 from datetime import datetime
-import random
 
 bp = Blueprint("orders", __name__, url_prefix="/api/orders")
 
 def gen_order_code():
-    # example: ORD-20260125-123456
-    return f"ORD-{datetime.utcnow().strftime('%Y%m%d')}-{random.randint(100000, 999999)}"
+    # example: ORD-20261017-1000042 (unique, see app/utils/order_codes.py)
+    return next_order_code()
+
 @bp.get("/list")
+@query_budget(2)
 @jwt_required()
 def my_orders():
     user_id = int(get_jwt_identity())
-    orders = Order.query.filter_by(user_id=user_id).order_by(Order.id.desc()).all()
-    return jsonify([{
-        "id": o.id,
-        "order_code": o.order_code,
-        "status": o.status,
-        "total": o.total,
-        "created_at": o.created_at.isoformat(),
-        "items": [{
-            "product_id": it.product_id,
-            "name": it.name_snapshot,
-            "price": it.price_snapshot,
-            "qty": it.qty
-        } for it in o.items]
-    } for o in orders])
+    stmt = select(*ORDER_COLS).where(Order.user_id == user_id).order_by(Order.id.desc())
+    return jsonify(order_dicts(stmt, with_items=True))
 
 @bp.get("<int:order_id>")
+@query_budget(2)
 @jwt_required()
 def get_my_order(order_id):
     user_id = int(get_jwt_identity())
-    o = Order.query.filter_by(id=order_id, user_id=user_id).first()
-    if not o:
+    orders = order_dicts(select(*ORDER_COLS).where(Order.id == order_id, Order.user_id == user_id), with_items=True)
+    if not orders:
         return jsonify({"message": "Order not found"}), 404
 
-    return jsonify({
-        "id": o.id,
-        "order_code": o.order_code,
-        "status": o.status,
-        "total": o.total,
-        "created_at": o.created_at.isoformat(),
-        "items": [{
-            "product_id": it.product_id,
-            "name": it.name_snapshot,
-            "price": it.price_snapshot,
-            "qty": it.qty
-        } for it in o.items]
-    }), 200
+    return jsonify(orders[0]), 200
 
 @bp.post("/checkout")
+@query_budget(10)
 @jwt_required()
 def checkout():
     user_id = int(get_jwt_identity())
-    cart_items = CartItem.query.filter_by(user_id=user_id).all()
-    if not cart_items:
-        return jsonify({"message": "Cart is empty"}), 400
 
-    total = 0.0
-    for ci in cart_items:
-        total += ci.product.price * ci.qty
-
-    order = Order(user_id=user_id, order_code=gen_order_code(), status="pending", total=total)
+    # 0) read-only check, so an empty cart or a known shortfall doesn't use up
+    #    an order code; the stock UPDATE below stays the authoritative check
+    lines = cart_lines(user_id)
+    wanted = db.session.execute(
+        select(lines.c.qty, Product.stock).join(Product, Product.id == lines.c.product_id)
+    ).all()
+    if not wanted:
+        return jsonify({"message": "Cart is empty"}), 400
+    if any((stock or 0) < qty for qty, stock in wanted):
+        return jsonify({
+            "message": "Insufficient stock",
+            "items": short_stock_products(user_id)
+        }), 409
+
+    # allocated before the write transaction starts: a fresh block needs its
+    # own commit, which would wait on our own write lock
+    order_code = gen_order_code()
+
+    # 1) take stock first (with the catalog version bump): the UPDATE grabs
+    #    SQLite's write lock up front, so the rest of the transaction can't
+    #    fail with "database is locked" midway
+    reserved = reserve_cart_stock(user_id)
+
+    # 2) cart lines + order total in one joined query (total is SQL-side)
+    rows = db.session.execute(
+        select(lines.c.product_id, lines.c.qty,
+               func.sum(Product.price * lines.c.qty).over().label("total"))
+        .join(Product, Product.id == lines.c.product_id)
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return jsonify({"message": "Cart is empty"}), 400
+    if reserved < len(rows):
+        db.session.rollback()
+        return jsonify({
+            "message": "Insufficient stock",
+            "items": short_stock_products(user_id)
+        }), 409
+
+    created_at = datetime.utcnow()
+    order = Order(user_id=user_id, order_code=order_code, status="pending",
+                  total=rows[0].total, created_at=created_at)
     db.session.add(order)
     db.session.flush()  # get order.id
 
-    for ci in cart_items:
-        item = OrderItem(
-            order_id=order.id,
-            product_id=ci.product.id,
-            name_snapshot=ci.product.name,
-            price_snapshot=ci.product.price,
-            qty=ci.qty
+    # 3) all order items in one INSERT ... SELECT, snapshots taken from product
+    db.session.execute(
+        insert(OrderItem).from_select(
+            ["order_id", "product_id", "name_snapshot", "price_snapshot", "qty"],
+            select(literal(order.id), Product.id, Product.name, Product.price, lines.c.qty)
+            .join(lines, lines.c.product_id == Product.id)
         )
-        db.session.add(item)
+    )
+    analytics.record_order(order.id, created_at, "pending", rows[0].total)
 
     # clear cart
     CartItem.query.filter_by(user_id=user_id).delete()
     db.session.commit()
+    suggest_index.add_popularity({r.product_id: r.qty for r in rows})
 
-    return jsonify({"message": "Order created", "order_code": order.order_code}), 201
+    return jsonify({"message": "Order created", "order_code": order_code}), 201
 
 @bp.put("/cancel/<string:order_code>")
 @jwt_required()
@@ -94,7 +115,9 @@ def cancel_order(order_code):
     if order.status != "pending":
         return jsonify({"message": "Only pending orders can be canceled"}), 400
 
+    analytics.move_order(order, "canceled")
     order.status = "canceled"
+    restore_order_stock(order.id)
     db.session.commit()
     return jsonify({"message": "Order canceled", "order_code": order.order_code}), 200
 
@@ -110,6 +133,10 @@ def delete_my_order(order_id):
     if o.status not in ["pending", "canceled"]:
         return jsonify({"message": "Cannot delete shipped/paid orders"}), 400
 
+    if o.status == "pending":
+        restore_order_stock(o.id)  # canceled orders already gave their stock back
+    analytics.remove_order(o)
+
     # delete items first
     OrderItem.query.filter_by(order_id=o.id).delete()
     db.session.delete(o)
@@ -1,34 +1,119 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models import Product, Category
+from app.utils.catalog_cache import catalog_cache
+from app.utils.pagination import (
+    PaginationError, parse_page_args, parse_limit, keyset_page,
+    encode_offset_cursor, decode_offset_cursor,
+)
+from app.utils.serializers import product_rows_query, product_dicts
+from app.utils.search import build_match_query, search_product_ids
+from app.utils.suggest import suggest_index
+from app.utils.query_counter import query_budget
 
 bp = Blueprint("products", __name__, url_prefix="/api")
 
+def _cached_response(body: bytes, etag: str):
+    resp = current_app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = True  # clients must revalidate, which is a cheap 304
+    return resp
+
+def _not_modified(etag: str):
+    resp = _cached_response(b"", etag)
+    resp.status_code = 304
+    return resp
+
 @bp.get("/products")
+@query_budget(2)
 def product_list():
+    try:
+        limit, after_id = parse_page_args(request.args)
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
     category_id = request.args.get("category_id")
-    q = Product.query
     if category_id:
-        q = q.filter_by(category_id=int(category_id))
+        category_id = int(category_id)
+
+    # catalog unchanged since the client's copy -> 304 after one version lookup
+    token = catalog_cache.current()
+    etag = catalog_cache.etag_for(token)
+    if etag in request.if_none_match:
+        return _not_modified(etag)
+
+    base_url = request.url_root.rstrip("/")
+    cache_key = ("products", base_url, category_id, limit, after_id)
+    body = catalog_cache.get(cache_key, token)
+    if body is not None:
+        return _cached_response(body, etag)
+
+    q = product_rows_query()
+    if category_id:
+        q = q.filter(Product.category_id == category_id)
+
+    # newest first, paged on Product.id so deep pages cost the same as page 1
+    products, next_cursor = keyset_page(q, Product.id, limit, after_id)
+
+    body = jsonify({
+        "items": product_dicts(products, base_url),
+        "next_cursor": next_cursor
+    }).get_data()
+    catalog_cache.set(cache_key, body, token)
+    return _cached_response(body, etag)
+
+@bp.get("/products/search")
+@query_budget(3)
+def product_search():
+    match = build_match_query(request.args.get("q", ""))
+    if not match:
+        return jsonify({"message": "q required"}), 400
+    try:
+        limit = parse_limit(request.args)
+        after = request.args.get("after")
+        offset = decode_offset_cursor(after) if after else 0
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    token = catalog_cache.current()
+    etag = catalog_cache.etag_for(token)
+    if etag in request.if_none_match:
+        return _not_modified(etag)
 
-    products = q.order_by(Product.id.desc()).all()
     base_url = request.url_root.rstrip("/")
+    cache_key = ("search", base_url, match, limit, offset)
+    body = catalog_cache.get(cache_key, token)
+    if body is not None:
+        return _cached_response(body, etag)
+
+    # ranked ids from the FTS index, then one query for the rows themselves
+    ids = search_product_ids(match, limit + 1, offset)
+    next_cursor = None
+    if len(ids) > limit:
+        ids = ids[:limit]
+        next_cursor = encode_offset_cursor(offset + limit)
+
+    by_id = {}
+    if ids:
+        rows = product_rows_query().filter(Product.id.in_(ids)).all()
+        by_id = {p.id: p for p in rows}
+    products = [by_id[i] for i in ids if i in by_id]
+
+    body = jsonify({
+        "items": product_dicts(products, base_url),
+        "next_cursor": next_cursor
+    }).get_data()
+    catalog_cache.set(cache_key, body, token)
+    return _cached_response(body, etag)
+
+@bp.get("/products/suggest")
+def product_suggest():
+    prefix = request.args.get("prefix", "")
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    if limit <= 0:
+        return jsonify({"message": "limit must be greater than 0"}), 400
 
-    def build_image_url(img):
-        if not img:
-            return ""
-        if img.startswith("http://") or img.startswith("https://"):
-            return img              # external image
-        return f"{base_url}{img}"   # local uploaded image
-
-    return jsonify([{
-        "id": p.id,
-        "name": p.name,
-        "description": p.description,
-        "price": p.price,
-        "stock": p.stock,
-        "image": build_image_url(p.image_url),
-        "category": None if not p.category else {
-            "id": p.category.id,
-            "name": p.category.name
-        }
-    } for p in products])
+    suggest_index.ensure_ready()
+    return jsonify(suggest_index.suggest(prefix, limit))
@@ -0,0 +1,149 @@
+"""
+Incrementally maintained sales rollups.
+
+daily_sales holds (orders, revenue) per order day and status, so a status
+change just moves one order between two buckets. daily_product_sales holds
+units/revenue per day and product for orders that aren't canceled. Every
+helper here runs inside the caller's transaction, so rollups commit (or roll
+back) together with the order change that caused them.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, delete, func, literal
+from sqlalchemy.dialects.sqlite import insert
+
+from app.extensions import db
+from app.models import DailySales, DailyProductSales, Order, OrderItem, Product
+
+
+def _day(dt) -> date:
+    return dt.date() if isinstance(dt, datetime) else dt
+
+
+def _bump_status(day, status, orders, revenue):
+    stmt = insert(DailySales).values(day=day, status=status, orders=orders, revenue=revenue)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["day", "status"],
+        set_={"orders": DailySales.orders + stmt.excluded.orders,
+              "revenue": DailySales.revenue + stmt.excluded.revenue}
+    ))
+
+
+def _bump_products(order_id, day, sign):
+    lines = (select(literal(day), OrderItem.product_id,
+                    func.sum(OrderItem.qty) * sign,
+                    func.sum(OrderItem.qty * OrderItem.price_snapshot) * sign)
+             .where(OrderItem.order_id == order_id)
+             .group_by(OrderItem.product_id))
+    stmt = insert(DailyProductSales).from_select(["day", "product_id", "units", "revenue"], lines)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["day", "product_id"],
+        set_={"units": DailyProductSales.units + stmt.excluded.units,
+              "revenue": DailyProductSales.revenue + stmt.excluded.revenue}
+    ))
+
+
+def record_order(order_id, created_at, status, total):
+    """A new order (checkout): call after its order_item rows are inserted."""
+    day = _day(created_at)
+    _bump_status(day, status, 1, total)
+    if status != "canceled":
+        _bump_products(order_id, day, 1)
+
+
+def move_order(order, new_status):
+    """Call before changing order.status to new_status."""
+    old_status = order.status
+    if old_status == new_status:
+        return
+    day = _day(order.created_at)
+    _bump_status(day, old_status, -1, -order.total)
+    _bump_status(day, new_status, 1, order.total)
+    if new_status == "canceled":
+        _bump_products(order.id, day, -1)
+    elif old_status == "canceled":
+        _bump_products(order.id, day, 1)
+
+
+def remove_order(order):
+    """Call before deleting an order and its items."""
+    day = _day(order.created_at)
+    _bump_status(day, order.status, -1, -order.total)
+    if order.status != "canceled":
+        _bump_products(order.id, day, -1)
+
+
+def backfill():
+    """Rebuild both rollups from order/order_item history."""
+    db.session.execute(delete(DailySales))
+    db.session.execute(delete(DailyProductSales))
+
+    order_day = func.date(Order.created_at)
+    db.session.execute(insert(DailySales).from_select(
+        ["day", "status", "orders", "revenue"],
+        select(order_day, func.coalesce(Order.status, "pending"), func.count(), func.coalesce(func.sum(Order.total), 0))
+        .group_by(order_day, Order.status)
+    ))
+    db.session.execute(insert(DailyProductSales).from_select(
+        ["day", "product_id", "units", "revenue"],
+        select(order_day, OrderItem.product_id, func.sum(OrderItem.qty),
+               func.sum(OrderItem.qty * OrderItem.price_snapshot))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status != "canceled")
+        .group_by(order_day, OrderItem.product_id)
+    ))
+    db.session.commit()
+
+
+def summary(start: date, end: date, top: int = 10, low_stock: int = 5, low_stock_limit: int = 20):
+    """Dashboard numbers for [start, end]; cost grows with days, not orders."""
+    in_range = DailySales.day.between(start, end)
+
+    by_status = {s: {"orders": n, "revenue": round(r, 2)} for s, n, r in db.session.execute(
+        select(DailySales.status, func.sum(DailySales.orders), func.sum(DailySales.revenue))
+        .where(in_range)
+        .group_by(DailySales.status)
+    ) if n}
+
+    daily = [{"day": d.isoformat(), "orders": n, "revenue": round(r, 2)} for d, n, r in db.session.execute(
+        select(DailySales.day, func.sum(DailySales.orders), func.sum(DailySales.revenue))
+        .where(in_range, DailySales.status != "canceled")
+        .group_by(DailySales.day)
+        .order_by(DailySales.day)
+    )]
+
+    units = func.sum(DailyProductSales.units).label("units")
+    top_products = [{"product_id": pid, "name": name, "units": u, "revenue": round(r, 2)}
+                    for pid, name, u, r in db.session.execute(
+        select(DailyProductSales.product_id, Product.name, units, func.sum(DailyProductSales.revenue))
+        .outerjoin(Product, Product.id == DailyProductSales.product_id)
+        .where(DailyProductSales.day.between(start, end))
+        .group_by(DailyProductSales.product_id)
+        .having(units > 0)
+        .order_by(units.desc())
+        .limit(top)
+    )]
+
+    low = [{"id": pid, "name": name, "stock": stock} for pid, name, stock in db.session.execute(
+        select(Product.id, Product.name, Product.stock)
+        .where(Product.stock <= low_stock)
+        .order_by(Product.stock, Product.id)
+        .limit(low_stock_limit)
+    )]
+
+    live = [v for s, v in by_status.items() if s != "canceled"]
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "revenue": round(sum(v["revenue"] for v in live), 2),
+        "orders": sum(v["orders"] for v in live),
+        "orders_by_status": {s: v["orders"] for s, v in by_status.items()},
+        "daily": daily,
+        "top_products": top_products,
+        "low_stock": low,
+    }
+
+
+def default_range(days=30):
+    end = datetime.utcnow().date()
+    return end - timedelta(days=days - 1), end
@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from app.models import CacheVersion
+
+VERSION_ROW = "catalog"  # cache_version row bumped by every product/category/stock write
+VERSION_SELECT = select(CacheVersion.version).where(CacheVersion.name == VERSION_ROW)
+
+
+class CatalogCache:
+    """
+    Versioned LRU cache of serialized catalog responses (bytes).
+
+    Every write that changes what the catalog shows (product/category CRUD,
+    imports, stock moved by checkout or cancel) calls `invalidate_catalog()`
+    in its transaction, which bumps a version row shared by all workers.
+    Reads look the row up first (one primary key lookup) and drop the local
+    entries when it moved, so a write in one worker is visible to the next
+    request in any other. The ETag is the persisted version alone: every
+    worker hands out the same ETag for the same catalog, so a matching
+    If-None-Match is answered with that single lookup whichever worker
+    takes the request.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._reset()
+        # prefork workers would share the parent's entries and lock
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self.version = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get("CATALOG_CACHE_MAX_BYTES", self.max_bytes)
+        app.extensions["catalog_cache"] = self
+
+    def current(self) -> str:
+        """Opaque token for the catalog state as of now (the shared version)."""
+        from app.extensions import db
+
+        return self.observe(db.session.execute(VERSION_SELECT).scalar() or 0)
+
+    def observe(self, version: int) -> str:
+        """Token for a version read by the caller (the async views run VERSION_SELECT themselves)."""
+        if version > self.version:
+            with self._lock:
+                if version > self.version:
+                    self.version = version
+                    self._entries.clear()
+                    self._size = 0
+        return str(version)
+
+    def etag_for(self, token: str) -> str:
+        return f"catalog-{token}"
+
+    def get(self, key, token: str):
+        with self._lock:
+            body = self._entries.get((token, key))
+            if body is not None:
+                self._entries.move_to_end((token, key))
+            return body
+
+    def set(self, key, body: bytes, token: str):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if token != str(self.version):
+                return  # catalog changed while this response was being built
+            full_key = (token, key)
+            old = self._entries.pop(full_key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[full_key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        """Forget this process's entries and last seen version; the shared row is untouched."""
+        with self._lock:
+            self.version = 0
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {"version": self.version, "entries": len(self._entries), "bytes": self._size}
+
+
+catalog_cache = CatalogCache()
+
+
+def invalidate_catalog():
+    """Call inside the transaction of any write that changes the catalog."""
+    from app.extensions import db
+
+    db.session.execute(
+        insert(CacheVersion).values(name=VERSION_ROW, version=1)
+        .on_conflict_do_update(index_elements=["name"], set_={"version": CacheVersion.version + 1})
+    )
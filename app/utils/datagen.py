@@ -0,0 +1,295 @@
+"""
+Deterministic bulk data generator (`flask seed-bulk`).
+
+Rows are produced in Python from one seeded RNG and written with a
+pre-compiled Core INSERT per table through executemany, in batches of
+`batch_size` rows per transaction. Secondary indexes of the big tables are
+dropped during the load and rebuilt once at the end (cheaper than keeping
+them sorted row by row), synchronous is off on the loading connection, and
+explicit ids avoid RETURNING round trips.
+
+Distributions:
+  - product popularity and customer activity follow Zipf laws (a few
+    bestsellers and heavy buyers, a long tail),
+  - orders spread over `days` with volume growing towards the end date,
+  - order status depends on age: recent orders are mostly pending/paid,
+    older ones delivered, ~8% canceled throughout,
+  - 1-6 lines per order (mean ~2.1), quantities skewed to 1.
+
+The same seed, volumes and end date on an empty DB give the same rows.
+Every synthetic user shares one password hash (hashing a million passwords
+would take hours); their password is DEFAULT_PASSWORD.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dtime
+from bisect import bisect
+from itertools import accumulate
+
+from sqlalchemy import insert, select, func, update
+
+from app.extensions import db
+from app.models import CartItem, Category, CodeSequence, Order, OrderItem, Product, User
+from app.utils import analytics
+from app.utils.order_codes import order_code_seq
+
+DEFAULT_PASSWORD = "password"
+
+CATEGORY_NAMES = [
+    "Phones", "Laptops", "Tablets", "Headphones", "Cameras", "Monitors", "Keyboards", "Mice",
+    "Printers", "Storage", "Networking", "Smart Home", "Wearables", "Gaming", "Audio", "TV",
+    "Kitchen", "Furniture", "Lighting", "Garden", "Tools", "Sports", "Outdoor", "Toys", "Books",
+    "Stationery", "Beauty", "Health", "Pet Supplies", "Baby", "Groceries", "Beverages", "Snacks",
+    "Clothing", "Shoes", "Bags", "Jewelry", "Watches", "Automotive", "Bikes", "Music", "Office",
+    "Cleaning", "Bedding", "Bath", "Crafts", "Party", "Travel", "Security", "Software",
+]
+ADJECTIVES = [
+    "Classic", "Compact", "Deluxe", "Eco", "Essential", "Ultra", "Smart", "Pro", "Mini", "Max",
+    "Premium", "Rugged", "Slim", "Wireless", "Portable", "Vintage", "Modern", "Basic", "Turbo", "Lite",
+]
+NOUNS = [
+    "Speaker", "Charger", "Cable", "Lamp", "Bottle", "Backpack", "Jacket", "Blender", "Kettle",
+    "Drone", "Router", "Tripod", "Notebook", "Pen", "Mug", "Chair", "Desk", "Pillow", "Towel",
+    "Sneaker", "Helmet", "Watch", "Case", "Stand", "Adapter", "Mouse", "Keyboard", "Monitor",
+    "Earbuds", "Camera", "Tent", "Grill", "Vacuum", "Fan", "Heater", "Scale", "Brush", "Shaver",
+]
+
+STATUS_BY_AGE = [  # (max age in days, statuses, weights)
+    (2, ("pending", "paid", "shipped", "canceled"), (40, 35, 15, 10)),
+    (14, ("paid", "shipped", "delivered", "canceled"), (7, 30, 55, 8)),
+    (None, ("delivered", "canceled"), (92, 8)),
+]
+LINES_PER_ORDER = ((1, 2, 3, 4, 5, 6), (45, 25, 14, 8, 5, 3))
+QTY = ((1, 2, 3, 4), (75, 17, 6, 2))
+
+
+def zipf_cum_weights(n, s):
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _dt(ts: float) -> str:
+    # SQLAlchemy's SQLite DateTime storage format
+    return datetime.utcfromtimestamp(ts).isoformat(" ", "microseconds")
+
+
+@contextmanager
+def _tx(conn):
+    if conn.in_transaction():  # close the autobegun read transaction
+        conn.commit()
+    with conn.begin():
+        yield
+
+
+class _Loader:
+    def __init__(self, conn, batch_size, progress):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.progress = progress
+        self._sql = {}
+
+    def insert_sql(self, table, cols):
+        key = (table.name, cols)
+        if key not in self._sql:
+            compiled = insert(table).compile(dialect=self.conn.dialect, column_keys=list(cols))
+            assert tuple(compiled.positiontup) == cols, compiled.positiontup
+            self._sql[key] = str(compiled)
+        return self._sql[key]
+
+    def write(self, table, cols, rows):
+        if rows:
+            self.conn.exec_driver_sql(self.insert_sql(table, cols), rows)
+
+    def load(self, label, total, chunks):
+        """`chunks` yields {(table, cols): rows} dicts; each one is one transaction."""
+        done, t0 = 0, time.perf_counter()
+        for n, tables in chunks:
+            with _tx(self.conn):
+                for (table, cols), rows in tables.items():
+                    self.write(table, cols, rows)
+            done += n
+            rate = done / max(time.perf_counter() - t0, 1e-9)
+            self.progress(f"  {label}: {done:,}/{total:,} ({rate:,.0f}/s)")
+
+
+def _next_id(conn, col):
+    return (conn.execute(select(func.max(col))).scalar() or 0) + 1
+
+
+def generate(users=10000, products=1000, orders=50000, categories=20, carts=None, days=365,
+             seed=1, end_date=None, batch_size=50000, zipf_s=1.1, progress=print):
+    """Append synthetic rows to the current database; returns row counts."""
+    rng = random.Random(seed)
+    end = datetime.combine(end_date or datetime.utcnow().date(), dtime(23, 59, 59))
+    end_ts = (end - datetime(1970, 1, 1)).total_seconds()
+    span = days * 86400
+    start_ts = end_ts - span
+    carts = users // 20 if carts is None else carts
+    stats = {}
+
+    probe = User()
+    probe.set_password(DEFAULT_PASSWORD)
+    shared_hash = probe.password_hash
+
+    big_tables = [User.__table__, Order.__table__, OrderItem.__table__, CartItem.__table__]
+
+    with db.engine.connect() as conn:
+        prior = {p: conn.exec_driver_sql(f"PRAGMA {p}").scalar() for p in ("synchronous", "cache_size")}
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql("PRAGMA cache_size=-262144")
+        conn.exec_driver_sql("PRAGMA temp_store=MEMORY")
+        conn.commit()
+        loader = _Loader(conn, batch_size, progress)
+        try:
+            with _tx(conn):
+                for table in big_tables:
+                    for index in table.indexes:
+                        index.drop(conn, checkfirst=True)
+
+            # ---------- categories ----------
+            with _tx(conn):
+                existing = set(conn.execute(select(Category.name)).scalars())
+                names = [n for n in CATEGORY_NAMES if n not in existing]
+                names += [f"Category {i}" for i in range(len(CATEGORY_NAMES), categories + len(existing))
+                          if f"Category {i}" not in existing]
+                names = names[:max(categories - len(existing), 0)]
+                loader.write(Category.__table__, ("name",), [(n,) for n in names])
+                category_ids = list(conn.execute(select(Category.id)).scalars())
+            stats["categories"] = len(names)
+
+            # ---------- products ----------
+            first_pid = _next_id(conn, Product.id)
+            product_cols = ("id", "name", "description", "price", "stock", "image_url", "category_id")
+            catalog = []  # (id, name, price) in id order
+
+            def product_chunks():
+                for lo in range(0, products, batch_size):
+                    rows = []
+                    for i in range(lo, min(lo + batch_size, products)):
+                        pid = first_pid + i
+                        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {pid}"
+                        price = round(min(rng.lognormvariate(3.2, 0.9), 5000.0), 2)
+                        stock = 0 if rng.random() < 0.03 else rng.randint(1, 1000)
+                        catalog.append((pid, name, price))
+                        rows.append((pid, name, f"Synthetic product {pid}", price, stock, "",
+                                     rng.choice(category_ids)))
+                    yield len(rows), {(Product.__table__, product_cols): rows}
+            loader.load("products", products, product_chunks())
+            stats["products"] = products
+
+            # ---------- users ----------
+            first_uid = _next_id(conn, User.id)
+            user_cols = ("id", "full_name", "email", "password_hash", "role", "created_at")
+
+            def user_chunks():
+                for lo in range(0, users, batch_size):
+                    rows = []
+                    for i in range(lo, min(lo + batch_size, users)):
+                        uid = first_uid + i
+                        joined = start_ts + span * ((i + rng.random()) / users) ** 0.5
+                        rows.append((uid, f"Customer {uid}", f"user{uid}@example.test", shared_hash,
+                                     "customer", _dt(joined)))
+                    yield len(rows), {(User.__table__, user_cols): rows}
+            loader.load("users", users, user_chunks())
+            stats["users"] = users
+
+            # ---------- orders + items ----------
+            catalog = catalog or [tuple(r) for r in conn.execute(select(Product.id, Product.name, Product.price))]
+            product_pool = list(range(len(catalog)))
+            rng.shuffle(product_pool)  # popularity rank -> random product
+            product_cum = zipf_cum_weights(len(product_pool), zipf_s)
+            buyer_pool = list(range(first_uid, first_uid + users)) or \
+                list(conn.execute(select(User.id).where(User.role == "customer")).scalars())
+            rng.shuffle(buyer_pool)
+            buyer_cum = zipf_cum_weights(len(buyer_pool), 0.8)
+
+            with _tx(conn):  # reserve order numbers the live allocator will never hand out
+                code_base = conn.execute(
+                    update(CodeSequence).where(CodeSequence.name == order_code_seq.name)
+                    .values(next_value=CodeSequence.next_value + orders)
+                    .returning(CodeSequence.next_value)
+                ).scalar_one_or_none()
+            if code_base is None:
+                raise RuntimeError("code_sequence row missing; run `flask db upgrade` first")
+            code_base -= orders
+
+            first_oid = _next_id(conn, Order.id)
+            next_item_id = _next_id(conn, OrderItem.id)
+            order_cols = ("id", "order_code", "user_id", "status", "total", "created_at")
+            item_cols = ("id", "order_id", "product_id", "name_snapshot", "price_snapshot", "qty")
+            status_cuts = [(end_ts - d * 86400 if d else None, s, list(accumulate(w)))
+                           for d, s, w in STATUS_BY_AGE]
+            n_items = 0
+
+            def order_chunks():
+                nonlocal next_item_id, n_items
+                for lo in range(0, orders, batch_size):
+                    hi = min(lo + batch_size, orders)
+                    buyers = rng.choices(buyer_pool, cum_weights=buyer_cum, k=hi - lo)
+                    line_counts = rng.choices(*LINES_PER_ORDER, k=hi - lo)
+                    n_lines = sum(line_counts)
+                    picks = iter(rng.choices(product_pool, cum_weights=product_cum, k=n_lines))
+                    qtys = iter(rng.choices(*QTY, k=n_lines))
+                    order_rows, item_rows = [], []
+                    for k, i in enumerate(range(lo, hi)):
+                        oid = first_oid + i
+                        ts = start_ts + span * ((i + rng.random()) / orders) ** 0.5  # growing volume
+                        for cut, statuses, cum in status_cuts:
+                            if cut is None or ts >= cut:
+                                status = statuses[bisect(cum, rng.random() * cum[-1])]
+                                break
+                        total, seen = 0.0, set()
+                        for _ in range(line_counts[k]):
+                            pid, name, price = catalog[next(picks)]
+                            qty = next(qtys)
+                            if pid in seen:
+                                continue
+                            seen.add(pid)
+                            total += price * qty
+                            item_rows.append((next_item_id, oid, pid, name, price, qty))
+                            next_item_id += 1
+                        created = _dt(ts)
+                        code = f"ORD-{created[:10].replace('-', '')}-{code_base + i:06d}"
+                        order_rows.append((oid, code, buyers[k], status, round(total, 2), created))
+                    n_items += len(item_rows)
+                    yield hi - lo, {(Order.__table__, order_cols): order_rows,
+                                    (OrderItem.__table__, item_cols): item_rows}
+            if catalog and buyer_pool:
+                loader.load("orders", orders, order_chunks())
+            stats["orders"], stats["order_items"] = (orders, n_items) if catalog and buyer_pool else (0, 0)
+
+            # ---------- carts ----------
+            cart_cols = ("user_id", "product_id", "qty")
+
+            # one cart per user, none for users who already have one:
+            # (user_id, product_id) is unique in cart_item
+            has_cart = set(conn.execute(select(CartItem.user_id).distinct()).scalars())
+            cart_pool = [uid for uid in buyer_pool if uid not in has_cart]
+            carts = min(carts, len(cart_pool))
+
+            def cart_chunks():
+                cart_users = rng.sample(cart_pool, carts)
+                for lo in range(0, carts, batch_size):
+                    rows = []
+                    for uid in cart_users[lo:lo + batch_size]:
+                        for idx in set(rng.choices(product_pool, cum_weights=product_cum, k=rng.randint(1, 4))):
+                            rows.append((uid, catalog[idx][0], rng.choices(*QTY)[0]))
+                    yield len(cart_users[lo:lo + batch_size]), {(CartItem.__table__, cart_cols): rows}
+            if carts and catalog:
+                loader.load("carts", carts, cart_chunks())
+            stats["carts"] = carts if catalog else 0
+        finally:
+            progress("  rebuilding indexes")
+            with _tx(conn):
+                for table in big_tables:
+                    for index in table.indexes:
+                        index.create(conn, checkfirst=True)
+            for name, value in prior.items():
+                conn.exec_driver_sql(f"PRAGMA {name}={value}")
+            conn.commit()
+
+    progress("  rebuilding sales rollups")
+    analytics.backfill()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return stats
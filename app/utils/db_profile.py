@@ -0,0 +1,89 @@
+"""
+SQLite engine profiles and read/write session routing.
+
+DB_PROFILE=production turns on WAL (readers never block the writer and vice
+versa), NORMAL sync (durable across app crashes, fsync only at checkpoints),
+a busy timeout instead of instant "database is locked" errors, a bigger page
+cache and mmap reads, plus explicit pool settings.
+
+READ_DATABASE_URL (optional) gets its own engine under the "read" bind; GET
+and HEAD requests then run their queries there while flushes and every other
+method use the primary. With SQLite this can simply be the same file opened
+read-only: sqlite:///file:/path/ecom.db?mode=ro&uri=true
+"""
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,        # ms
+    "cache_size": -64000,        # KiB -> 64 MB page cache per connection
+    "mmap_size": 268435456,      # 256 MB
+    "temp_store": "MEMORY",
+}
+
+PRODUCTION_ENGINE_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 10,
+    "pool_recycle": 3600,
+    "connect_args": {"timeout": 5, "check_same_thread": False},
+}
+
+READ_BIND = "read"
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_request_context()
+                and g.get("_db_read_only") and READ_BIND in self._db.engines):
+            return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def configure_db_profile(app):
+    """Call before db.init_app: engine options and binds are read at init time."""
+    if app.config.get("DB_PROFILE") == "production":
+        options = dict(PRODUCTION_ENGINE_OPTIONS)
+        options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+    read_url = app.config.get("READ_DATABASE_URL")
+    if read_url:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds[READ_BIND] = read_url
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def _pragma_listener(pragmas):
+    def set_pragmas(dbapi_conn, connection_record):
+        cur = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cur.execute(f"PRAGMA {name}={value}")
+        cur.close()
+    return set_pragmas
+
+
+def hook_pragmas(app, engine, read_only=False):
+    """Apply the profile's connect-time pragmas to `engine` (sync or async_engine.sync_engine)."""
+    if app.config.get("DB_PROFILE") != "production" or engine.dialect.name != "sqlite":
+        return
+    pragmas = dict(PRODUCTION_PRAGMAS)
+    pragmas.update(app.config.get("SQLITE_PRAGMAS") or {})
+    if read_only:
+        pragmas.pop("journal_mode")  # a read-only handle can't switch it
+    event.listen(engine, "connect", _pragma_listener(pragmas))
+
+
+def init_db_profile(app, db):
+    """Call after db.init_app: hooks connect-time pragmas and GET routing."""
+    with app.app_context():
+        for key, engine in db.engines.items():
+            hook_pragmas(app, engine, read_only=key == READ_BIND)
+
+    if app.config.get("READ_DATABASE_URL"):
+        @app.before_request
+        def _route_reads():
+            g._db_read_only = request.method in ("GET", "HEAD")
@@ -0,0 +1,119 @@
+import hashlib
+import os
+from tempfile import NamedTemporaryFile
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from app.utils.jobs import jobs
+
+try:  # Pillow is optional: without it uploads still work, just no variants
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+UPLOAD_URL_PREFIX = "/static/uploads/"
+MEDIA_URL_PREFIX = "/media/"
+ALLOWED_EXTS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+# name -> max edge in px; each is written as JPEG and WebP
+VARIANTS = {"200w": 200, "800w": 800}
+CHUNK = 64 * 1024
+
+
+def upload_dir():
+    return current_app.config["UPLOAD_FOLDER"]
+
+
+def save_product_image(image_file) -> str:
+    """
+    Stream an upload to disk while hashing it and store it once under its
+    content hash. Re-uploading the same bytes costs no extra space.
+    Variant generation is a background job and never blocks the request.
+    Returns the image_url to store on the product.
+    """
+    folder = upload_dir()
+    os.makedirs(folder, exist_ok=True)
+
+    filename = secure_filename(image_file.filename or "")
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_EXTS:
+        ext = ".jpg"
+    if ext == ".jpeg":
+        ext = ".jpg"
+
+    digest = hashlib.sha256()
+    with NamedTemporaryFile(dir=folder, prefix=".upload-", delete=False) as tmp:
+        for chunk in iter(lambda: image_file.stream.read(CHUNK), b""):
+            digest.update(chunk)
+            tmp.write(chunk)
+
+    name = f"{digest.hexdigest()[:32]}{ext}"
+    path = os.path.join(folder, name)
+    if os.path.exists(path):
+        os.unlink(tmp.name)  # duplicate upload
+    else:
+        os.replace(tmp.name, path)
+
+    if Image is not None:
+        make_image_variants.enqueue(name=name)  # committed with the product
+    return f"{UPLOAD_URL_PREFIX}{name}"
+
+
+def variant_name(name: str, variant: str, fmt: str) -> str:
+    stem = os.path.splitext(name)[0]
+    return f"{stem}_{variant}.{fmt}"
+
+
+def image_url_for(image_url: str, base_url: str) -> str:
+    if not image_url:
+        return ""
+    if image_url.startswith("http://") or image_url.startswith("https://"):
+        return image_url  # external image
+    if image_url.startswith(UPLOAD_URL_PREFIX):
+        # uploaded image: served by the media blueprint with immutable caching
+        return f"{base_url}{MEDIA_URL_PREFIX}{image_url[len(UPLOAD_URL_PREFIX):]}"
+    return f"{base_url}{image_url}"
+
+
+def image_srcset(image_url: str, base_url: str) -> dict:
+    """
+    srcset-style map for an uploaded image: {"200w": url, "800w": url}.
+    Each URL negotiates WebP/JPEG from Accept and falls back to the original
+    until the variant has been generated. External images get {}.
+    """
+    if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX):
+        return {}
+    stem = os.path.splitext(image_url[len(UPLOAD_URL_PREFIX):])[0]
+    return {variant: f"{base_url}{MEDIA_URL_PREFIX}{stem}/{variant}" for variant in VARIANTS}
+
+
+def _write_atomic(img, path, fmt, **opts):
+    folder = os.path.dirname(path)
+    with NamedTemporaryFile(dir=folder, prefix=".variant-", delete=False) as tmp:
+        img.save(tmp, fmt, **opts)
+    os.replace(tmp.name, path)
+
+
+def generate_variants(path: str):
+    if Image is None:
+        return
+    folder, name = os.path.split(path)
+    with Image.open(path) as src:
+        src = ImageOps.exif_transpose(src)
+        if src.mode not in ("RGB", "L"):
+            src = src.convert("RGB")
+        for variant, edge in VARIANTS.items():
+            jpg = os.path.join(folder, variant_name(name, variant, "jpg"))
+            webp = os.path.join(folder, variant_name(name, variant, "webp"))
+            if os.path.exists(jpg) and os.path.exists(webp):
+                continue
+            img = src.copy()
+            img.thumbnail((edge, edge), Image.LANCZOS)
+            _write_atomic(img, jpg, "JPEG", quality=82, optimize=True, progressive=True)
+            _write_atomic(img, webp, "WEBP", quality=80, method=4)
+
+
+@jobs.task("images.variants", max_attempts=3)
+def make_image_variants(name: str):
+    """Durable job: resized JPEG/WebP variants of an upload (idempotent)."""
+    generate_variants(os.path.join(upload_dir(), name))
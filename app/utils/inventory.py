@@ -0,0 +1,76 @@
+from sqlalchemy import select, update, func
+
+from app.extensions import db
+from app.models import CartItem, Product, OrderItem
+from app.utils.catalog_cache import invalidate_catalog
+
+
+def cart_lines(user_id: int):
+    """Cart quantities summed per product (a product may sit on several cart rows)."""
+    return (select(CartItem.product_id, func.sum(CartItem.qty).label("qty"))
+            .where(CartItem.user_id == user_id)
+            .group_by(CartItem.product_id)
+            .subquery())
+
+
+def reserve_cart_stock(user_id: int) -> int:
+    """
+    Decrement stock for every product in the user's cart with one conditional
+    UPDATE ... FROM; rows without enough stock are left untouched.
+    Returns how many products were decremented; the caller compares that to
+    the number of cart lines and rolls back on a shortfall.
+    Every stock write here also invalidates the catalog (it shows stock).
+    """
+    invalidate_catalog()
+    lines = cart_lines(user_id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == lines.c.product_id, Product.stock >= lines.c.qty)
+        .values(stock=Product.stock - lines.c.qty)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def short_stock_products(user_id: int):
+    lines = cart_lines(user_id)
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.stock, lines.c.qty)
+        .join(lines, lines.c.product_id == Product.id)
+        .where(func.coalesce(Product.stock, 0) < lines.c.qty)
+    )
+    return [{"product_id": pid, "name": name, "stock": stock or 0, "requested": qty}
+            for pid, name, stock, qty in rows]
+
+
+def _order_lines(order_id: int):
+    return (select(OrderItem.product_id, func.sum(OrderItem.qty).label("qty"))
+            .where(OrderItem.order_id == order_id)
+            .group_by(OrderItem.product_id)
+            .subquery())
+
+
+def restore_order_stock(order_id: int):
+    """Give an order's quantities back to stock (cancel/delete of an unshipped order)."""
+    invalidate_catalog()
+    lines = _order_lines(order_id)
+    db.session.execute(
+        update(Product)
+        .where(Product.id == lines.c.product_id)
+        .values(stock=Product.stock + lines.c.qty)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reserve_order_stock(order_id: int) -> bool:
+    """Take an order's quantities out of stock again; False if any product is short."""
+    invalidate_catalog()
+    lines = _order_lines(order_id)
+    wanted = db.session.execute(select(func.count()).select_from(lines)).scalar()
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == lines.c.product_id, Product.stock >= lines.c.qty)
+        .values(stock=Product.stock - lines.c.qty)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == wanted
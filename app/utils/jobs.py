@@ -0,0 +1,363 @@
+"""
+Durable background jobs on a SQLite table.
+
+Register a function anywhere (usually next to the blueprint that needs it)
+and enqueue it from a handler:
+
+    @jobs.task("images.variants", max_attempts=3)
+    def make_variants(name):
+        ...
+
+    make_variants.enqueue(name="ab12.jpg")   # or jobs.enqueue("images.variants", {...})
+
+enqueue() only adds a row to the request's session, so the job is committed
+with the request's own writes or rolled back with them, and the handler
+returns without running it. `flask worker` claims due jobs in batches with
+one UPDATE ... RETURNING. A claimed job is leased until run_at, which is
+set to now + visibility timeout. If the worker dies, the lease runs out and
+another worker picks the job up, so nothing is lost in a crash. A failure
+requeues the job with exponential backoff. After max_attempts it becomes
+"dead" (the dead letter state) and stays in the table for inspection; see
+`flask jobs-status --requeue-dead`. A job whose worker crashed on its last
+attempt is dead-lettered when its lease runs out, so a job that kills its
+worker isn't retried forever.
+
+Job payloads are JSON keyword arguments. Handlers run inside an app
+context, and a job can run more than once (lease expiry, crash after the
+work but before the ack), so handlers must be idempotent.
+
+Jobs run in-process (no worker needed) when JOBS_EAGER=1, and by default
+in debug and testing mode; JOBS_EAGER=0 forces the queue. An eager job
+still waits for the enqueuing transaction to commit, and is dropped if it
+rolls back. Inside a request it runs once the response has been sent, so
+the handler doesn't wait for it either way. Every
+worker keeps a heartbeat row fresh. `flask serve` at startup, and enqueue()
+at most once a minute, log a warning when jobs are waiting and no worker
+has been seen lately, so a deployment that forgot `flask worker` shows up
+in the logs rather than as silently missing work.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, g
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.extensions import db
+from app.models import Job, WorkerHeartbeat
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, DEAD = "queued", "running", "done", "dead"
+MAX_ERROR_CHARS = 4000
+PRUNE_INTERVAL = 60  # seconds between sweeps of old finished jobs
+HEARTBEAT_INTERVAL = 15  # seconds between a worker's heartbeat writes
+WORKER_STALE = 60  # a worker not seen for this long counts as gone
+
+
+class JobRegistry:
+    def __init__(self):
+        self.tasks = {}  # name -> (fn, max_attempts)
+        self.eager = None  # None: eager in debug/testing mode
+        self.max_attempts = 5
+        self.backoff = 10.0
+        self.backoff_max = 3600.0
+        self.keep_done = 86400.0
+        self._last_check = 0.0
+
+    def init_app(self, app):
+        self.eager = app.config.get("JOBS_EAGER", self.eager)
+        self.max_attempts = app.config.get("JOBS_MAX_ATTEMPTS", self.max_attempts)
+        self.backoff = app.config.get("JOBS_BACKOFF", self.backoff)
+        self.backoff_max = app.config.get("JOBS_BACKOFF_MAX", self.backoff_max)
+        self.keep_done = app.config.get("JOBS_KEEP_DONE", self.keep_done)
+        app.extensions["jobs"] = self
+        if not event.contains(db.session, "after_commit", self._committed):
+            event.listen(db.session, "after_commit", self._committed)
+            event.listen(db.session, "after_rollback", self._rolled_back)
+        app.after_request(self._run_after_response)
+        app.teardown_appcontext(self._run_at_teardown)
+
+    # ---------- producing ----------
+    def task(self, name=None, max_attempts=None):
+        """Register `fn` as a job; adds `fn.enqueue(**kwargs)`."""
+        def decorator(fn):
+            job_name = name or f"{fn.__module__}.{fn.__name__}"
+            if job_name in self.tasks:
+                raise ValueError(f"job {job_name!r} is already registered")
+            self.tasks[job_name] = (fn, max_attempts)
+            fn.job_name = job_name
+            fn.enqueue = lambda delay=0, **kwargs: self.enqueue(job_name, kwargs, delay=delay)
+            return fn
+        return decorator
+
+    def enqueue(self, name, payload=None, delay=0):
+        """Queue `name(**payload)` in the current session; it is durable once that commits."""
+        if name not in self.tasks:
+            raise KeyError(f"unknown job {name!r}")
+        payload = payload or {}
+        fn, max_attempts = self.tasks[name]
+        if self.is_eager():
+            db.session.connection()  # begin, so a rollback with nothing else written still drops it
+            db.session.info.setdefault("eager_jobs", []).append((name, payload))
+            return
+        db.session.execute(insert(Job).values(
+            name=name,
+            payload=json.dumps(payload),
+            status=QUEUED,
+            attempts=0,
+            max_attempts=max_attempts or self.max_attempts,
+            run_at=datetime.utcnow() + timedelta(seconds=delay),
+            created_at=datetime.utcnow(),
+        ))
+        if time.monotonic() - self._last_check > WORKER_STALE:
+            self._last_check = time.monotonic()
+            self.warn_if_unattended()
+
+    def is_eager(self):
+        if self.eager is not None:
+            return self.eager
+        return current_app.debug or current_app.testing
+
+    # ---------- eager mode ----------
+    @staticmethod
+    def _committed(session):
+        pending = session.info.pop("eager_jobs", None)
+        if pending:
+            g.setdefault("eager_jobs", []).extend(pending)
+
+    @staticmethod
+    def _rolled_back(session):
+        session.info.pop("eager_jobs", None)
+
+    def _run_after_response(self, response):
+        pending = g.pop("eager_jobs", None)
+        if pending:
+            app = current_app._get_current_object()
+            response.call_on_close(lambda: self._run_eager(app, pending))
+        return response
+
+    def _run_at_teardown(self, exc=None):
+        # outside a request (CLI, tests), or a commit after after_request
+        pending = g.pop("eager_jobs", None)
+        if pending:
+            self._run_eager(None, pending)
+
+    def _run_eager(self, app, pending):
+        if app is not None:
+            with app.app_context():
+                return self._run_eager(None, pending)
+        while pending:  # jobs that enqueue jobs
+            for name, payload in pending:
+                try:
+                    self.tasks[name][0](**payload)
+                except Exception:
+                    db.session.rollback()
+                    log.exception("eager job %s failed", name)
+            pending = g.pop("eager_jobs", None)
+
+    # ---------- workers ----------
+    def heartbeat(self, worker_id, started_at):
+        now = datetime.utcnow()
+        db.session.execute(
+            sqlite_insert(WorkerHeartbeat).values(worker_id=worker_id, started_at=started_at, seen_at=now)
+            .on_conflict_do_update(index_elements=["worker_id"], set_={"seen_at": now})
+        )
+        db.session.commit()
+
+    def forget_worker(self, worker_id):
+        db.session.execute(delete(WorkerHeartbeat).where(WorkerHeartbeat.worker_id == worker_id))
+        db.session.commit()
+
+    def live_workers(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=WORKER_STALE)
+        return db.session.execute(
+            select(WorkerHeartbeat.worker_id, WorkerHeartbeat.started_at, WorkerHeartbeat.seen_at)
+            .where(WorkerHeartbeat.seen_at >= cutoff).order_by(WorkerHeartbeat.worker_id)
+        ).all()
+
+    def warn_if_unattended(self):
+        """Log a warning if jobs are queued but no worker has a recent heartbeat; returns the queued count."""
+        if self.is_eager():
+            return 0
+        queued = db.session.execute(select(func.count()).where(Job.status == QUEUED)).scalar()
+        if queued and not self.live_workers():
+            log.warning("%d background jobs queued and no `flask worker` seen in the last %ds; "
+                        "they won't run until one is started (or set JOBS_EAGER=1)", queued, WORKER_STALE)
+            return queued
+        return 0
+
+    # ---------- consuming ----------
+    def claim(self, limit, visibility, worker_id):
+        """Lease up to `limit` due jobs (queued, or running with an expired lease)."""
+        now = datetime.utcnow()
+        # an expired lease on the last attempt means the job never got to fail():
+        # its worker crashed or was killed, possibly by the job itself
+        dead = db.session.execute(
+            update(Job)
+            .where(Job.status == RUNNING, Job.run_at <= now, Job.attempts >= Job.max_attempts)
+            .values(status=DEAD, finished_at=now, locked_by=None,
+                    last_error="lease expired on the last attempt: the worker crashed or was killed")
+            .returning(Job.id, Job.name, Job.attempts)
+        ).all()
+        for job in dead:
+            log.error("job %s #%d is dead: lease expired after %d attempts", job.name, job.id, job.attempts)
+        due = (
+            select(Job.id)
+            .where(Job.status.in_((QUEUED, RUNNING)), Job.run_at <= now)
+            .order_by(Job.run_at)
+            .limit(limit)
+        )
+        rows = db.session.execute(
+            update(Job)
+            .where(Job.id.in_(due.scalar_subquery()))
+            .values(status=RUNNING, run_at=now + timedelta(seconds=visibility),
+                    locked_by=worker_id, attempts=Job.attempts + 1)
+            .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+        ).all()
+        db.session.commit()
+        return rows
+
+    def complete(self, job):
+        # the attempt number is the lease token: a worker whose lease expired
+        # (and whose job was re-claimed) can't ack someone else's attempt
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.attempts == job.attempts, Job.status == RUNNING)
+            .values(status=DONE, finished_at=datetime.utcnow(), locked_by=None)
+        )
+        db.session.commit()
+
+    def fail(self, job, error):
+        now = datetime.utcnow()
+        if job.attempts >= job.max_attempts:
+            values = {"status": DEAD, "finished_at": now}
+            log.error("job %s #%d is dead after %d attempts", job.name, job.id, job.attempts)
+        else:
+            delay = min(self.backoff * 2 ** (job.attempts - 1), self.backoff_max)
+            values = {"status": QUEUED, "run_at": now + timedelta(seconds=delay * random.uniform(0.8, 1.2))}
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.attempts == job.attempts, Job.status == RUNNING)
+            .values(locked_by=None, last_error=error[-MAX_ERROR_CHARS:], **values)
+        )
+        db.session.commit()
+
+    def prune(self):
+        """Drop finished jobs older than keep_done seconds; dead ones are kept."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.keep_done)
+        n = db.session.execute(delete(Job).where(Job.status == DONE, Job.finished_at < cutoff)).rowcount
+        db.session.commit()
+        return n
+
+    def stats(self):
+        rows = db.session.execute(
+            select(Job.name, Job.status, func.count(), func.min(Job.run_at))
+            .group_by(Job.name, Job.status).order_by(Job.name, Job.status)
+        )
+        return [{"name": r[0], "status": r[1], "count": r[2], "oldest_run_at": r[3]} for r in rows]
+
+    def requeue_dead(self, name=None):
+        stmt = (update(Job).where(Job.status == DEAD)
+                .values(status=QUEUED, attempts=0, run_at=datetime.utcnow(), finished_at=None))
+        if name:
+            stmt = stmt.where(Job.name == name)
+        n = db.session.execute(stmt).rowcount
+        db.session.commit()
+        return n
+
+
+class JobWorker:
+    """
+    Claim-and-run loop behind `flask worker`: up to `threads` jobs run at
+    once, and each round trip claims at most `batch` of the free slots.
+    stop() (SIGTERM/SIGINT in the command) ends claiming; running jobs finish.
+    """
+
+    def __init__(self, app, registry, threads=4, batch=10, visibility=300.0, poll_interval=1.0):
+        self.app = app
+        self.registry = registry
+        self.threads = threads
+        self.batch = batch
+        self.visibility = visibility
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = {DONE: 0, QUEUED: 0, DEAD: 0}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # a slot freed up, or stop()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self, once=False):
+        """Work until stop(); with once=True, return as soon as nothing is due."""
+        pool = ThreadPoolExecutor(self.threads, thread_name_prefix="job")
+        started_at = datetime.utcnow()
+        last_prune = last_beat = 0.0
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    free = self.threads - self._in_flight
+                claimed = []
+                with self.app.app_context():
+                    if time.monotonic() - last_beat > HEARTBEAT_INTERVAL:
+                        self.registry.heartbeat(self.worker_id, started_at)
+                        last_beat = time.monotonic()
+                    if free:
+                        claimed = self.registry.claim(min(free, self.batch), self.visibility, self.worker_id)
+                        if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                            self.registry.prune()
+                            last_prune = time.monotonic()
+                with self._lock:
+                    self._in_flight += len(claimed)
+                for job in claimed:
+                    pool.submit(self._run, job)
+                if not claimed:
+                    if once and not self._in_flight:
+                        break
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            pool.shutdown(wait=True)
+            with self.app.app_context():
+                self.registry.forget_worker(self.worker_id)
+        return self.processed
+
+    def _run(self, job):
+        try:
+            with self.app.app_context():
+                entry = self.registry.tasks.get(job.name)
+                try:
+                    if entry is None:
+                        raise LookupError(f"no job registered as {job.name!r} in this worker")
+                    entry[0](**json.loads(job.payload))
+                except Exception:
+                    db.session.rollback()
+                    log.warning("job %s #%d attempt %d failed", job.name, job.id, job.attempts, exc_info=True)
+                    self.registry.fail(job, traceback.format_exc())
+                    outcome = DEAD if job.attempts >= job.max_attempts else QUEUED
+                else:
+                    self.registry.complete(job)
+                    outcome = DONE
+            with self._lock:
+                self.processed[outcome] += 1
+        except Exception:
+            log.exception("job %s #%d: could not record the result; its lease will expire", job.name, job.id)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+
+jobs = JobRegistry()
@@ -0,0 +1,39 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:  # optional speedup; the stdlib provider is used when it's missing
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Keys are not sorted (no need, and
+    it's the expensive part); anything orjson can't encode natively goes
+    through Flask's usual default hook (Decimal, date, dataclasses, ...).
+    """
+
+    _options = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:  # caller asked for stdlib-specific options (indent, cls, ...)
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._options
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=option) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    if orjson is not None and app.config.get("FAST_JSON", True):
+        app.json = OrjsonProvider(app)
@@ -0,0 +1,501 @@
+"""
+Load benchmark driven by the Postman collection (`flask bench`).
+
+Every request in the collection becomes a scenario step keyed by
+"METHOD /rule[?query keys]". Steps are picked at random by weight (see
+DEFAULT_WEIGHTS; unlisted steps such as logout or admin deletes get 0 so a
+run doesn't destroy its own dataset). Path parameters and bodies are filled
+per virtual user from ids seen in earlier responses, so carts, checkouts and
+order lookups stay valid.
+
+Each virtual user is a thread with its own keep-alive HTTP connection to a
+locally started server (or --url). Results are per-step request counts,
+rps and p50/p95/p99 latency, written as JSON. Passing a baseline makes
+the run fail when p95 latency or total throughput gets worse than the
+tolerance allows, or when 5xx responses appear.
+
+Writes accumulate, so benchmark a throwaway copy of the database.
+"""
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlsplit, urlencode, parse_qsl
+
+from werkzeug.exceptions import HTTPException
+
+# the collection still uses the pre-rename /api/orders/checkout/... URLs
+LEGACY_PATHS = [
+    (re.compile(r"^GET /api/orders/checkout$"), r"GET /api/orders/list"),
+    (re.compile(r"^GET /api/orders/checkout/track/(.+)$"), r"GET /api/orders/track/\1"),
+    (re.compile(r"^GET /api/orders/checkout/(\d+)$"), r"GET /api/orders/\1"),
+    (re.compile(r"^POST /api/orders/checkout/add$"), r"POST /api/orders/checkout"),
+    (re.compile(r"^PUT /api/orders/checkout/update/(.+)$"), r"PUT /api/orders/cancel/\1"),
+    (re.compile(r"^DELETE /api/orders/checkout/(\d+)$"), r"DELETE /api/orders/\1"),
+]
+
+DEFAULT_WEIGHTS = {
+    "GET /api/products": 30,
+    "GET /api/products?category_id": 15,
+    "GET /api/cart": 10,
+    "POST /api/cart/add": 10,
+    "PUT /api/cart/update/<int:item_id>": 3,
+    "DELETE /api/cart/remove/<int:item_id>": 2,
+    "DELETE /api/cart/clear": 1,
+    "POST /api/orders/checkout": 4,
+    "GET /api/orders/list": 5,
+    "GET /api/orders/<int:order_id>": 3,
+    "GET /api/orders/track/<string:order_code>": 2,
+    "PUT /api/orders/cancel/<string:order_code>": 1,
+    "POST /api/auth/login": 2,
+    "POST /api/auth/register": 1,
+    "GET /api/admin/categories": 1,
+    "GET /api/admin/orders/<int:oid>": 1,
+    "PUT /api/admin/orders/<int:oid>/status": 1,
+    "POST /api/admin/products": 1,
+}
+
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+class BenchError(Exception):
+    pass
+
+
+# ---------- Scenario ----------
+class Step:
+    def __init__(self, label, method, endpoint, query, body, role):
+        self.label = label
+        self.method = method
+        self.endpoint = endpoint
+        self.query = query
+        self.body = body
+        self.role = role  # "customer", "admin" or None
+
+    def __repr__(self):
+        return f"<Step {self.label} as {self.role}>"
+
+
+def _raw_body(request):
+    body = request.get("body") or {}
+    if body.get("mode") != "raw" or not body.get("raw"):
+        return None
+    text = re.sub(r"^\s*//.*$", "", body["raw"], flags=re.M)  # Postman allows // comments
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _iter_requests(items, folders=()):
+    for it in items:
+        if "item" in it:
+            yield from _iter_requests(it["item"], folders + (it["name"],))
+        else:
+            yield folders, it["request"]
+
+
+def load_scenario(app, collection_path, weights=None):
+    """Map collection requests onto app routes: returns ([(Step, weight)], skipped)."""
+    with open(collection_path, encoding="utf-8") as f:
+        collection = json.load(f)
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    adapter = app.url_map.bind("localhost")
+
+    steps, skipped, seen = [], [], set()
+    for folders, req in _iter_requests(collection["item"]):
+        url = req["url"] if isinstance(req["url"], str) else req["url"].get("raw", "")
+        parts = urlsplit(url)
+        line = f"{req['method']} {parts.path}"
+        for pattern, repl in LEGACY_PATHS:
+            line = pattern.sub(repl, line)
+        method, path = line.split(" ", 1)
+        try:
+            endpoint, _ = adapter.match(path, method=method)
+        except HTTPException:
+            skipped.append(f"{req['method']} {url}")
+            continue
+
+        rule = next(r for r in app.url_map.iter_rules(endpoint) if method in r.methods)
+        query = dict(parse_qsl(parts.query))
+        label = f"{method} {rule.rule}" + (f"?{'&'.join(sorted(query))}" if query else "")
+        role = None
+        if (req.get("auth") or {}).get("type") == "bearer":
+            role = "admin" if folders and folders[0].lower().startswith("admin") else "customer"
+        if label in seen:  # e.g. GET /api/products appears in both panels
+            continue
+        seen.add(label)
+        steps.append((Step(label, method, endpoint, query, _raw_body(req), role), weights.get(label, 0)))
+    return [(s, w) for s, w in steps if w > 0], skipped
+
+
+# ---------- Per-user state ----------
+class SharedIds:
+    """Ids any virtual user has seen; used to fill path params and bodies."""
+
+    def __init__(self):
+        self.products = []
+        self.categories = []
+        self.orders = []
+        self._lock = threading.Lock()
+
+    def add(self, attr, values):
+        with self._lock:
+            pool = getattr(self, attr)
+            pool.extend(v for v in values if v not in pool)
+            del pool[:-5000]
+
+
+class VirtualUser:
+    def __init__(self, runner, index):
+        self.runner = runner
+        self.rng = random.Random(runner.seed * 1000 + index)
+        self.conn = http.client.HTTPConnection(runner.host, runner.port, timeout=runner.timeout)
+        self.email = f"bench-{runner.run_id}-{index}@bench.local"
+        self.password = "bench-pass"
+        self.token = None
+        self.cart_items = []
+        self.orders = []  # (id, order_code)
+
+    # ---- HTTP ----
+    def request(self, method, path, body=None, token=None, record=None):
+        headers = {"Accept": "application/json"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        t0 = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+            raw = resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            status, raw = 0, b""
+        elapsed = time.perf_counter() - t0
+        if record:
+            self.runner.record(record, status, elapsed)
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return status, data
+
+    def sign_up(self):
+        self.request("POST", "/api/auth/register",
+                     {"full_name": "Bench User", "email": self.email, "password": self.password})
+        status, data = self.request("POST", "/api/auth/login", {"email": self.email, "password": self.password})
+        if status != 200:
+            raise BenchError(f"benchmark user login failed ({status})")
+        self.token = data["access_token"]
+
+    # ---- id bookkeeping from responses ----
+    def observe(self, step, status, data):
+        shared = self.runner.shared
+        if status >= 400 or data is None:
+            return
+        if step.endpoint == "products.product_list":
+            shared.add("products", [p["id"] for p in data.get("items", [])])
+        elif step.endpoint == "cart.get_cart":
+            self.cart_items = [it["id"] for it in data]
+        elif step.endpoint == "cart.add_to_cart":
+            self.cart_items = []  # unknown until the next GET /api/cart
+        elif step.endpoint in ("cart.remove_item", "cart.clear_cart", "orders.checkout"):
+            self.cart_items = []
+        elif step.endpoint == "orders.my_orders":
+            self.orders = [(o["id"], o["order_code"]) for o in data]
+            shared.add("orders", [o["id"] for o in data])
+        elif step.endpoint == "admin.list_categories":
+            shared.add("categories", [c["id"] for c in data])
+        elif step.endpoint == "auth.login":
+            self.token = data["access_token"]
+
+    def ensure(self, step):
+        """Run prerequisite calls (recorded under their own labels) so `step` is valid."""
+        runner = self.runner
+        if step.endpoint in ("cart.update_cart", "cart.remove_item") and not self.cart_items:
+            self.call(runner.helper("GET /api/cart"))
+            if not self.cart_items:
+                self.call(runner.helper("POST /api/cart/add"))
+                self.call(runner.helper("GET /api/cart"))
+        elif step.endpoint == "orders.checkout" and not self.cart_items:
+            self.call(runner.helper("POST /api/cart/add"))
+        elif step.endpoint in ("orders.get_my_order", "orders.track_order", "orders.cancel_order") and not self.orders:
+            self.call(runner.helper("GET /api/orders/list"))
+
+    def fill(self, step):
+        """Path values and JSON body for `step`, or None if it can't be run yet."""
+        rng, shared = self.rng, self.runner.shared
+        values, body = dict(step.query), dict(step.body) if isinstance(step.body, dict) else step.body
+        ep = step.endpoint
+
+        if ep == "products.product_list" and "category_id" in values and shared.categories:
+            values["category_id"] = rng.choice(shared.categories)
+        elif ep == "cart.add_to_cart":
+            if not shared.products:
+                return None
+            body = {"product_id": rng.choice(shared.products), "qty": 1}
+        elif ep in ("cart.update_cart", "cart.remove_item"):
+            if not self.cart_items:
+                return None
+            values["item_id"] = rng.choice(self.cart_items)
+            if ep == "cart.update_cart":
+                body = {"qty": rng.randint(1, 3)}
+        elif ep in ("orders.get_my_order", "orders.delete_my_order"):
+            if not self.orders:
+                return None
+            values["order_id"] = rng.choice(self.orders)[0]
+        elif ep in ("orders.track_order", "orders.cancel_order"):
+            if not self.orders:
+                return None
+            values["order_code"] = rng.choice(self.orders)[1]
+        elif ep in ("admin.admin_get_order", "admin.update_order_status"):
+            if not shared.orders:
+                return None
+            values["oid"] = rng.choice(shared.orders)
+            if ep == "admin.update_order_status":
+                body = {"status": rng.choice(["paid", "shipped", "delivered"])}
+        elif ep == "admin.create_product":
+            if not shared.categories:
+                return None
+            body = dict(body or {}, name=f"bench-{uuid.uuid4().hex[:8]}", category_id=rng.choice(shared.categories))
+        elif ep == "auth.register":
+            body = {"full_name": "Bench User", "email": f"bench-{uuid.uuid4().hex}@bench.local", "password": "bench-pass"}
+        elif ep == "auth.login":
+            body = {"email": self.email, "password": self.password}
+
+        path_values = {k: v for k, v in values.items() if k not in step.query}
+        query = {k: v for k, v in values.items() if k in step.query}
+        path = self.runner.build(step.endpoint, path_values, step.method)
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        return path, body
+
+    def call(self, step):
+        if step is None:
+            return
+        self.ensure(step)
+        filled = self.fill(step)
+        if filled is None:
+            self.runner.record_skip(step.label)
+            return
+        path, body = filled
+        token = self.token if step.role == "customer" else self.runner.admin_token if step.role == "admin" else None
+        status, data = self.request(step.method, path, body, token, record=step.label)
+        self.observe(step, status, data)
+
+    def run(self, steps, weights, stop_at):
+        while time.perf_counter() < stop_at:
+            self.call(self.rng.choices(steps, weights)[0])
+
+
+# ---------- Runner ----------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class LoadRunner:
+    def __init__(self, app, base_url, concurrency=8, duration=30.0, warmup=5.0, seed=1,
+                 admin_email="admin@ecom.com", admin_password="admin123", timeout=30.0):
+        parts = urlsplit(base_url)
+        self.app = app
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.admin_email = admin_email
+        self.admin_password = admin_password
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self.shared = SharedIds()
+        self.admin_token = None
+        self._adapter = app.url_map.bind("localhost")
+        self._helpers = {}
+        self._lock = threading.Lock()
+        self._recording = False
+        self._latencies = defaultdict(list)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+        self._skips = defaultdict(int)
+
+    def build(self, endpoint, values, method):
+        return self._adapter.build(endpoint, values, method=method)
+
+    def helper(self, label):
+        return self._helpers.get(label)
+
+    def record(self, label, status, elapsed):
+        if not self._recording:
+            return
+        with self._lock:
+            self._latencies[label].append(elapsed)
+            self._statuses[label][status] += 1
+
+    def record_skip(self, label):
+        if self._recording:
+            with self._lock:
+                self._skips[label] += 1
+
+    def _prime(self, vu, steps):
+        """Admin token plus starting ids (products, categories, orders) before load starts."""
+        status, data = vu.request("POST", "/api/auth/login",
+                                  {"email": self.admin_email, "password": self.admin_password})
+        if status != 200:
+            raise BenchError(f"admin login failed ({status}); seed the DB first")
+        self.admin_token = data["access_token"]
+
+        path = "/api/products?limit=100"
+        for _ in range(10):
+            status, data = vu.request("GET", path)
+            if status != 200:
+                break
+            self.shared.add("products", [p["id"] for p in data["items"]])
+            if not data.get("next_cursor"):
+                break
+            path = f"/api/products?limit=100&after={data['next_cursor']}"
+        status, data = vu.request("GET", "/api/admin/categories", token=self.admin_token)
+        if status == 200:
+            self.shared.add("categories", [c["id"] for c in data])
+        if not self.shared.products:
+            raise BenchError("no products in the database; seed it first")
+
+        self._helpers = {step.label: step for step, _ in steps}
+
+    def run(self, weighted_steps):
+        steps = [s for s, _ in weighted_steps]
+        weights = [w for _, w in weighted_steps]
+        users = [VirtualUser(self, i) for i in range(self.concurrency)]
+        self._prime(users[0], weighted_steps)
+        for vu in users:
+            vu.sign_up()
+
+        start = time.perf_counter()
+        warm_until = start + self.warmup
+        stop_at = warm_until + self.duration
+        threads = [threading.Thread(target=vu.run, args=(steps, weights, stop_at), daemon=True) for vu in users]
+        for t in threads:
+            t.start()
+        time.sleep(max(0.0, warm_until - time.perf_counter()))
+        self._recording = True
+        measured_from = time.perf_counter()
+        for t in threads:
+            t.join()
+        self._recording = False
+        elapsed = time.perf_counter() - measured_from
+        for vu in users:
+            vu.conn.close()
+        return self.results(elapsed)
+
+    def results(self, elapsed):
+        endpoints, all_latencies = {}, []
+        total = server_errors = 0
+        for label in sorted(set(self._latencies) | set(self._skips)):
+            lat = sorted(self._latencies.get(label, []))
+            statuses = self._statuses.get(label, {})
+            errors = sum(n for s, n in statuses.items() if s == 0 or s >= 500)
+            endpoints[label] = {
+                "requests": len(lat),
+                "rps": round(len(lat) / elapsed, 2),
+                **{f"p{p}_ms": round(percentile(lat, p) * 1000, 2) for p in LATENCY_PERCENTILES},
+                "status": {str(s): n for s, n in sorted(statuses.items())},
+                "server_errors": errors,
+                "skipped": self._skips.get(label, 0),
+            }
+            total += len(lat)
+            server_errors += errors
+            all_latencies.extend(lat)
+        all_latencies.sort()
+        return {
+            "meta": {
+                "concurrency": self.concurrency,
+                "duration_s": round(elapsed, 2),
+                "warmup_s": self.warmup,
+                "seed": self.seed,
+                "db_profile": self.app.config.get("DB_PROFILE"),
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "total": {
+                "requests": total,
+                "rps": round(total / elapsed, 2),
+                **{f"p{p}_ms": round(percentile(all_latencies, p) * 1000, 2) for p in LATENCY_PERCENTILES},
+                "server_errors": server_errors,
+            },
+            "endpoints": endpoints,
+        }
+
+
+# ---------- Baseline comparison ----------
+def compare(result, baseline, tolerance=0.2, min_requests=30):
+    """Regressions of `result` against `baseline` as human-readable strings."""
+    problems = []
+    cur, base = result["total"], baseline["total"]
+    if cur["rps"] < base["rps"] * (1 - tolerance):
+        problems.append(f"total rps {cur['rps']} < baseline {base['rps']} (-{tolerance:.0%} allowed)")
+    if cur["server_errors"] > base.get("server_errors", 0):
+        problems.append(f"server errors {cur['server_errors']} (baseline {base.get('server_errors', 0)})")
+    for label, now in result["endpoints"].items():
+        then = baseline["endpoints"].get(label)
+        if not then or now["requests"] < min_requests or then["requests"] < min_requests:
+            continue
+        if now["p95_ms"] > then["p95_ms"] * (1 + tolerance):
+            problems.append(f"{label}: p95 {now['p95_ms']}ms > baseline {then['p95_ms']}ms (+{tolerance:.0%} allowed)")
+    return problems
+
+
+# ---------- Local server ----------
+SERVERS = ("wsgi", "asgi")
+
+
+def start_local_server(app, port, env=None, server="wsgi"):
+    """
+    The app in a child process so the load generator doesn't share its GIL:
+    `flask run` (threaded WSGI) or `uvicorn asgi:app` (see app/asgi.py).
+    """
+    project_root = os.path.dirname(app.root_path)
+    if server == "asgi":
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port),
+               "--no-access-log", "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port),
+               "--no-reload", "--no-debugger", "--with-threads"]
+    proc = subprocess.Popen(cmd, cwd=project_root, env=dict(os.environ, FLASK_DEBUG="0", **(env or {})),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise BenchError(f"server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise BenchError("server did not become healthy within 30s")
+
+
+def format_table(result):
+    cols = ("requests", "rps", "p50_ms", "p95_ms", "p99_ms", "server_errors", "skipped")
+    width = max([len(l) for l in result["endpoints"]] + [5])
+    lines = [f"{'step':<{width}}  " + "  ".join(f"{c:>13}" for c in cols)]
+    for label, row in result["endpoints"].items():
+        lines.append(f"{label:<{width}}  " + "  ".join(f"{row.get(c, ''):>13}" for c in cols))
+    total = result["total"]
+    lines.append(f"{'TOTAL':<{width}}  " + "  ".join(f"{total.get(c, ''):>13}" for c in cols))
+    return "\n".join(lines)
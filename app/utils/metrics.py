@@ -0,0 +1,472 @@
+"""
+Request, SQL and connection-pool metrics in Prometheus text format.
+
+Hot path: each thread owns a shard (plain lists/ints it alone writes), so
+recording a sample takes no lock and allocates nothing once the endpoint's
+slot exists. A thread picks up the shard of a thread that has exited, if
+there is one, so with a thread per request (werkzeug's threaded server,
+`flask serve`) the number of shards tracks peak concurrency, not the number
+of requests served. Scrapes sum the shards.
+
+Multi-process (gunicorn, `flask serve`, ...): with METRICS_MULTIPROC_DIR set,
+every process writes its totals to <dir>/metrics-<pid>-<start ms>.json every
+METRICS_FLUSH_INTERVAL seconds and whichever process answers /metrics merges
+all files. The start time in the name keeps a recycled pid from overwriting
+the counters of the process that had it before. Counters of exited workers
+keep counting (like prometheus_client's multiprocess mode): a `flask serve`
+worker folds its file into <dir>/metrics-retired.json when it exits, the
+master does the same for a worker it reaps after a crash, and /metrics
+folds files of any other dead pid it finds, so the directory holds one file
+per live process plus one. Gauges of exited workers are dropped.
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+UNMATCHED = "<unmatched>"
+RETIRED_FILE = "metrics-retired.json"
+_SHARD_FILE_RE = re.compile(r"^metrics-(\d+)-(\d+)\.json$")
+
+
+def _histogram(n_buckets):
+    # per-bucket counts (+Inf last), then sum, then count
+    return [0] * (n_buckets + 1) + [0.0, 0]
+
+
+def _observe(hist, bounds, value):
+    hist[bisect_left(bounds, value)] += 1
+    hist[-2] += value
+    hist[-1] += 1
+
+
+class _Route:
+    """One endpoint's counters inside a shard."""
+    __slots__ = ("blueprint", "requests", "latency", "size", "sql")
+
+    def __init__(self, blueprint):
+        self.blueprint = blueprint
+        self.requests = {}  # method -> {status: n}
+        self.latency = _histogram(len(LATENCY_BUCKETS))
+        self.size = _histogram(len(SIZE_BUCKETS))
+        self.sql = [0, 0.0]  # statements, seconds
+
+
+class _Shard:
+    """Counters written by exactly one thread at a time (`owner`)."""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.routes = {}  # endpoint -> _Route
+        self.pool_wait = _histogram(len(POOL_WAIT_BUCKETS))
+        self.in_flight = 0
+
+    def route(self, endpoint, blueprint):
+        route = self.routes.get(endpoint)
+        if route is None:
+            route = self.routes[endpoint] = _Route(blueprint)
+        return route
+
+
+class Metrics:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._app = None
+        self.multiproc_dir = None
+        self.flush_interval = 5.0
+        self._flusher = None
+        self._flush_lock = threading.Lock()
+        self._started_ms = int(time.time() * 1000)
+        self._retired = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # the child starts from zero; the parent's numbers are in its own file
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._flusher = None
+        self._flush_lock = threading.Lock()
+        self._started_ms = int(time.time() * 1000)
+        self._retired = False
+
+    # ---------- recording ----------
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            me = threading.current_thread()
+            with self._shards_lock:  # once per thread
+                # the previous owner is gone, so there is still a single writer
+                shard = next((s for s in self._shards if not s.owner.is_alive()), None)
+                if shard is None:
+                    shard = _Shard(me)
+                    self._shards.append(shard)
+                shard.owner = me
+            self._local.shard = shard
+        return shard
+
+    def init_app(self, app):
+        self._app = app
+        self.multiproc_dir = app.config.get("METRICS_MULTIPROC_DIR")
+        self.flush_interval = app.config.get("METRICS_FLUSH_INTERVAL", self.flush_interval)
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+        app.extensions["metrics"] = self
+
+        if not event.contains(Engine, "before_cursor_execute", _sql_start):
+            event.listen(Engine, "before_cursor_execute", _sql_start)
+            event.listen(Engine, "after_cursor_execute", _sql_end)
+
+        with app.app_context():
+            from app.extensions import db
+            for engine in db.engines.values():
+                self._time_pool_checkouts(engine.pool)
+
+        @app.before_request
+        def _metrics_start():
+            g._metrics_t0 = time.perf_counter()
+            g._metrics_in_flight = True
+            self._shard().in_flight += 1
+            if self._flusher is None and self.multiproc_dir:  # first request after fork()
+                self._ensure_flusher()
+
+        @app.after_request
+        def _metrics_record(response):
+            t0 = g.pop("_metrics_t0", None)
+            if t0 is None:
+                return response
+            route = self._request_route()
+            _observe(route.latency, LATENCY_BUCKETS, time.perf_counter() - t0)
+            size = response.calculate_content_length()
+            if size is not None:
+                _observe(route.size, SIZE_BUCKETS, size)
+            by_status = route.requests.get(request.method)
+            if by_status is None:
+                by_status = route.requests[request.method] = {}
+            status = response.status_code
+            by_status[status] = by_status.get(status, 0) + 1
+            return response
+
+        @app.teardown_request
+        def _metrics_done(exc):
+            if g.pop("_metrics_in_flight", False):
+                self._shard().in_flight -= 1
+
+        self._ensure_flusher()
+
+    def _request_route(self):
+        shard = self._shard()
+        endpoint = request.endpoint or UNMATCHED
+        route = shard.routes.get(endpoint)
+        if route is None:
+            route = shard.route(endpoint, request.blueprint or "app")
+        return route
+
+    def record_sql(self, seconds):
+        if has_request_context():
+            route = self._request_route()
+        else:
+            route = self._shard().route("-", "-")  # background threads, CLI
+        sql = route.sql
+        sql[0] += 1
+        sql[1] += seconds
+
+    def _time_pool_checkouts(self, pool):
+        if not isinstance(pool, QueuePool) or getattr(pool, "_metrics_wrapped", False):
+            return
+        do_get = pool._do_get
+
+        def timed_do_get():
+            t0 = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                _observe(self._shard().pool_wait, POOL_WAIT_BUCKETS, time.perf_counter() - t0)
+        pool._do_get = timed_do_get
+        pool._metrics_wrapped = True
+
+    # ---------- snapshots ----------
+    def snapshot(self):
+        """This process's totals as a JSON-able dict."""
+        requests, latency, size, sql = {}, {}, {}, {}
+        pool_wait = _histogram(len(POOL_WAIT_BUCKETS))
+        in_flight = 0
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for endpoint, route in list(shard.routes.items()):
+                key = f"{route.blueprint}|{endpoint}"
+                for method, by_status in list(route.requests.items()):
+                    for status, n in list(by_status.items()):
+                        rkey = f"{key}|{method}|{status}"
+                        requests[rkey] = requests.get(rkey, 0) + n
+                if route.latency[-1]:  # count; 0 for a route that has only run SQL so far
+                    _accumulate(latency, key, route.latency)
+                    _accumulate(size, key, route.size)
+                if route.sql[0]:
+                    _accumulate(sql, key, route.sql)
+            pool_wait = [a + b for a, b in zip(pool_wait, shard.pool_wait)]
+            in_flight += shard.in_flight
+
+        pools = {}
+        if self._app is not None:
+            from app.extensions import db
+            with self._app.app_context():
+                for bind, engine in db.engines.items():
+                    p = engine.pool
+                    if isinstance(p, QueuePool):
+                        pools[bind or "default"] = [p.size(), p.checkedout(), max(p.overflow(), 0)]
+        return {"pid": os.getpid(), "requests": requests, "latency": latency, "size": size, "sql": sql,
+                "pool_wait": pool_wait, "in_flight": in_flight, "pools": pools}
+
+    def _write_snapshot(self):
+        with self._flush_lock:
+            if self._retired:
+                return  # already folded; rewriting the file would count it twice
+            path = os.path.join(self.multiproc_dir, f"metrics-{os.getpid()}-{self._started_ms}.json")
+            _write_json(path, self.snapshot())
+
+    def retire(self):
+        """
+        Final flush at process exit: fold this process's totals into the
+        retired file and stop flushing.
+        """
+        if not self.multiproc_dir:
+            return
+        self._write_snapshot()
+        with self._flush_lock:
+            self._retired = True
+        self.fold({os.getpid()})
+
+    def fold(self, pids):
+        """Move the counters in the files of exited processes `pids` into the retired file."""
+        if not self.multiproc_dir or not pids:
+            return
+        with self._dir_lock():
+            names = [name for pid, name in self._shard_files() if pid in pids]
+            if not names:
+                return
+            retired = _read_json(os.path.join(self.multiproc_dir, RETIRED_FILE)) or _empty_counters()
+            # names folded before but not yet unlinked (a crash in between) aren't added twice
+            existing = set(os.listdir(self.multiproc_dir))
+            folded = {n for n in retired.get("folded", []) if n in existing}
+            for name in names:
+                if name in folded:
+                    continue
+                snap = _read_json(os.path.join(self.multiproc_dir, name))
+                if snap is not None:
+                    _merge_counters(retired, snap)
+                folded.add(name)
+            retired["folded"] = sorted(folded)
+            _write_json(os.path.join(self.multiproc_dir, RETIRED_FILE), retired)
+            for name in names:
+                try:
+                    os.unlink(os.path.join(self.multiproc_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    @contextmanager
+    def _dir_lock(self):
+        # folds from different processes must not interleave
+        with open(os.path.join(self.multiproc_dir, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _shard_files(self):
+        out = []
+        for name in os.listdir(self.multiproc_dir):
+            m = _SHARD_FILE_RE.match(name)
+            if m:
+                out.append((int(m.group(1)), name))
+        return out
+
+    def _ensure_flusher(self):
+        if not self.multiproc_dir:
+            return
+        with self._shards_lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            try:
+                self._write_snapshot()
+            except Exception:
+                log.exception("metrics flush failed")
+            time.sleep(self.flush_interval)
+
+    def collect(self):
+        """Snapshots of every live/finished process (just this one without a multiproc dir)."""
+        if not self.multiproc_dir:
+            return [self.snapshot()]
+        self._ensure_flusher()  # also restarts it in a forked worker
+        self._write_snapshot()
+        self.fold({pid for pid, _ in self._shard_files() if not _pid_alive(pid)})
+        snaps = []
+        for _, name in self._shard_files():
+            snap = _read_json(os.path.join(self.multiproc_dir, name))
+            if snap is not None:
+                snaps.append(snap)
+        retired = _read_json(os.path.join(self.multiproc_dir, RETIRED_FILE))
+        if retired is not None:
+            snaps.append(dict(retired, in_flight=0, pools={}))
+        return snaps
+
+    # ---------- exposition ----------
+    def render(self):
+        snaps = self.collect()
+        merged = _empty_counters()
+        pools = {}
+        in_flight = 0
+        for snap in snaps:
+            _merge_counters(merged, snap)
+            in_flight += snap["in_flight"]
+            for bind, values in snap["pools"].items():
+                acc = pools.get(bind, [0, 0, 0])
+                pools[bind] = [a + b for a, b in zip(acc, values)]
+
+        out = []
+        out += _header("http_requests_total", "counter", "HTTP requests by route, method and status.")
+        for k, n in sorted(merged["requests"].items()):
+            bp, ep, method, status = k.split("|")
+            out.append(f"http_requests_total{_labels(blueprint=bp, endpoint=ep, method=method, status=status)} {n}")
+
+        out += _header("http_requests_in_flight", "gauge", "Requests being handled right now.")
+        out.append(f"http_requests_in_flight {in_flight}")
+
+        out += _histogram_lines("http_request_duration_seconds", "Request latency by route.",
+                                LATENCY_BUCKETS, merged["latency"])
+        out += _histogram_lines("http_response_size_bytes", "Response body size by route.",
+                                SIZE_BUCKETS, merged["size"])
+
+        out += _header("db_statements_total", "counter", "SQL statements executed, by route.")
+        for k, (n, _) in sorted(merged["sql"].items()):
+            bp, ep = k.split("|")
+            out.append(f"db_statements_total{_labels(blueprint=bp, endpoint=ep)} {n}")
+        out += _header("db_statement_seconds_total", "counter", "Time spent executing SQL, by route.")
+        for k, (_, secs) in sorted(merged["sql"].items()):
+            bp, ep = k.split("|")
+            out.append(f"db_statement_seconds_total{_labels(blueprint=bp, endpoint=ep)} {secs:.6f}")
+
+        out += _histogram_lines("db_pool_checkout_wait_seconds", "Time waiting for a pooled connection.",
+                                POOL_WAIT_BUCKETS, {"": merged["pool_wait"]})
+        for metric, idx, help_ in (("db_pool_size", 0, "Configured pool size."),
+                                   ("db_pool_checked_out", 1, "Connections currently checked out."),
+                                   ("db_pool_overflow", 2, "Connections open beyond pool_size.")):
+            out += _header(metric, "gauge", help_)
+            for bind, values in sorted(pools.items()):
+                out.append(f"{metric}{_labels(bind=bind)} {values[idx]}")
+        return "\n".join(out) + "\n"
+
+
+def _accumulate(dst, key, values):
+    acc = dst.get(key)
+    dst[key] = list(values) if acc is None else [a + b for a, b in zip(acc, values)]
+
+
+def _empty_counters():
+    return {"requests": {}, "latency": {}, "size": {}, "sql": {},
+            "pool_wait": _histogram(len(POOL_WAIT_BUCKETS))}
+
+
+def _merge_counters(dst, snap):
+    """Add a snapshot's counters (not its gauges) into `dst`."""
+    for k, n in snap["requests"].items():
+        dst["requests"][k] = dst["requests"].get(k, 0) + n
+    for name in ("latency", "size", "sql"):
+        for k, values in snap[name].items():
+            _accumulate(dst[name], k, values)
+    dst["pool_wait"] = [a + b for a, b in zip(dst["pool_wait"], snap["pool_wait"])]
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _header(name, kind, help_):
+    return [f"# HELP {name} {help_}", f"# TYPE {name} {kind}"]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    labels = {k: v for k, v in labels.items() if v != ""}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name, help_, bounds, series):
+    out = _header(name, "histogram", help_)
+    for key, hist in sorted(series.items()):
+        bp, ep = key.split("|") if key else ("", "")
+        cumulative = 0
+        for bound, n in zip(bounds + (float("inf"),), hist[:-2]):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            out.append(f"{name}_bucket{_labels(blueprint=bp, endpoint=ep, le=le)} {cumulative}")
+        out.append(f"{name}_sum{_labels(blueprint=bp, endpoint=ep)} {hist[-2]:.6f}")
+        out.append(f"{name}_count{_labels(blueprint=bp, endpoint=ep)} {hist[-1]}")
+    return out
+
+
+def _sql_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_t0 = time.perf_counter()
+
+
+def _sql_end(conn, cursor, statement, parameters, context, executemany):
+    t0 = getattr(context, "_metrics_t0", None)
+    if t0 is not None:
+        metrics.record_sql(time.perf_counter() - t0)
+
+
+metrics = Metrics()
@@ -0,0 +1,153 @@
+"""
+Micro-benchmarks for single hot components (`flask bench-suggest`,
+`flask bench-passwords`).
+
+Unlike `flask bench` these skip HTTP and time one component in-process
+against the configured database, so the numbers isolate that component.
+Seed a realistically sized database first, e.g.
+`flask seed-bulk --products 100000`.
+"""
+import os
+import random
+import threading
+import time
+
+from app.utils.loadbench import percentile
+
+
+def _latency_stats(samples_us):
+    samples_us.sort()
+    return {
+        "n": len(samples_us),
+        "p50_us": round(percentile(samples_us, 50), 1),
+        "p95_us": round(percentile(samples_us, 95), 1),
+        "p99_us": round(percentile(samples_us, 99), 1),
+        "max_us": round(samples_us[-1], 1) if samples_us else 0.0,
+    }
+
+
+def suggest_latency(app, requests=20000, max_prefix=5, limit=10, seed=1):
+    """
+    Build the suggest index, then time `requests` lookups of random 1..max_prefix
+    character prefixes of real product names, both on the index directly and
+    through GET /api/products/suggest (test client, no network). The index
+    pass starts with an empty top-N memo, so its tail includes the first hit
+    of every broad prefix; the endpoint pass runs on the warmed index.
+    """
+    from app.utils.suggest import suggest_index
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        suggest_index.rebuild()
+        build_s = time.perf_counter() - t0
+    names = [name for name, _, _ in suggest_index._snap.products.values()]
+    if not names:
+        raise RuntimeError("no products in the database; run `flask seed-bulk` first")
+
+    rng = random.Random(seed)
+    prefixes = []
+    for _ in range(requests):
+        word = rng.choice(rng.choice(names).split() or ["a"])
+        prefixes.append(word[:rng.randint(1, max_prefix)])
+
+    index_us = []
+    for p in prefixes:
+        t0 = time.perf_counter()
+        suggest_index.suggest(p, limit)
+        index_us.append((time.perf_counter() - t0) * 1e6)
+
+    client = app.test_client()
+    endpoint_us = []
+    for p in prefixes[:min(requests, 5000)]:
+        t0 = time.perf_counter()
+        resp = client.get("/api/products/suggest", query_string={"prefix": p, "limit": limit})
+        endpoint_us.append((time.perf_counter() - t0) * 1e6)
+        if resp.status_code != 200:
+            raise RuntimeError(f"suggest returned {resp.status_code} for {p!r}")
+
+    # single-product writes edit the key list in place; time a rename and a delete
+    pid = max(suggest_index._snap.products)
+    name = suggest_index._snap.products[pid][0]
+    t0 = time.perf_counter()
+    suggest_index.upsert(pid, f"Renamed {name}")
+    upsert_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    suggest_index.remove(pid)
+    remove_ms = (time.perf_counter() - t0) * 1000
+    suggest_index.upsert(pid, name)
+
+    return {
+        "products": len(names),
+        "keys": len(suggest_index._snap.keys),
+        "build_ms": round(build_s * 1000, 1),
+        "upsert_ms": round(upsert_ms, 3),
+        "remove_ms": round(remove_ms, 3),
+        "index": _latency_stats(index_us),
+        "endpoint": _latency_stats(endpoint_us),
+    }
+
+
+def _run_for(duration, threads, fn):
+    """Call fn() from `threads` threads for `duration` seconds; per-call latencies in us."""
+    stop = time.perf_counter() + duration
+    samples, errors = [], []
+
+    def loop():
+        mine = []
+        try:
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                fn()
+                mine.append((time.perf_counter() - t0) * 1e6)
+        except Exception as e:  # reported, not raised from a thread
+            errors.append(e)
+        samples.extend(mine)
+
+    pool = [threading.Thread(target=loop) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    if errors:
+        raise RuntimeError(f"{len(errors)} callers failed: {errors[0]!r}")
+    return samples, time.perf_counter() - t0
+
+
+def password_throughput(app, duration=10.0, concurrency=None, email=None, password=None):
+    """
+    Verifications per second with the configured PASSWORD_HASH_METHOD, on the
+    hasher pool directly and, given an account, through POST /api/auth/login.
+    Per-core figures divide by the cores the pool can use.
+    """
+    from app.utils.passwords import password_hasher
+
+    cores = min(password_hasher.workers, os.cpu_count() or 1)
+    concurrency = concurrency or password_hasher.workers * 2
+    pw_hash = password_hasher.hash("benchmark-password")
+
+    def verify():
+        password_hasher.verify(pw_hash, "benchmark-password")
+
+    def rate(samples, elapsed):
+        per_s = len(samples) / elapsed
+        return {"per_s": round(per_s, 1), "per_core_s": round(per_s / cores, 1), **_latency_stats(samples)}
+
+    result = {"method": password_hasher.method, "pool_workers": password_hasher.workers,
+              "cores": cores, "concurrency": concurrency}
+    result["verify"] = rate(*_run_for(duration, concurrency, verify))
+
+    if email:
+        local = threading.local()
+
+        def login():
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = app.test_client()
+            resp = client.post("/api/auth/login", json={"email": email, "password": password})
+            if resp.status_code != 200:
+                raise RuntimeError(f"login returned {resp.status_code}: {resp.get_json()}")
+
+        login()  # upgrades an outdated hash once, outside the measurement
+        result["login"] = rate(*_run_for(duration, concurrency, login))
+    return result
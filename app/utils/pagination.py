@@ -0,0 +1,84 @@
+import base64
+import json
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def _encode(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str, field: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = int(json.loads(base64.urlsafe_b64decode(padded.encode()))[field])
+    except (ValueError, TypeError, KeyError):
+        raise PaginationError("invalid cursor")
+    return value
+
+
+def encode_cursor(last_id: int) -> str:
+    return _encode({"id": last_id})
+
+
+def decode_cursor(cursor: str) -> int:
+    last_id = _decode(cursor, "id")
+    if last_id <= 0:
+        raise PaginationError("invalid cursor")
+    return last_id
+
+
+def encode_offset_cursor(offset: int) -> str:
+    return _encode({"o": offset})
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    offset = _decode(cursor, "o")
+    if offset < 0:
+        raise PaginationError("invalid cursor")
+    return offset
+
+
+def parse_limit(args) -> int:
+    raw_limit = args.get("limit")
+    try:
+        limit = int(raw_limit) if raw_limit else DEFAULT_LIMIT
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit <= 0:
+        raise PaginationError("limit must be greater than 0")
+    return min(limit, MAX_LIMIT)
+
+
+def parse_page_args(args):
+    """Read `limit` and `after` from request args -> (limit, after_id or None)."""
+    limit = parse_limit(args)
+    after = args.get("after")
+    after_id = decode_cursor(after) if after else None
+    return limit, after_id
+
+
+def keyset_page(q, id_col, limit, after_id):
+    """
+    Keyset pagination on a descending integer id column.
+    Fetches one extra row to know whether another page exists, so any page
+    costs an index seek + `limit` rows no matter how deep it is.
+    """
+    if after_id is not None:
+        q = q.filter(id_col < after_id)
+    return split_page(q.order_by(id_col.desc()).limit(limit + 1).all(), limit)
+
+
+def split_page(rows, limit):
+    """`limit + 1` rows fetched for a keyset page -> (page rows, next cursor or None)."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,87 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+# werkzeug's defaults for the params a method string may leave out
+_METHOD_DEFAULTS = {
+    "scrypt": ("32768", "8", "1"),  # N, r, p
+    "pbkdf2": ("sha256", str(DEFAULT_PBKDF2_ITERATIONS)),  # hash, iterations
+}
+
+
+def method_params(method: str) -> tuple:
+    """
+    ("scrypt", "32768", "8", "1") for "scrypt" or "scrypt:32768:8:1": the
+    method with werkzeug's defaults filled in, as it ends up in stored hashes.
+    """
+    name, *params = method.split(":")
+    defaults = _METHOD_DEFAULTS.get(name, ())
+    return (name, *params, *defaults[len(params):])
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    Runs password hashing/verification on a bounded thread pool.
+
+    scrypt/pbkdf2 release the GIL, so the pool uses every core while request
+    threads just wait on the result. At most `max_pending` jobs may be queued
+    or running; past that, callers wait up to `wait_timeout` seconds and then
+    get HasherBusy (turned into a 503) instead of piling up more CPU work.
+    """
+
+    def __init__(self, method="scrypt:32768:8:1", workers=None, max_pending=None, wait_timeout=2.0):
+        self.method = method
+        self._params = method_params(method)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.wait_timeout = wait_timeout
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # pool threads don't survive fork(); start a fresh pool on first use
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self._params = method_params(self.method)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS") or self.workers
+        self.max_pending = app.config.get("PASSWORD_HASH_MAX_PENDING") or self.workers * 4
+        self.wait_timeout = app.config.get("PASSWORD_HASH_WAIT_TIMEOUT", self.wait_timeout)
+        self._reset()
+        app.extensions["password_hasher"] = self
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HasherBusy()
+        try:
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="pwhash")
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pw_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash: str) -> bool:
+        # werkzeug stores "<method>:<params>$salt$hash", params always spelled out
+        return method_params(pw_hash.split("$", 1)[0]) != self._params
+
+
+password_hasher = PasswordHasher()
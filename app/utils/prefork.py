@@ -0,0 +1,418 @@
+"""
+Pre-fork server behind `flask serve`.
+
+The master builds the app once (create_app runs in the CLI process), binds
+the listening socket, closes its own DB connections and forks the workers.
+Each worker runs werkzeug's threaded WSGI server on the shared socket and
+opens fresh DB connections; the app's process-wide helpers reset themselves
+through os.register_at_fork. A worker is ready as soon as fork() returns,
+without re-importing or re-initialising the app.
+
+Workers send a heartbeat to the master over a pipe about once per second.
+It carries requests served, requests in flight and RSS. A worker retires
+itself after --max-requests (plus jitter) or once its RSS passes
+--max-memory. The master replaces any worker that exits and kills one whose
+heartbeat is --timeout seconds late.
+
+Signals to the master:
+  TERM, INT  graceful shutdown: workers stop accepting, finish in-flight
+             requests (up to --graceful-timeout) and exit
+  HUP        graceful reload: the master re-execs itself (fresh code and
+             config) on the same socket, starts new workers, then retires
+             the old ones, so no connection is refused
+  USR1       log the per-worker status table
+
+Set METRICS_MULTIPROC_DIR so /metrics aggregates all workers.
+"""
+import json
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+from app.extensions import db
+from app.utils.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+LISTEN_FD_ENV = "SERVE_LISTEN_FD"
+OLD_PIDS_ENV = "SERVE_OLD_PIDS"
+HEARTBEAT_INTERVAL = 1.0
+MASTER_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1}
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, KiB on Linux
+
+
+def _dispose_engines(app, close=True):
+    # close=False in a child: drop the inherited pool without touching the
+    # parent's connections (SQLAlchemy's recommended fork pattern)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+class _Worker:
+    """Runs inside the forked child."""
+
+    def __init__(self, server, pipe_fd, max_requests):
+        self.master = server
+        self.pipe_fd = pipe_fd
+        self.max_requests = max_requests
+        self.requests = 0
+        self.in_flight = 0
+        self.connections = 0  # accepted but not yet closed, a superset of in_flight
+        self.state = "serving"
+        self.retire_reason = None
+        self._lock = threading.Lock()
+        self._http = None
+
+    def run(self):
+        t0 = time.perf_counter()
+        signal.signal(signal.SIGTERM, lambda *_: self.retire("shutdown"))
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the whole group; the master decides
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, MASTER_SIGNALS)  # blocked by _spawn
+        app = self.master.app
+        _dispose_engines(app, close=False)
+
+        host, port = self.master.sock.getsockname()[:2]
+        self._http = make_server(host, port, self._wsgi, threaded=True, fd=self.master.sock.fileno())
+        self._track_connections(self._http)
+        threading.Thread(target=self._heartbeat_loop, name="serve-heartbeat", daemon=True).start()
+        log.info("worker %d ready in %.1f ms", os.getpid(), (time.perf_counter() - t0) * 1000)
+
+        self._http.serve_forever(poll_interval=0.5)
+
+        # stopped accepting: let in-flight requests finish
+        deadline = time.monotonic() + self.master.graceful_timeout
+        while (self.in_flight or self.connections) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._beat()
+        metrics.retire()  # counters survive the worker in the retired totals
+        log.info("worker %d exiting (%s) after %d requests", os.getpid(), self.retire_reason, self.requests)
+
+    def _track_connections(self, http):
+        # a connection accepted just before shutdown only reaches _wsgi once its
+        # handler thread has read the request; counting from accept() keeps the
+        # drain above (and the final metrics flush) from running ahead of it
+        process_request, process_request_thread = http.process_request, http.process_request_thread
+
+        def accepted(request, client_address):
+            with self._lock:
+                self.connections += 1
+            try:
+                process_request(request, client_address)
+            except BaseException:
+                self._closed()
+                raise
+
+        def handled(request, client_address):
+            try:
+                process_request_thread(request, client_address)
+            finally:
+                self._closed()
+
+        http.process_request, http.process_request_thread = accepted, handled
+
+    def _closed(self):
+        with self._lock:
+            self.connections -= 1
+
+    def _wsgi(self, environ, start_response):
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return ClosingIterator(self.master.app(environ, start_response), self._done)
+        except BaseException:
+            self._done()
+            raise
+
+    def _done(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            if self.max_requests and self.requests >= self.max_requests:
+                self.retire("max-requests")
+
+    def retire(self, reason):
+        if self.state != "serving" or self._http is None:
+            return
+        self.state, self.retire_reason = "retiring", reason
+        # shutdown() blocks until serve_forever notices, so never from its own thread
+        threading.Thread(target=self._http.shutdown, daemon=True).start()
+
+    def _heartbeat_loop(self):
+        max_memory = self.master.max_memory
+        while True:
+            rss = self._beat()
+            if max_memory and rss > max_memory:
+                self.retire("max-memory")
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    def _beat(self):
+        rss = _rss_bytes()
+        msg = json.dumps({"pid": os.getpid(), "requests": self.requests, "in_flight": self.in_flight,
+                          "rss": rss, "state": self.state}) + "\n"
+        try:
+            os.write(self.pipe_fd, msg.encode())
+        except OSError:
+            pass  # master went away or re-exec'd; keep serving until told to stop
+        return rss
+
+
+class PreforkServer:
+    def __init__(self, app, host="127.0.0.1", port=5000, workers=2, max_requests=0,
+                 max_requests_jitter=0, max_memory_mb=0, timeout=30.0, graceful_timeout=30.0,
+                 status_file=None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.status_file = status_file
+        self.sock = None
+        self.workers = {}   # pid -> status dict
+        self.retiring = set()
+        self._pipes = {}    # read fd -> pid
+        self._buffers = {}
+        self._signals = []
+        self._wake_r = self._wake_w = None
+        self._last_crash = 0.0
+
+    # ---------- master ----------
+    def run(self):
+        self.sock = self._listen()
+        _dispose_engines(self.app)
+        self._install_signals()
+        log.info("master %d listening on http://%s:%s with %d workers",
+                 os.getpid(), *self.sock.getsockname()[:2], self.num_workers)
+
+        for _ in range(self.num_workers):
+            self._spawn()
+        old = [int(p) for p in os.environ.pop(OLD_PIDS_ENV, "").split(",") if p]
+        for pid in old:  # workers of the master we were re-exec'd from
+            self._kill(pid, signal.SIGTERM)
+            self.retiring.add(pid)
+
+        stopping_since = None
+        while True:
+            self._poll()
+            self._reap()
+            for sig in self._drain_signals():
+                if sig in (signal.SIGTERM, signal.SIGINT) and stopping_since is None:
+                    log.info("master %d: graceful shutdown", os.getpid())
+                    stopping_since = time.monotonic()
+                    for pid in list(self.workers):
+                        self._kill(pid, signal.SIGTERM)
+                elif sig == signal.SIGHUP and stopping_since is None:
+                    self._reexec()
+                elif sig == signal.SIGUSR1:
+                    self.log_status()
+
+            if stopping_since is not None:
+                if not self.workers and not self.retiring:
+                    break
+                if time.monotonic() - stopping_since > self.graceful_timeout:
+                    for pid in list(self.workers) + list(self.retiring):
+                        self._kill(pid, signal.SIGKILL)
+                continue
+
+            self._kill_stuck()
+            missing = self.num_workers - sum(1 for w in self.workers.values() if w["state"] == "serving")
+            if missing > 0 and time.monotonic() - self._last_crash > 1.0:
+                for _ in range(missing):
+                    self._spawn()
+            self._write_status()
+
+        self._write_status()
+        self.sock.close()
+        log.info("master %d stopped", os.getpid())
+
+    def _listen(self):
+        fd = os.environ.pop(LISTEN_FD_ENV, None)
+        if fd:
+            return socket.socket(fileno=int(fd))
+        return socket.create_server((self.host, self.port), backlog=2048)
+
+    def _install_signals(self):
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+
+        def handler(signum, frame):
+            self._signals.append(signum)
+            try:
+                os.write(self._wake_w, b"!")
+            except OSError:
+                pass
+        for sig in MASTER_SIGNALS:
+            signal.signal(sig, handler)
+        # blocked across a reload's exec (see _reexec); pending ones arrive now
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, MASTER_SIGNALS)
+
+    def _drain_signals(self):
+        sigs, self._signals = self._signals, []
+        return sigs
+
+    def _spawn(self):
+        r, w = os.pipe()
+        jitter = random.randint(0, self.max_requests_jitter) if self.max_requests_jitter else 0
+        # a TERM right after fork must reach the worker's handler, not the master's
+        signal.pthread_sigmask(signal.SIG_BLOCK, MASTER_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(r)
+                os.close(self._wake_r)
+                os.close(self._wake_w)
+                for fd in self._pipes:
+                    os.close(fd)
+                _Worker(self, w, self.max_requests + jitter if self.max_requests else 0).run()
+            except BaseException:
+                log.exception("worker %d crashed", os.getpid())
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, MASTER_SIGNALS)
+        os.close(w)
+        os.set_blocking(r, False)
+        self._pipes[r] = pid
+        self._buffers[r] = b""
+        now = time.monotonic()
+        self.workers[pid] = {"pid": pid, "started": now, "last_seen": now, "requests": 0,
+                             "in_flight": 0, "rss": 0, "state": "serving"}
+        return pid
+
+    def _poll(self):
+        ready, _, _ = select.select([self._wake_r, *self._pipes], [], [], HEARTBEAT_INTERVAL)
+        for fd in ready:
+            if fd == self._wake_r:
+                os.read(fd, 4096)
+                continue
+            try:
+                chunk = os.read(fd, 65536)
+            except BlockingIOError:
+                continue
+            if not chunk:  # worker exited
+                self._close_pipe(fd)
+                continue
+            *lines, self._buffers[fd] = (self._buffers[fd] + chunk).split(b"\n")
+            worker = self.workers.get(self._pipes[fd])
+            if worker is None or not lines:
+                continue
+            try:
+                beat = json.loads(lines[-1])
+            except ValueError:
+                continue
+            worker.update(requests=beat["requests"], in_flight=beat["in_flight"], rss=beat["rss"],
+                          state=beat["state"], last_seen=time.monotonic())
+
+    def _close_pipe(self, fd):
+        os.close(fd)
+        self._pipes.pop(fd, None)
+        self._buffers.pop(fd, None)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.retiring.discard(pid)
+            metrics.fold({pid})  # a crashed worker didn't get to fold its last flush
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                log.warning("worker %d exited with %s after %d requests", pid, code, worker["requests"])
+                if time.monotonic() - worker["started"] < 1.0:
+                    self._last_crash = time.monotonic()  # crash loop: don't respawn flat out
+            for fd, owner in list(self._pipes.items()):
+                if owner == pid:
+                    self._close_pipe(fd)
+
+    def _kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _kill_stuck(self):
+        now = time.monotonic()
+        for pid, w in list(self.workers.items()):
+            limit = self.timeout + (self.graceful_timeout if w["state"] == "retiring" else 0)
+            if now - w["last_seen"] > limit:
+                log.warning("worker %d missed heartbeats for %.0fs, killing it", pid, now - w["last_seen"])
+                w["state"] = "killed"
+                self._kill(pid, signal.SIGKILL)
+
+    def _reexec(self):
+        log.info("master %d: graceful reload", os.getpid())
+        os.set_inheritable(self.sock.fileno(), True)
+        env = dict(os.environ)
+        env[LISTEN_FD_ENV] = str(self.sock.fileno())
+        env[OLD_PIDS_ENV] = ",".join(str(p) for p in list(self.workers) + list(self.retiring))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # the mask survives exec: a signal sent while the new master is still
+        # loading the app waits instead of killing it with the default action
+        signal.pthread_sigmask(signal.SIG_BLOCK, MASTER_SIGNALS)
+        os.execve(sys.executable, sys.orig_argv, env)
+
+    # ---------- status ----------
+    def status(self):
+        now = time.monotonic()
+        return {
+            "master": os.getpid(),
+            "listen": "%s:%s" % self.sock.getsockname()[:2],
+            "workers": [{
+                "pid": w["pid"],
+                "state": w["state"],
+                "age_s": round(now - w["started"], 1),
+                "requests": w["requests"],
+                "in_flight": w["in_flight"],
+                "rss_mb": round(w["rss"] / 1048576, 1),
+                "heartbeat_age_s": round(now - w["last_seen"], 1),
+            } for w in sorted(self.workers.values(), key=lambda w: w["started"])],
+            "retiring": sorted(self.retiring),
+        }
+
+    def log_status(self):
+        st = self.status()
+        log.info("master %d: %d workers (%d old ones retiring)", st["master"], len(st["workers"]), len(st["retiring"]))
+        for w in st["workers"]:
+            log.info("  worker %(pid)d %(state)s age %(age_s)ss requests %(requests)d "
+                     "in-flight %(in_flight)d rss %(rss_mb)sMB", w)
+
+    def _write_status(self):
+        if not self.status_file:
+            return
+        tmp = f"{self.status_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(tmp, self.status_file)
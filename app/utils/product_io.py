@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+import math
+
+from sqlalchemy import select
+
+PRODUCT_FIELDS = ["id", "name", "description", "price", "stock", "image_url", "category_id"]
+IMPORT_FIELDS = ["name", "description", "price", "stock", "image_url", "category_id"]
+TEXT_FIELDS = ("name", "description", "image_url")
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(content_type: str, fmt: str = None) -> str:
+    fmt = (fmt or "").lower()
+    if fmt in ("csv", "ndjson"):
+        return fmt
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    # plain application/json is a single document, not one object per line
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    return ""
+
+
+def iter_rows(stream, fmt: str):
+    """
+    Yield (row_number, dict or RowError) from a binary stream without ever
+    holding the whole body in memory.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for n, row in enumerate(reader, start=1):
+            yield n, row
+        return
+
+    for n, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield n, RowError("invalid JSON")
+            continue
+        if not isinstance(row, dict):
+            yield n, RowError("each line must be a JSON object")
+            continue
+        yield n, row
+
+
+def _text(row: dict, field: str) -> str:
+    value = row.get(field)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise RowError(f"{field} must be a string")
+    return value.strip()
+
+
+def validate_row(row: dict, category_ids: set) -> dict:
+    name, description, image_url = (_text(row, f) for f in TEXT_FIELDS)
+    price = row.get("price")
+    stock = row.get("stock")
+    category_id = row.get("category_id")
+    if not name or price in (None, "") or stock in (None, "") or category_id in (None, ""):
+        raise RowError("name, price, stock, category_id required")
+    try:
+        price = float(price)
+        stock = int(stock)
+        category_id = int(category_id)
+    except (TypeError, ValueError, OverflowError):
+        raise RowError("price, stock, category_id must be numbers")
+    if not math.isfinite(price) or price < 0:
+        raise RowError("price must be a finite number >= 0")
+    if stock < 0:
+        raise RowError("stock must be >= 0")
+    if category_id not in category_ids:
+        raise RowError(f"category_id {category_id} does not exist")
+
+    return {
+        "name": name[:140],
+        "description": description,
+        "price": price,
+        "stock": stock,
+        "image_url": image_url,
+        "category_id": category_id,
+    }
+
+
+def export_chunks(session, table, fmt: str, batch_size: int = 1000):
+    """
+    Stream the product table as CSV/NDJSON text chunks. Rows come from a
+    streaming cursor in `batch_size` batches, so memory stays flat however
+    large the table is.
+    """
+    cols = [table.c[f] for f in PRODUCT_FIELDS]
+    stmt = select(*cols).order_by(table.c.id)
+    result = session.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(PRODUCT_FIELDS)
+        for part in result.partitions():
+            writer.writerows(part)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.getvalue():
+            yield buf.getvalue()  # header only, table was empty
+        return
+
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for part in result.partitions():
+        yield "".join(dumps(dict(zip(PRODUCT_FIELDS, r))) + "\n" for r in part)
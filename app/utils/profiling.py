@@ -0,0 +1,291 @@
+"""
+On-demand per-request profiling.
+
+A request is profiled when it sends `X-Profile: sample|trace` (or
+`?__profile=sample|trace`) with an admin JWT, or when it is picked by
+random sampling at PROFILE_SAMPLE_RATE. The modes are:
+
+  sample  a helper thread snapshots the request thread's stack every
+          PROFILE_SAMPLE_INTERVAL seconds (low overhead, statistical)
+  trace   sys.setprofile records every call/return on the request thread
+          (exact, but slows the request down several times)
+
+Both produce collapsed stacks weighted in microseconds. SQL statements run
+on the request thread are captured with their timings. Profiles are JSON
+files in PROFILE_DIR (newest PROFILE_KEEP kept) and can be listed and
+downloaded as collapsed stacks or speedscope files via /api/admin/profiles.
+Without the flag a request pays for one header lookup (and a random() call
+when sampling is on); SQL listeners are only attached after the first
+profile.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MODES = ("sample", "trace")
+HEADER = "X-Profile"
+QUERY_FLAG = "__profile"
+_ID_CHARS = set("0123456789abcdef-")
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Profile:
+    def __init__(self, mode, trigger, interval):
+        self.mode = mode
+        self.trigger = trigger
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = {}  # stack tuple -> microseconds
+        self.sql = []
+        self._sql_t0 = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self.started = time.perf_counter()
+
+    # ---- sample mode ----
+    def _sample_loop(self):
+        frames = sys._current_frames
+        me = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None or self.thread_id == me:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + (now - last) * 1e6
+            last = now
+
+    # ---- trace mode ----
+    def _make_tracer(self):
+        stack, stacks = [], self.stacks
+        state = {"last": time.perf_counter()}
+
+        def tracer(frame, event_name, arg):
+            now = time.perf_counter()
+            if stack:
+                key = tuple(stack)
+                stacks[key] = stacks.get(key, 0) + (now - state["last"]) * 1e6
+            if event_name == "call":
+                stack.append(_frame_name(frame.f_code))
+            elif event_name == "c_call":
+                stack.append(f"{getattr(arg, '__qualname__', arg)} (builtin)")
+            elif stack and event_name in ("return", "c_return", "c_exception"):
+                stack.pop()
+            state["last"] = time.perf_counter()
+        return tracer
+
+    def start(self):
+        if self.mode == "trace":
+            sys.setprofile(self._make_tracer())
+        else:
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        if self.mode == "trace":
+            sys.setprofile(None)
+        else:
+            self._stop.set()
+            self._sampler.join()
+        self.duration = time.perf_counter() - self.started
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.directory = None
+        self.sample_rate = 0.0
+        self.interval = 0.001
+        self.keep = 200
+        self._active = {}  # thread id -> _Profile
+        self._sql_hooked = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+        self.sample_rate = app.config.get("PROFILE_SAMPLE_RATE", self.sample_rate)
+        self.interval = app.config.get("PROFILE_SAMPLE_INTERVAL", self.interval)
+        self.keep = app.config.get("PROFILE_KEEP", self.keep)
+        app.extensions["request_profiler"] = self
+
+        @app.before_request
+        def _maybe_profile():
+            flag = request.headers.get(HEADER) or request.args.get(QUERY_FLAG)
+            if flag:
+                mode = flag if flag in MODES else "sample"
+                if not self._is_admin():
+                    return
+                self._start(mode, "header")
+            elif self.sample_rate and random.random() < self.sample_rate:
+                self._start("sample", "random")
+
+        @app.after_request
+        def _tag_profile(response):
+            prof = g.get("_profile")
+            if prof is not None:
+                g._profile_status = response.status_code
+                response.headers["X-Profile-Id"] = prof.id
+            return response
+
+        @app.teardown_request
+        def _finish_profile(exc):
+            prof = g.pop("_profile", None)
+            if prof is not None:
+                self._finish(prof, g.pop("_profile_status", 500))
+
+    def _is_admin(self):
+        try:
+            verify_jwt_in_request(optional=True)
+            return get_jwt().get("role") == "admin"
+        except Exception:
+            return False
+
+    def _hook_sql(self):
+        with self._lock:
+            if self._sql_hooked:
+                return
+            event.listen(Engine, "before_cursor_execute", self._sql_start)
+            event.listen(Engine, "after_cursor_execute", self._sql_end)
+            self._sql_hooked = True
+
+    def _sql_start(self, conn, cursor, statement, parameters, context, executemany):
+        prof = self._active.get(threading.get_ident())
+        if prof is not None:
+            prof._sql_t0 = time.perf_counter()
+
+    def _sql_end(self, conn, cursor, statement, parameters, context, executemany):
+        prof = self._active.get(threading.get_ident())
+        if prof is not None and prof._sql_t0 is not None:
+            prof.sql.append({"statement": " ".join(statement.split()),
+                             "ms": round((time.perf_counter() - prof._sql_t0) * 1000, 3),
+                             "executemany": executemany})
+            prof._sql_t0 = None
+
+    def _start(self, mode, trigger):
+        self._hook_sql()
+        prof = _Profile(mode, trigger, self.interval)
+        prof.id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        prof.created_at = datetime.utcnow().isoformat()
+        prof.method, prof.path, prof.endpoint = request.method, request.full_path.rstrip("?"), request.endpoint
+        self._active[prof.thread_id] = prof
+        g._profile = prof
+        prof.start()
+
+    def _finish(self, prof, status):
+        prof.stop()
+        self._active.pop(prof.thread_id, None)
+        sql_ms = sum(s["ms"] for s in prof.sql)
+        data = {
+            "id": prof.id,
+            "created_at": prof.created_at,
+            "method": prof.method,
+            "path": prof.path,
+            "endpoint": prof.endpoint,
+            "status": status,
+            "mode": prof.mode,
+            "trigger": prof.trigger,
+            "duration_ms": round(prof.duration * 1000, 3),
+            "sql_count": len(prof.sql),
+            "sql_ms": round(sql_ms, 3),
+            "sql": prof.sql,
+            "stacks": [[";".join(k), round(v, 1)] for k, v in prof.stacks.items() if v >= 0.5],
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{prof.id}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(f"{path}.tmp", path)
+        self._prune()
+
+    def _prune(self):
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(".json"))
+        for name in names[:-self.keep] if self.keep else []:
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    # ---------- reading ----------
+    def recent(self, limit=50):
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((n for n in os.listdir(self.directory) if n.endswith(".json")), reverse=True)
+        out = []
+        for name in names[:limit]:
+            data = self.load(name[:-5])
+            if data:
+                del data["stacks"], data["sql"]
+                out.append(data)
+        return out
+
+    def load(self, profile_id):
+        if not profile_id or not set(profile_id) <= _ID_CHARS:
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def to_collapsed(data) -> str:
+    """Brendan Gregg's folded format: `frame;frame;frame <weight in us>` per line."""
+    lines = [f"{stack} {int(round(w))}" for stack, w in data["stacks"]]
+    lines += [f"SQL;{s['statement'][:200].replace(';', ',')} {int(round(s['ms'] * 1000))}"
+              for s in data["sql"]]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(data) -> dict:
+    """speedscope file: the request's stacks plus a second profile of its SQL statements."""
+    frames, index = [], {}
+
+    def frame_id(name):
+        if name not in index:
+            index[name] = len(frames)
+            frames.append({"name": name})
+        return index[name]
+
+    samples, weights = [], []
+    for stack, w in data["stacks"]:
+        samples.append([frame_id(f) for f in stack.split(";")])
+        weights.append(w)
+    sql_samples, sql_weights = [], []
+    for s in data["sql"]:
+        sql_samples.append([frame_id("SQL"), frame_id(s["statement"][:200])])
+        sql_weights.append(s["ms"] * 1000)
+
+    def profile(name, samples, weights):
+        return {"type": "sampled", "name": name, "unit": "microseconds",
+                "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights}
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{data['method']} {data['path']} ({data['mode']})",
+        "exporter": "ecom request profiler",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [profile(f"{data['endpoint']} ({data['duration_ms']} ms)", samples, weights),
+                     profile(f"SQL ({data['sql_count']} statements, {data['sql_ms']} ms)",
+                             sql_samples, sql_weights)],
+    }
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,71 @@
+import logging
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+_active_counters = []
+
+
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._sql_count = g.get("_sql_count", 0) + 1
+    for counter in _active_counters:
+        counter.append(statement)
+
+
+def query_budget(max_queries: int):
+    """Mark a view with the max number of SQL statements one request may issue."""
+    def decorator(fn):
+        fn._query_budget = max_queries
+        return fn
+    return decorator
+
+
+def request_query_count() -> int:
+    return g.get("_sql_count", 0) if has_request_context() else 0
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement executed inside the block (any engine)."""
+    statements = []
+    _active_counters.append(statements)
+    try:
+        yield statements
+    finally:
+        _active_counters.remove(statements)
+
+
+@contextmanager
+def max_queries(limit: int):
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > limit:
+        raise AssertionError(
+            f"expected at most {limit} SQL statements, got {len(statements)}:\n"
+            + "\n".join(statements)
+        )
+
+
+def init_query_counter(app):
+    if not event.contains(Engine, "before_cursor_execute", _on_execute):
+        event.listen(Engine, "before_cursor_execute", _on_execute)
+
+    @app.after_request
+    def _check_query_budget(response):
+        count = request_query_count()
+        if app.debug or app.testing:
+            response.headers["X-Query-Count"] = str(count)
+
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, "_query_budget", None)
+        if budget is not None and count > budget:
+            msg = f"{request.endpoint} issued {count} SQL statements (budget {budget})"
+            if app.config.get("SQL_QUERY_BUDGET_STRICT", app.testing):
+                raise AssertionError(msg)
+            log.warning(msg)
+        return response
@@ -0,0 +1,149 @@
+"""
+Query-plan regression check (`flask check-query-plans`).
+
+Drives the read endpoints through the test client against the configured
+database (seed it big first, e.g. with a copy of production), records every
+statement they issue, runs EXPLAIN QUERY PLAN on each one and reports any
+full scan of a real table. Lookups that write paths run before they modify
+rows are explained directly. Exits non-zero on a regression so it can gate CI.
+"""
+import re
+from datetime import datetime
+from dataclasses import dataclass, field
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, select, func, delete
+
+from app.extensions import db
+from app.models import CartItem, Category, Job, Order, Product, User
+from app.utils.catalog_cache import catalog_cache
+
+# (label, url template, as_admin); filled from ids that exist in the DB
+ENDPOINTS = [
+    ("products", "/api/products?limit=20", False),
+    ("products_next", "/api/products?limit=20&after={cursor}", False),
+    ("products_by_category", "/api/products?limit=20&category_id={category_id}", False),
+    ("products_search", "/api/products/search?q={term}", False),
+    ("cart", "/api/cart", False),
+    ("my_orders", "/api/orders/list", False),
+    ("my_order", "/api/orders/{order_id}", False),
+    ("admin_order", "/api/admin/orders/{order_id}", True),
+    ("admin_analytics", "/api/admin/analytics", True),
+]
+
+# tiny lookup tables, and the first keyset page (rowid-order scan cut off by LIMIT)
+ALLOWED_SCANS = {
+    ("*", "category"),
+    ("*", "code_sequence"),
+    ("products", "product"),
+}
+
+SCAN_RE = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+
+
+@dataclass
+class PlanReport:
+    label: str
+    sql: str
+    plan: list
+    scans: list = field(default_factory=list)
+
+
+def _write_lookups(user_id, product_id, order_code):
+    """Lookups behind write endpoints (and order status filtering), explained directly."""
+    return [
+        ("cart_add_lookup", select(CartItem.id).where(CartItem.user_id == user_id,
+                                                      CartItem.product_id == product_id)),
+        ("cart_clear", delete(CartItem).where(CartItem.user_id == user_id)),
+        ("order_by_code", select(Order.id).where(Order.order_code == order_code, Order.user_id == user_id)),
+        ("orders_by_status", select(Order.id).where(Order.status == "pending")
+                                              .order_by(Order.created_at.desc()).limit(50)),
+        ("job_claim", select(Job.id).where(Job.status.in_(("queued", "running")), Job.run_at <= datetime.utcnow())
+                                    .order_by(Job.run_at).limit(10)),
+    ]
+
+
+def _explain(conn, sql, params):
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params or ()).all()
+    return [r[3] for r in rows]
+
+
+def _full_scans(label, plan, tables):
+    scans = []
+    for detail in plan:
+        m = SCAN_RE.match(detail)
+        if not m or m.group(1) not in tables:
+            continue
+        table = m.group(1)
+        if ("*", table) in ALLOWED_SCANS or (label, table) in ALLOWED_SCANS:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def check_query_plans(app):
+    """Returns one PlanReport per distinct statement; `scans` lists violations."""
+    tables = set(db.metadata.tables)
+
+    with app.app_context():
+        admin = db.session.execute(select(User.id).where(User.role == "admin").limit(1)).scalar()
+        customer = db.session.execute(
+            select(Order.user_id).group_by(Order.user_id).order_by(func.count().desc()).limit(1)
+        ).scalar() or db.session.execute(select(User.id).limit(1)).scalar()
+        if admin is None or customer is None:
+            raise RuntimeError("need at least one admin and one customer in the database")
+        ids = {
+            "category_id": db.session.execute(select(func.min(Category.id))).scalar() or 0,
+            "order_id": db.session.execute(
+                select(func.max(Order.id)).where(Order.user_id == customer)).scalar() or 0,
+            "term": (db.session.execute(select(Product.name).limit(1)).scalar() or "a").split()[0],
+        }
+        order_code = db.session.execute(
+            select(Order.order_code).where(Order.id == ids["order_id"])).scalar() or ""
+        product_id = db.session.execute(select(func.min(Product.id))).scalar() or 0
+        tokens = {False: create_access_token(identity=str(customer), additional_claims={"role": "customer"}),
+                  True: create_access_token(identity=str(admin), additional_claims={"role": "admin"})}
+
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    client = app.test_client()
+    reports, seen = [], set()
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        cursor = ""
+        for label, url, as_admin in ENDPOINTS:
+            catalog_cache.clear()  # force the endpoint to hit the DB
+            captured.clear()
+            with app.app_context():  # fresh g per request, even under the CLI's context
+                resp = client.get(url.format(cursor=cursor, **ids),
+                                  headers={"Authorization": f"Bearer {tokens[as_admin]}"})
+            if label == "products" and resp.is_json:
+                cursor = resp.get_json().get("next_cursor") or ""
+            statements = list(captured)
+            with app.app_context(), db.engine.connect() as conn:
+                for sql, params in statements:
+                    if sql in seen:
+                        continue
+                    seen.add(sql)
+                    plan = _explain(conn, sql, params)
+                    reports.append(PlanReport(label, sql, plan, _full_scans(label, plan, tables)))
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", _capture)
+
+    with app.app_context(), db.engine.connect() as conn:
+        for label, stmt in _write_lookups(customer, product_id, order_code):
+            compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+            params = tuple(compiled.params[k] for k in compiled.positiontup)
+            plan = _explain(conn, str(compiled), params)
+            reports.append(PlanReport(label, str(compiled), plan, _full_scans(label, plan, tables)))
+
+    return reports
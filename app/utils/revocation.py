@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from app.models import RevokedToken
+
+log = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """
+    In-memory JWT blocklist: jti -> expiry (unix seconds).
+
+    `is_revoked` is a dict lookup, so @jwt_required adds no DB round trip.
+    The revoked_token table keeps entries durable across restarts: it is
+    loaded in create_app, and a daemon thread per process pulls rows added by
+    other workers (by id watermark) every `refresh_interval` seconds and
+    drops anything already expired.
+    A Bloom filter in front would not beat a dict lookup in CPython, so
+    there isn't one.
+    """
+
+    def __init__(self, refresh_interval=5.0):
+        self.refresh_interval = refresh_interval
+        self._revoked = {}
+        self._last_id = 0
+        self._app = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def init_app(self, app, jwt):
+        self.refresh_interval = app.config.get("JWT_REVOCATION_REFRESH", self.refresh_interval)
+        self._app = app
+        # the singleton outlives create_app(): start from this app's database only
+        self._revoked = {}
+        self._last_id = 0
+        app.extensions["revocation_list"] = self
+
+        @jwt.token_in_blocklist_loader
+        def _check_if_token_revoked(jwt_header, jwt_payload):
+            return self.is_revoked(jwt_payload["jti"])
+
+        with app.app_context():
+            self._sync(startup=True)
+
+    def is_revoked(self, jti: str) -> bool:
+        if self._thread is None or not self._thread.is_alive():  # also true after fork()
+            self._start_refresher()
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    def revoke(self, jti: str, exp: int):
+        from app.extensions import db
+
+        expires_at = datetime.utcfromtimestamp(exp)
+        db.session.execute(
+            insert(RevokedToken)
+            .values(jti=jti, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=["jti"])
+        )
+        # prune expired rows while we hold the write lock anyway; the newest
+        # row is kept so its id is never reused under other workers' watermark
+        newest = select(func.max(RevokedToken.id)).scalar_subquery()
+        db.session.execute(
+            delete(RevokedToken)
+            .where(RevokedToken.expires_at <= datetime.utcnow(), RevokedToken.id < newest)
+        )
+        db.session.commit()
+        self._revoked[jti] = exp
+
+    def _start_refresher(self):
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="jwt-revocation", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            with self._app.app_context():
+                self._sync()
+
+    def _sync(self, startup=False):
+        from app.extensions import db
+
+        try:
+            with db.engine.connect() as conn:
+                rows = conn.execute(
+                    select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+                    .where(RevokedToken.id > self._last_id)
+                    .order_by(RevokedToken.id)
+                ).all()
+
+            for row_id, jti, expires_at in rows:
+                self._revoked[jti] = (expires_at - datetime(1970, 1, 1)).total_seconds()
+                self._last_id = row_id
+            cutoff = time.time()
+            for jti in [j for j, exp in list(self._revoked.items()) if exp <= cutoff]:
+                self._revoked.pop(jti, None)
+        except OperationalError as e:
+            if not startup:
+                log.warning("revocation list refresh failed: %s", e)
+            # at startup: no table before `flask db upgrade`; the refresher loads it later
+        except SQLAlchemyError as e:
+            log.warning("revocation list refresh failed: %s", e)
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,33 @@
+import re
+
+from sqlalchemy import text
+
+from app.extensions import db
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+
+def build_match_query(q: str) -> str:
+    """
+    Turn free user input into a safe FTS5 MATCH expression.
+    Every word becomes a quoted prefix term ("iph"* "pro"*), so FTS5 syntax
+    characters in the input can never break the query.
+    """
+    terms = _TOKEN_RE.findall(q or "")[:MAX_TERMS]
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+SEARCH_IDS_SQL = text("""
+    SELECT rowid
+    FROM product_fts
+    WHERE product_fts MATCH :match
+    ORDER BY bm25(product_fts, 10.0, 1.0), rowid DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def search_product_ids(match: str, limit: int, offset: int = 0):
+    """Return product ids ordered by BM25 relevance (name weighted above description)."""
+    rows = db.session.execute(SEARCH_IDS_SQL, {"match": match, "limit": limit, "offset": offset})
+    return [r[0] for r in rows]
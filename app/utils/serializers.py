@@ -0,0 +1,113 @@
+"""
+Shared response serializers. Each one selects only the columns it renders
+and works on plain result rows, so no ORM entities are hydrated or tracked
+in the session for read-only endpoints.
+"""
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Category, Product, CartItem, Order, OrderItem, User
+from app.utils.images import image_url_for, image_srcset
+
+# ---------- Products ----------
+PRODUCT_COLS = (
+    Product.id, Product.name, Product.description, Product.price, Product.stock,
+    Product.image_url, Product.category_id, Category.name.label("category_name"),
+)
+
+def product_rows_select():
+    return select(*PRODUCT_COLS).outerjoin(Category, Category.id == Product.category_id)
+
+def product_rows_query():
+    return db.session.query(*PRODUCT_COLS).outerjoin(Category, Category.id == Product.category_id)
+
+def product_dicts(rows, base_url):
+    return [{
+        "id": r.id,
+        "name": r.name,
+        "description": r.description,
+        "price": r.price,
+        "stock": r.stock,
+        "image": image_url_for(r.image_url, base_url),
+        "srcset": image_srcset(r.image_url, base_url),
+        "category": None if r.category_name is None else {
+            "id": r.category_id,
+            "name": r.category_name
+        }
+    } for r in rows]
+
+# ---------- Cart ----------
+def cart_select(user_id):
+    return (
+        select(CartItem.id, CartItem.qty, Product.id.label("product_id"), Product.name,
+               Product.price, Product.image_url)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)  # oldest line first, same order on every read
+    )
+
+def cart_row_dicts(rows):
+    return [{
+        "id": r.id,
+        "qty": r.qty,
+        "product": {"id": r.product_id, "name": r.name, "price": r.price, "image_url": r.image_url}
+    } for r in rows]
+
+def cart_dicts(user_id):
+    return cart_row_dicts(db.session.execute(cart_select(user_id)))
+
+# ---------- Orders ----------
+ORDER_COLS = (Order.id, Order.order_code, Order.user_id, Order.status, Order.total, Order.created_at)
+
+def order_dict(r, with_customer=False):
+    d = {"id": r.id, "order_code": r.order_code}
+    if with_customer:
+        d["customer_id"] = r.user_id
+    d.update(status=r.status, total=r.total, created_at=r.created_at.isoformat())
+    return d
+
+def order_dicts(stmt, with_customer=False, with_items=False):
+    """
+    Serialize the orders selected by `stmt` (a select() of ORDER_COLS).
+    Items, when wanted, come from one extra IN query for all orders.
+    """
+    rows = db.session.execute(stmt).all()
+    orders = [order_dict(r, with_customer) for r in rows]
+    if not with_items:
+        return orders
+
+    if orders:
+        attach_order_items(orders, db.session.execute(order_items_select([o["id"] for o in orders])))
+    return orders
+
+def order_items_select(order_ids):
+    return (
+        select(OrderItem.order_id, OrderItem.product_id, OrderItem.name_snapshot,
+               OrderItem.price_snapshot, OrderItem.qty)
+        .where(OrderItem.order_id.in_(order_ids))
+        # (order_id, id) is ix_order_item_order_id's order; a bare ORDER BY id
+        # makes SQLite scan the table once the IN list gets long
+        .order_by(OrderItem.order_id, OrderItem.id)
+    )
+
+def attach_order_items(orders, rows):
+    """Attach order_items_select() rows to their order dicts as "items"."""
+    items = {o["id"]: [] for o in orders}
+    for it in rows:
+        items[it.order_id].append({
+            "product_id": it.product_id,
+            "name": it.name_snapshot,
+            "price": it.price_snapshot,
+            "qty": it.qty
+        })
+    for o in orders:
+        o["items"] = items[o["id"]]
+
+# ---------- Users ----------
+def user_dicts():
+    rows = db.session.execute(
+        select(User.id, User.full_name, User.email, User.role, User.created_at).order_by(User.id.desc())
+    )
+    return [{
+        "id": u.id, "full_name": u.full_name, "email": u.email, "role": u.role, "created_at": u.created_at.isoformat()
+    } for u in rows]
@@ -0,0 +1,257 @@
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import CacheVersion
+
+log = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+MAX_SUGGESTIONS = 20
+_CACHE_RANGE = 256  # prefixes matching more keys than this get their top-N memoized
+VERSION_ROW = "suggest_index"  # cache_version row bumped by every product write
+
+
+def _normalize(s: str) -> str:
+    return " ".join(_WORD_RE.findall((s or "").lower()))
+
+
+def _name_keys(name: str):
+    # "ThinkPad X1 Carbon" -> "thinkpad x1 carbon", "x1 carbon", "carbon"
+    words = _normalize(name).split(" ")
+    return tuple(" ".join(words[i:]) for i in range(len(words)) if words[i])
+
+
+class _Snapshot:
+    __slots__ = ("keys", "products", "top")
+
+    def __init__(self, keys, products):
+        self.keys = keys          # sorted list of (key, product_id)
+        self.products = products  # product_id -> (name, popularity, keys)
+        self.top = {}             # prefix -> memoized top-N ids; replaced, never cleared
+
+
+class SuggestIndex:
+    """
+    In-memory prefix index over product names for search-as-you-type.
+
+    Reads never lock. A rebuild swaps in a whole new snapshot; single
+    product writes (admin CRUD) edit the sorted key list in place under the
+    writer lock, one bisect insert/delete per key, which is atomic under the
+    GIL. Readers skip ids that vanish mid-lookup, and every write installs a
+    fresh memo dict, so a lookup that raced a write can't memoize into the
+    live one. Every word of the name is indexed, so "car" finds
+    "ThinkPad X1 Carbon".
+
+    The index is built on the first suggest request (or by `flask serve`
+    before it forks, so workers inherit it). Product writes bump a version
+    row in their transaction and apply the change to the index of the
+    process that made them, which then takes that version as its own; a
+    daemon thread per process polls the row every `refresh_interval`
+    seconds and rebuilds when another worker changed it.
+    """
+
+    def __init__(self, refresh_interval=5.0):
+        self.refresh_interval = refresh_interval
+        self._snap = _Snapshot([], {})
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._version = None
+        self._app = None
+        self._thread = None
+        self.ready = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.refresh_interval = app.config.get("SUGGEST_INDEX_REFRESH", self.refresh_interval)
+        self._app = app
+        app.extensions["suggest_index"] = self
+        if app.config.get("SUGGEST_INDEX_PRELOAD", False):
+            self.preload(app)
+
+    def preload(self, app):
+        with app.app_context():
+            try:
+                self.rebuild()
+            except SQLAlchemyError as e:  # e.g. tables not migrated yet
+                log.warning("suggest index not built at startup: %s", e)
+
+    def ensure_ready(self):
+        """Build on first use and keep the refresher running (also after fork())."""
+        if self._thread is None or not self._thread.is_alive():
+            self._start_refresher()
+        if not self.ready:
+            with self._build_lock:
+                if not self.ready:  # another request may have built it meanwhile
+                    self.rebuild()
+
+    # ---------- cross-process refresh ----------
+    @staticmethod
+    def bump_version():
+        """
+        Call inside the transaction of any product insert/update/delete;
+        returns the new version, to pass to upsert()/remove() after commit.
+        """
+        from app.extensions import db
+
+        return db.session.execute(
+            insert(CacheVersion).values(name=VERSION_ROW, version=1)
+            .on_conflict_do_update(index_elements=["name"],
+                                   set_={"version": CacheVersion.version + 1})
+            .returning(CacheVersion.version)
+        ).scalar()
+
+    @staticmethod
+    def _read_version(session):
+        return session.execute(
+            select(CacheVersion.version).where(CacheVersion.name == VERSION_ROW)
+        ).scalar() or 0
+
+    def _adopt(self, version):
+        # our own write is the only change since the last sync: the in-place
+        # edit brings the index up to `version`. Otherwise another worker
+        # wrote in between, and the refresher still has to rebuild.
+        if version is not None and self._version is not None and version == self._version + 1:
+            self._version = version
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="suggest-refresh", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            with self._app.app_context():
+                self.refresh()
+
+    def refresh(self):
+        """Rebuild if the version row moved since the last build; True if it did."""
+        from app.extensions import db
+
+        try:
+            if not self.ready or self._read_version(db.session) == self._version:
+                return False
+            with self._build_lock:
+                self.rebuild()
+            return True
+        except SQLAlchemyError as e:
+            log.warning("suggest index refresh failed: %s", e)
+            return False
+        finally:
+            db.session.remove()
+
+    def rebuild(self):
+        from app.extensions import db
+        from app.models import Product, OrderItem
+
+        # read first: a write landing during the build triggers another one
+        version = self._read_version(db.session)
+        sold = (db.session.query(OrderItem.product_id, func.sum(OrderItem.qty).label("sold"))
+                .group_by(OrderItem.product_id).subquery())
+        rows = (db.session.query(Product.id, Product.name, func.coalesce(sold.c.sold, 0))
+                .outerjoin(sold, sold.c.product_id == Product.id)
+                .all())
+
+        products, keys = {}, []
+        for pid, name, popularity in rows:
+            name_keys = _name_keys(name)
+            products[pid] = (name, int(popularity), name_keys)
+            keys.extend((k, pid) for k in name_keys)
+        keys.sort()
+
+        with self._lock:
+            self._snap = _Snapshot(keys, products)
+            self._version = version
+            self.ready = True
+
+    @staticmethod
+    def _drop_keys(keys, pid, name_keys):
+        for k in name_keys:
+            i = bisect_left(keys, (k, pid))
+            if i < len(keys) and keys[i] == (k, pid):
+                del keys[i]
+
+    def upsert(self, pid: int, name: str, popularity: int = None, version: int = None):
+        with self._lock:
+            snap = self._snap
+            old = snap.products.get(pid)
+            if popularity is None:
+                popularity = old[1] if old else 0
+            name_keys = _name_keys(name)
+            # products before keys: a reader never finds a key without its product
+            snap.products[pid] = (name, popularity, name_keys)
+            if old:
+                self._drop_keys(snap.keys, pid, set(old[2]) - set(name_keys))
+            for k in name_keys:
+                if not old or k not in old[2]:
+                    insort(snap.keys, (k, pid))
+            snap.top = {}
+            self._adopt(version)
+
+    def remove(self, pid: int, version: int = None):
+        with self._lock:
+            snap = self._snap
+            old = snap.products.get(pid)
+            if old:
+                self._drop_keys(snap.keys, pid, old[2])
+                del snap.products[pid]
+                snap.top = {}
+            self._adopt(version)
+
+    def add_popularity(self, counts: dict):
+        """Bump popularity for {product_id: units}; order ranking only, keys unchanged."""
+        with self._lock:
+            snap = self._snap
+            for pid, n in counts.items():
+                entry = snap.products.get(pid)
+                if entry:
+                    name, popularity, name_keys = entry
+                    snap.products[pid] = (name, popularity + n, name_keys)
+            snap.top = {}
+
+    def suggest(self, prefix: str, limit: int = 10):
+        snap = self._snap
+        p = _normalize(prefix)
+        if not p:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        top = snap.top  # before reading keys: a write after this point replaces it
+        products = snap.products
+        ids = top.get(p)
+        if ids is None:
+            lo = bisect_left(snap.keys, (p,))
+            hi = bisect_left(snap.keys, (p + "\uffff",), lo)
+            candidates = {pid for _, pid in snap.keys[lo:hi] if pid in products}
+            ids = heapq.nlargest(MAX_SUGGESTIONS, candidates,
+                                 key=lambda pid: (products.get(pid, ("", -1))[1], pid))
+            if hi - lo > _CACHE_RANGE:
+                top[p] = ids
+
+        out = []
+        for pid in ids:
+            entry = products.get(pid)  # None if removed since
+            if entry:
+                out.append({"id": pid, "name": entry[0]})
+                if len(out) == limit:
+                    break
+        return out
+
+
+suggest_index = SuggestIndex()
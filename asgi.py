@@ -0,0 +1,5 @@
+# optional ASGI mode (pip install -r requirements-async.txt):
+#   uvicorn asgi:app --port 5000
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
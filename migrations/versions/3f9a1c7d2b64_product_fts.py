@@ -0,0 +1,61 @@
+"""product full-text search (FTS5)
+
+Revision ID: 3f9a1c7d2b64
+Revises: c21f75baaac8
+Create Date: 2026-10-17 09:12:41.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7d2b64'
+down_revision = 'c21f75baaac8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # external-content FTS5 index over product(name, description);
+    # prefix='2 3' keeps short prefix queries ("ip*", "thi*") on the index
+    op.execute("""
+        CREATE VIRTUAL TABLE product_fts USING fts5(
+            name, description,
+            content='product', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+
+    # keep the index in sync for every writer (admin CRUD, bulk import, raw SQL)
+    op.execute("""
+        CREATE TRIGGER product_fts_ai AFTER INSERT ON product BEGIN
+            INSERT INTO product_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER product_fts_ad AFTER DELETE ON product BEGIN
+            INSERT INTO product_fts(product_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """)
+    # only name/description changes touch the index, stock/price updates don't
+    op.execute("""
+        CREATE TRIGGER product_fts_au AFTER UPDATE OF name, description ON product BEGIN
+            INSERT INTO product_fts(product_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO product_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """)
+
+    op.execute("INSERT INTO product_fts(product_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS product_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS product_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS product_fts_ai")
+    op.execute("DROP TABLE IF EXISTS product_fts")
@@ -0,0 +1,36 @@
+"""revoked token
+
+Revision ID: 5d7c0f3e91ab
+Revises: 8b2e4d61a0c5
+Create Date: 2026-10-17 10:41:55.730112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7c0f3e91ab'
+down_revision = '8b2e4d61a0c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_token',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('revoked_token', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_revoked_token_jti'), ['jti'], unique=True)
+        batch_op.create_index(batch_op.f('ix_revoked_token_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revoked_token', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_revoked_token_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_revoked_token_jti'))
+
+    op.drop_table('revoked_token')
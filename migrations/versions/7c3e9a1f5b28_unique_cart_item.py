@@ -0,0 +1,41 @@
+"""unique cart item per user and product
+
+Revision ID: 7c3e9a1f5b28
+Revises: e6b28d05c4a7
+Create Date: 2026-10-17 16:20:09.481733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9a1f5b28'
+down_revision = 'e6b28d05c4a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # fold duplicate lines into the oldest row before the index can be unique
+    op.execute(
+        'UPDATE cart_item SET qty = ('
+        ' SELECT sum(coalesce(d.qty, 1)) FROM cart_item AS d'
+        ' WHERE d.user_id = cart_item.user_id AND d.product_id = cart_item.product_id)'
+        ' WHERE id IN ('
+        ' SELECT min(id) FROM cart_item GROUP BY user_id, product_id HAVING count(*) > 1)'
+    )
+    op.execute(
+        'DELETE FROM cart_item WHERE id NOT IN ('
+        ' SELECT min(id) FROM cart_item GROUP BY user_id, product_id)'
+    )
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_item_user_id_product_id')
+        batch_op.create_index('ix_cart_item_user_id_product_id', ['user_id', 'product_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_item_user_id_product_id')
+        batch_op.create_index('ix_cart_item_user_id_product_id', ['user_id', 'product_id'], unique=False)
@@ -0,0 +1,31 @@
+"""order code sequence
+
+Revision ID: 8b2e4d61a0c5
+Revises: 3f9a1c7d2b64
+Create Date: 2026-10-17 10:03:12.204871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d61a0c5'
+down_revision = '3f9a1c7d2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    code_sequence = op.create_table('code_sequence',
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # old codes use a random 6-digit suffix; start at 7 digits so the
+    # sequence can never produce one of them
+    op.bulk_insert(code_sequence, [{'name': 'order_code', 'next_value': 1000000}])
+
+
+def downgrade():
+    op.drop_table('code_sequence')
@@ -0,0 +1,39 @@
+"""daily sales rollups
+
+Revision ID: a4c19e7b3f02
+Revises: 5d7c0f3e91ab
+Create Date: 2026-10-17 11:48:09.382615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c19e7b3f02'
+down_revision = '5d7c0f3e91ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_sales',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=30), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'status')
+    )
+    op.create_table('daily_product_sales',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    # existing history is loaded with `flask analytics-backfill`
+
+
+def downgrade():
+    op.drop_table('daily_product_sales')
+    op.drop_table('daily_sales')
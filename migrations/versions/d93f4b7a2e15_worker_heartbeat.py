@@ -0,0 +1,34 @@
+"""worker heartbeat
+
+Revision ID: d93f4b7a2e15
+Revises: b41d8e2c6f90
+Create Date: 2026-10-18 10:12:37.540219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93f4b7a2e15'
+down_revision = 'b41d8e2c6f90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('worker_heartbeat',
+    sa.Column('worker_id', sa.String(length=64), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('seen_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('worker_id')
+    )
+    with op.batch_alter_table('worker_heartbeat', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_worker_heartbeat_seen_at'), ['seen_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('worker_heartbeat', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_worker_heartbeat_seen_at'))
+
+    op.drop_table('worker_heartbeat')
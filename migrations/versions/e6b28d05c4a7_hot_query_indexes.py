@@ -0,0 +1,54 @@
+"""hot query indexes
+
+Revision ID: e6b28d05c4a7
+Revises: a4c19e7b3f02
+Create Date: 2026-10-17 14:02:51.217304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b28d05c4a7'
+down_revision = 'a4c19e7b3f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_category_id'), ['category_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_product_stock'), ['stock'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('ix_order_status_created_at', ['status', 'created_at'], unique=False)
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_item_product_id'), ['product_id'], unique=False)
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.create_index('ix_cart_item_user_id_product_id', ['user_id', 'product_id'], unique=False)
+        batch_op.drop_index(batch_op.f('ix_cart_item_user_id'))
+
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_cart_item_user_id'), ['user_id'], unique=False)
+        batch_op.drop_index('ix_cart_item_user_id_product_id')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_item_product_id'))
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_status_created_at')
+        batch_op.drop_index(batch_op.f('ix_order_created_at'))
+        batch_op.drop_index(batch_op.f('ix_order_user_id'))
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_stock'))
+        batch_op.drop_index(batch_op.f('ix_product_category_id'))
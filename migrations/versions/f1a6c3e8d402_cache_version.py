@@ -0,0 +1,38 @@
+"""cache version counters
+
+Revision ID: f1a6c3e8d402
+Revises: d93f4b7a2e15
+Create Date: 2026-10-18 14:05:21.318640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6c3e8d402'
+down_revision = 'd93f4b7a2e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_version',
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # the suggest index version used to live in the order code sequence table
+    op.execute(
+        "INSERT INTO cache_version (name, version) "
+        "SELECT name, next_value FROM code_sequence WHERE name = 'suggest_index'"
+    )
+    op.execute("DELETE FROM code_sequence WHERE name = 'suggest_index'")
+
+
+def downgrade():
+    op.execute(
+        "INSERT INTO code_sequence (name, next_value) "
+        "SELECT name, version FROM cache_version WHERE name = 'suggest_index'"
+    )
+    op.drop_table('cache_version')
@@ -2,5 +2,6 @@ from app import create_app
 
 app = create_app()
 
+# development server only; production: flask --app app serve (see app/utils/prefork.py)
 if __name__ == "__main__":
     app.run(debug=True)
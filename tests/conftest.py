@@ -0,0 +1,77 @@
+import os
+
+import pytest
+from flask_jwt_extended import create_access_token
+from flask_migrate import upgrade
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import CartItem, Category, Order, OrderItem, Product, User
+from app.utils.catalog_cache import catalog_cache
+from app.utils.suggest import suggest_index
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # a file DB (not :memory:) so threads in the concurrency tests share it
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(Config, "JWT_SECRET_KEY", "test-jwt-secret-" + "x" * 32)
+    monkeypatch.setattr(Config, "PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setattr(Config, "PROFILE_DIR", str(tmp_path / "profiles"))
+    app = create_app()
+    app.config.update(TESTING=True, SQL_QUERY_BUDGET_STRICT=True)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+    # module-level singletons outlive each test's app
+    catalog_cache.clear()
+    suggest_index.ready = False
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def token_for(app, user):
+    with app.app_context():
+        return create_access_token(identity=str(user.id), additional_claims={"role": user.role})
+
+
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def shop(app):
+    """Two categories, five products, an admin and a customer with a cart and orders."""
+    with app.app_context():
+        admin = User(full_name="Admin", email="admin@example.com", role="admin", password_hash="x")
+        customer = User(full_name="Customer", email="customer@example.com", role="customer", password_hash="x")
+        phones, laptops = Category(name="Phones"), Category(name="Laptops")
+        db.session.add_all([admin, customer, phones, laptops])
+        db.session.flush()
+        products = [Product(name=f"Product {i}", description="", price=10.0 * i, stock=5,
+                            category_id=(phones if i % 2 else laptops).id) for i in range(1, 6)]
+        db.session.add_all(products)
+        db.session.flush()
+        db.session.add_all(CartItem(user_id=customer.id, product_id=p.id, qty=1) for p in products[:3])
+        for n in range(3):
+            order = Order(user_id=customer.id, order_code=f"ORD-TEST-{n}", total=30.0, status="pending")
+            db.session.add(order)
+            db.session.flush()
+            db.session.add_all(OrderItem(order_id=order.id, product_id=p.id, name_snapshot=p.name,
+                                         price_snapshot=p.price, qty=1) for p in products[:2])
+        db.session.commit()
+        return {
+            "admin": token_for(app, admin),
+            "customer": token_for(app, customer),
+            "customer_id": customer.id,
+            "product_ids": [p.id for p in products],
+        }
@@ -0,0 +1,11 @@
+from conftest import auth
+
+
+def test_top_must_be_between_1_and_100(client, shop):
+    headers = auth(shop["admin"])
+    for top in ("0", "-1", "101"):
+        resp = client.get("/api/admin/analytics", query_string={"top": top}, headers=headers)
+        assert resp.status_code == 400
+    for top in ("1", "100"):
+        resp = client.get("/api/admin/analytics", query_string={"top": top}, headers=headers)
+        assert resp.status_code == 200
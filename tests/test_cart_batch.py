@@ -0,0 +1,67 @@
+import threading
+
+from app.extensions import db
+from app.models import CartItem
+
+from conftest import auth
+
+
+def _batch(client, token, *ops):
+    return client.post("/api/cart/batch", json={"ops": list(ops)}, headers=auth(token))
+
+
+def test_ops_apply_in_order_and_the_cart_comes_back_oldest_first(client, shop):
+    p1, p2, p3, p4, p5 = shop["product_ids"]  # p1..p3 are in the cart with qty 1
+    resp = _batch(
+        client, shop["customer"],
+        {"op": "add", "product_id": p5, "qty": 2},
+        {"op": "add", "product_id": p1, "qty": 2},
+        {"op": "set", "product_id": p2, "qty": 7},
+        {"op": "add", "product_id": p2},
+        {"op": "remove", "product_id": p3},
+        {"op": "add", "product_id": p3, "qty": 4},
+        {"op": "set", "product_id": p4, "qty": 0},
+        {"op": "remove", "product_id": p4},
+    )
+    assert resp.status_code == 200
+    assert [(i["product"]["id"], i["qty"]) for i in resp.get_json()] == [(p1, 3), (p2, 8), (p3, 4), (p5, 2)]
+    assert resp.get_json() == client.get("/api/cart", headers=auth(shop["customer"])).get_json()
+
+
+def test_invalid_op_rejects_the_whole_batch(client, shop):
+    p1 = shop["product_ids"][0]
+    before = client.get("/api/cart", headers=auth(shop["customer"])).get_json()
+    resp = _batch(client, shop["customer"], {"op": "add", "product_id": p1}, {"op": "add", "product_id": 10**6})
+    assert resp.status_code == 404 and resp.get_json()["product_ids"] == [10**6]
+    assert _batch(client, shop["customer"], {"op": "drop", "product_id": p1}).status_code == 400
+    assert client.get("/api/cart", headers=auth(shop["customer"])).get_json() == before
+
+
+def test_concurrent_single_adds_are_not_lost(app, shop):
+    headers = auth(shop["customer"])
+    product_id = shop["product_ids"][0]
+    threads_n, rounds = 8, 15
+    barrier = threading.Barrier(threads_n)
+    statuses = []
+
+    def run(i):
+        client = app.test_client()
+        barrier.wait()
+        for _ in range(rounds):
+            if i % 2:
+                resp = client.post("/api/cart/add", json={"product_id": product_id, "qty": 1}, headers=headers)
+            else:
+                resp = client.post("/api/cart/batch", headers=headers,
+                                   json={"ops": [{"op": "add", "product_id": product_id, "qty": 2}]})
+            statuses.append(resp.status_code)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(threads_n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert set(statuses) == {200}
+    with app.app_context():
+        qty = db.session.query(CartItem.qty).filter_by(user_id=shop["customer_id"], product_id=product_id).scalar()
+    assert qty == 1 + rounds * (threads_n // 2) * (1 + 2)
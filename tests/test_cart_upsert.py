@@ -0,0 +1,70 @@
+import threading
+
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import CartItem
+
+from conftest import MIGRATIONS, auth
+
+
+def test_parallel_adds_make_one_row_with_the_summed_qty(app, shop):
+    headers = auth(shop["customer"])
+    product_id = shop["product_ids"][4]  # not in the cart yet: the first adds race on INSERT
+    threads_n, adds = 12, 20
+    barrier = threading.Barrier(threads_n)
+    statuses = []
+
+    def add(qty):
+        client = app.test_client()
+        barrier.wait()
+        for _ in range(adds):
+            resp = client.post("/api/cart/add", json={"product_id": product_id, "qty": qty}, headers=headers)
+            statuses.append(resp.status_code)
+
+    threads = [threading.Thread(target=add, args=(1 + i % 3,)) for i in range(threads_n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert set(statuses) == {200}
+    with app.app_context():
+        rows = db.session.query(CartItem).filter_by(user_id=shop["customer_id"], product_id=product_id).all()
+    assert len(rows) == 1
+    assert rows[0].qty == adds * sum(1 + i % 3 for i in range(threads_n))
+
+
+def test_add_unknown_product_is_404(client, shop):
+    resp = client.post("/api/cart/add", json={"product_id": 10**6, "qty": 1}, headers=auth(shop["customer"]))
+    assert resp.status_code == 404
+
+
+def test_unique_cart_item_migration_folds_duplicates(app, shop):
+    user_id = shop["customer_id"]
+    p1, p2, p3 = shop["product_ids"][:3]  # the fixture put one of each in the cart
+    with app.app_context():
+        downgrade(directory=MIGRATIONS, revision="e6b28d05c4a7")  # before the unique index
+        db.session.execute(
+            text("INSERT INTO cart_item (user_id, product_id, qty) VALUES (:u, :p, :q)"),
+            [{"u": user_id, "p": p1, "q": 2}, {"u": user_id, "p": p1, "q": None},
+             {"u": user_id, "p": p2, "q": 4}],
+        )
+        db.session.commit()
+        first_p1 = db.session.execute(
+            text("SELECT min(id) FROM cart_item WHERE user_id = :u AND product_id = :p"),
+            {"u": user_id, "p": p1}).scalar()
+
+        upgrade(directory=MIGRATIONS)
+
+        rows = db.session.execute(
+            text("SELECT id, product_id, qty FROM cart_item WHERE user_id = :u ORDER BY product_id"),
+            {"u": user_id}).all()
+        # qty NULL counts as 1, the oldest row survives
+        assert [(r.product_id, r.qty) for r in rows] == [(p1, 1 + 2 + 1), (p2, 1 + 4), (p3, 1)]
+        assert rows[0].id == first_p1
+        index = db.session.execute(
+            text("SELECT \"unique\" FROM pragma_index_list('cart_item') "
+                 "WHERE name = 'ix_cart_item_user_id_product_id'")).scalar()
+        assert index == 1
@@ -0,0 +1,61 @@
+import os
+
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Product
+from app.utils.catalog_cache import catalog_cache, invalidate_catalog
+
+from conftest import auth
+
+
+def test_forked_worker_starts_empty_and_hands_out_the_same_etags():
+    token = catalog_cache.observe(7)
+    catalog_cache.set(("products",), b"[]", token)
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # like a `flask serve` worker forked from the preloaded app
+        try:
+            entries = catalog_cache.stats()["entries"]
+            os.write(w, f"{catalog_cache.etag_for(catalog_cache.observe(7))} {entries}".encode())
+        finally:
+            os._exit(0)
+    os.close(w)
+    with os.fdopen(r) as f:
+        child_etag, entries = f.read().split()
+    os.waitpid(pid, 0)
+
+    assert (child_etag, entries) == (catalog_cache.etag_for(token), "0")
+    assert catalog_cache.get(("products",), token) == b"[]"
+
+
+def _products(client, etag=None):
+    return client.get("/api/products", headers={"If-None-Match": etag} if etag else {})
+
+
+def test_write_from_another_worker_is_seen_on_the_next_read(app, client, shop):
+    first = _products(client)
+    etag = first.get_etag()[0]
+    assert _products(client, etag).status_code == 304
+
+    with app.app_context():  # another worker: nothing in this process is told
+        db.session.execute(update(Product).where(Product.id == shop["product_ids"][0]).values(stock=42))
+        invalidate_catalog()
+        db.session.commit()
+
+    resp = _products(client, etag)
+    assert resp.status_code == 200
+    assert resp.get_etag()[0] != etag
+    stock = {p["id"]: p["stock"] for p in resp.get_json()["items"]}
+    assert stock[shop["product_ids"][0]] == 42
+
+
+def test_checkout_invalidates_stock(app, client, shop):
+    etag = _products(client).get_etag()[0]
+    resp = client.post("/api/orders/checkout", headers=auth(shop["customer"]))
+    assert resp.status_code == 201
+
+    resp = _products(client, etag)
+    assert resp.status_code == 200
+    stock = {p["id"]: p["stock"] for p in resp.get_json()["items"]}
+    assert [stock[pid] for pid in shop["product_ids"][:3]] == [4, 4, 4]
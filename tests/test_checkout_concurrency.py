@@ -0,0 +1,61 @@
+import threading
+from collections import Counter
+
+import pytest
+
+from app.extensions import db
+from app.models import CartItem, Category, Order, OrderItem, Product, User
+
+from conftest import auth, token_for
+
+
+def _customers_with_cart(app, n, stock, qty):
+    """One product with `stock` units and `n` customers each holding `qty` of it."""
+    with app.app_context():
+        category = Category(name="Limited")
+        db.session.add(category)
+        db.session.flush()
+        product = Product(name="Last units", description="", price=9.5, stock=stock, category_id=category.id)
+        users = [User(full_name=f"C{i}", email=f"c{i}@example.com", role="customer", password_hash="x")
+                 for i in range(n)]
+        db.session.add(product)
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all(CartItem(user_id=u.id, product_id=product.id, qty=qty) for u in users)
+        db.session.commit()
+        return product.id, [token_for(app, u) for u in users]
+
+
+def _checkout_all(app, tokens):
+    barrier = threading.Barrier(len(tokens))
+    statuses = []
+
+    def checkout(token):
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(client.post("/api/orders/checkout", headers=auth(token)).status_code)
+
+    threads = [threading.Thread(target=checkout, args=(t,)) for t in tokens]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return Counter(statuses)
+
+
+@pytest.mark.parametrize("stock,qty", [(5, 1), (7, 2)])
+def test_parallel_checkouts_never_oversell(app, stock, qty):
+    n = 16
+    product_id, tokens = _customers_with_cart(app, n, stock=stock, qty=qty)
+
+    statuses = _checkout_all(app, tokens)
+
+    winners = stock // qty
+    assert statuses == {201: winners, 409: n - winners}
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock == stock - winners * qty
+        assert db.session.query(Order).count() == winners
+        sold = db.session.query(db.func.sum(OrderItem.qty)).filter_by(product_id=product_id).scalar()
+        assert sold == winners * qty
+        # losers keep their cart, winners' carts are cleared
+        assert db.session.query(CartItem).count() == n - winners
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+from flask import has_request_context
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Job
+from app.utils.jobs import JobWorker, jobs
+
+calls = []
+
+
+@jobs.task("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@jobs.task("tests.record_context")
+def record_context():
+    calls.append("in request" if has_request_context() else "after response")
+
+
+def _statuses(app):
+    with app.app_context():
+        return [s for (s,) in db.session.query(Job.status).order_by(Job.id)]
+
+
+def test_jobs_run_inline_in_testing_mode_by_default(app):
+    calls.clear()
+    with app.test_request_context():
+        record.enqueue(value=1)
+        db.session.commit()
+    assert calls == [1]
+    assert _statuses(app) == []
+
+
+def test_queued_jobs_without_a_worker_are_reported(app, monkeypatch):
+    monkeypatch.setattr(jobs, "eager", False)
+    calls.clear()
+    with app.test_request_context():
+        record.enqueue(value=2)
+        db.session.commit()
+        assert calls == []
+        assert jobs.warn_if_unattended() == 1  # no heartbeat yet
+
+        jobs.heartbeat("other-host:1", datetime.utcnow())
+        assert [w.worker_id for w in jobs.live_workers()] == ["other-host:1"]
+        assert jobs.warn_if_unattended() == 0
+        jobs.forget_worker("other-host:1")
+
+
+def test_worker_runs_the_job_and_clears_its_heartbeat(app, monkeypatch):
+    monkeypatch.setattr(jobs, "eager", False)
+    calls.clear()
+    with app.test_request_context():
+        record.enqueue(value=3)
+        db.session.commit()
+
+    processed = JobWorker(app, jobs, threads=2, poll_interval=0.01).run(once=True)
+
+    assert calls == [3]
+    assert processed["done"] == 1
+    assert _statuses(app) == ["done"]
+    with app.app_context():
+        assert jobs.live_workers() == []
+
+
+def test_eager_jobs_wait_for_the_commit(app):
+    calls.clear()
+    with app.test_request_context():
+        record.enqueue(value="rolled back")
+        db.session.rollback()
+        record.enqueue(value="committed")
+        assert calls == []
+        db.session.commit()
+    assert calls == ["committed"]
+
+
+def test_eager_jobs_run_after_the_response(app):
+    calls.clear()
+
+    @app.post("/_test/enqueue")
+    def enqueue_view():
+        record_context.enqueue()
+        db.session.commit()
+        calls.append("handler")
+        return {}
+
+    with app.test_client().post("/_test/enqueue") as resp:
+        assert resp.status_code == 200
+        assert calls == ["handler"]
+    assert calls == ["handler", "after response"]  # run when the server closes the response
+
+
+def test_job_whose_worker_died_on_the_last_attempt_is_dead(app, monkeypatch):
+    monkeypatch.setattr(jobs, "eager", False)
+    with app.test_request_context():
+        record.enqueue(value=4)
+        db.session.execute(update(Job).values(max_attempts=2))
+        db.session.commit()
+
+        # the worker holding each lease crashes: visibility 0 lets the lease lapse at once
+        assert [j.attempts for j in jobs.claim(10, 0, "crashed:1")] == [1]
+        assert [j.attempts for j in jobs.claim(10, 0, "crashed:2")] == [2]
+        assert jobs.claim(10, 0, "crashed:3") == []
+        job = db.session.query(Job).one()
+        assert (job.status, job.attempts, job.locked_by) == ("dead", 2, None)
+        assert "lease expired" in job.last_error
@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+from app.utils.metrics import Metrics, metrics
+
+
+def _health_requests(snap):
+    return snap["requests"].get("app|health|GET|200", 0)
+
+
+def test_thread_per_request_reuses_shards(client):
+    before = _health_requests(metrics.snapshot())
+    shards = len(metrics._shards)
+
+    def one_request():
+        assert client.get("/health").status_code == 200
+
+    for _ in range(300):  # like werkzeug's threaded server: a new thread per request
+        t = threading.Thread(target=one_request)
+        t.start()
+        t.join()
+
+    snap = metrics.snapshot()
+    assert _health_requests(snap) - before == 300
+    assert len(metrics._shards) <= shards + 2  # this thread's, one handed from thread to thread
+    assert snap["latency"]["app|health"][-1] >= 300
+
+
+def test_concurrent_threads_get_their_own_shards(client):
+    before = _health_requests(metrics.snapshot())
+    barrier = threading.Barrier(8)
+
+    def requests():
+        barrier.wait()
+        for _ in range(25):
+            client.get("/health")
+
+    threads = [threading.Thread(target=requests) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert _health_requests(metrics.snapshot()) - before == 200
+
+
+def _dead_pid():
+    pid = 2 ** 22 - 1
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid -= 1
+
+
+def _shard_file(tmp_path, pid, started, n):
+    snap = Metrics().snapshot()
+    snap.update(pid=pid, requests={"app|health|GET|200": n}, in_flight=3)
+    (tmp_path / f"metrics-{pid}-{started}.json").write_text(json.dumps(snap))
+
+
+def _health_total(m):
+    line = next(l for l in m.render().splitlines() if l.startswith("http_requests_total") and "health" in l)
+    return int(line.rsplit(" ", 1)[1])
+
+
+def test_dead_workers_are_folded_into_the_retired_file(tmp_path):
+    m = Metrics()
+    m.multiproc_dir = str(tmp_path)
+    m.flush_interval = 3600
+    pid = _dead_pid()
+    _shard_file(tmp_path, pid, 1000, 5)
+    _shard_file(tmp_path, pid, 2000, 7)  # the same pid, recycled: counted separately
+
+    assert _health_total(m) == 12
+    assert _health_total(m) == 12  # folded once, not on every scrape
+    names = sorted(p.name for p in tmp_path.iterdir() if p.suffix == ".json")
+    assert names == [f"metrics-{os.getpid()}-{m._started_ms}.json", "metrics-retired.json"]
+    assert "http_requests_in_flight 0" in m.render()
+
+
+def test_retire_folds_this_process_and_stops_flushing(tmp_path):
+    m = Metrics()
+    m.multiproc_dir = str(tmp_path)
+    m.flush_interval = 3600
+    m.collect()
+    m.retire()
+    m._write_snapshot()  # a flusher tick after retire() must not bring the file back
+    assert sorted(p.name for p in tmp_path.iterdir() if p.suffix == ".json") == ["metrics-retired.json"]
@@ -0,0 +1,58 @@
+import pytest
+
+from app.extensions import db
+from app.models import CartItem, Order, Product
+from app.utils.order_codes import order_code_seq
+
+from conftest import auth
+
+
+def _stock(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock
+
+
+def _set_status(client, shop, order_id, status):
+    return client.put(f"/api/admin/orders/{order_id}/status", json={"status": status}, headers=auth(shop["admin"]))
+
+
+def _first_order_id(app):
+    with app.app_context():
+        return db.session.query(Order.id).order_by(Order.id).first()[0]
+
+
+@pytest.mark.parametrize("shipped", ["shipped", "delivered"])
+def test_shipped_orders_cannot_be_canceled(app, client, shop, shipped):
+    order_id, product_id = _first_order_id(app), shop["product_ids"][0]
+    assert _set_status(client, shop, order_id, shipped).status_code == 200
+
+    resp = _set_status(client, shop, order_id, "canceled")
+    assert resp.status_code == 409
+    assert _stock(app, product_id) == 5
+    with app.app_context():
+        assert db.session.get(Order, order_id).status == shipped
+
+
+def test_cancel_of_a_paid_order_restocks(app, client, shop):
+    order_id, product_id = _first_order_id(app), shop["product_ids"][0]
+    assert _set_status(client, shop, order_id, "paid").status_code == 200
+    assert _set_status(client, shop, order_id, "canceled").status_code == 200
+    assert _stock(app, product_id) == 6
+
+
+def test_rejected_checkouts_use_no_order_code(app, client, shop):
+    headers = auth(shop["customer"])
+    with app.app_context():
+        db.session.query(Product).filter(Product.id == shop["product_ids"][0]).update({"stock": 0})
+        db.session.commit()
+    before = (order_code_seq._next, order_code_seq._end)
+
+    resp = client.post("/api/orders/checkout", headers=headers)
+    assert resp.status_code == 409
+    assert [i["product_id"] for i in resp.get_json()["items"]] == [shop["product_ids"][0]]
+    with app.app_context():
+        db.session.query(CartItem).delete()
+        db.session.commit()
+    assert client.post("/api/orders/checkout", headers=headers).status_code == 400
+
+    assert (order_code_seq._next, order_code_seq._end) == before
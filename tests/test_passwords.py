@@ -0,0 +1,42 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models import User
+from app.utils.passwords import PasswordHasher
+
+
+@pytest.mark.parametrize("method,stored,outdated", [
+    ("scrypt", "scrypt:32768:8:1", False),
+    ("scrypt:32768:8:1", "scrypt:32768:8:1", False),
+    ("scrypt:16384:8:1", "scrypt:32768:8:1", True),
+    ("pbkdf2", "pbkdf2:sha256:600000", False),
+    ("pbkdf2:sha256", "pbkdf2:sha256:600000", False),
+    ("pbkdf2:sha256:1000", "pbkdf2:sha256:600000", True),
+    ("pbkdf2:sha512:1000", "pbkdf2:sha256:1000", True),
+    ("scrypt", "pbkdf2:sha256:600000", True),
+])
+def test_needs_rehash_fills_in_werkzeug_defaults(method, stored, outdated):
+    assert PasswordHasher(method=method).needs_rehash(f"{stored}$salt$hash") is outdated
+
+
+def _login(client, email, password):
+    return client.post("/api/auth/login", json={"email": email, "password": password})
+
+
+def test_login_upgrades_an_outdated_hash_once(app, client):
+    with app.app_context():
+        db.session.add(User(full_name="Old", email="old@example.com", role="customer",
+                            password_hash=generate_password_hash("pw", "pbkdf2:sha256:500")))
+        db.session.commit()
+
+    def stored():
+        with app.app_context():
+            return db.session.query(User.password_hash).filter_by(email="old@example.com").scalar()
+
+    assert _login(client, "old@example.com", "pw").status_code == 200
+    upgraded = stored()
+    assert upgraded.startswith("pbkdf2:sha256:1000$")  # the test config's method
+    assert _login(client, "old@example.com", "pw").status_code == 200
+    assert stored() == upgraded  # current params: no second rehash
+    assert _login(client, "old@example.com", "nope").status_code == 401
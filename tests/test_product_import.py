@@ -0,0 +1,88 @@
+import json
+
+from app.extensions import db
+from app.models import Product
+
+from conftest import auth
+
+HEADER = b"name,price,stock,category_id\n"
+
+
+def _rows(n, start=0):
+    return b"".join(b"Imported %d,1.5,3,1\n" % i for i in range(start, start + n))
+
+
+def _import(client, shop, body, content_type="text/csv"):
+    return client.post("/api/admin/products/import", data=body,
+                       headers={**auth(shop["admin"]), "Content-Type": content_type})
+
+
+def _imported(app):
+    with app.app_context():
+        return db.session.query(Product).filter(Product.name.like("Imported %")).count()
+
+
+def test_import_reports_row_errors(app, client, shop):
+    body = HEADER + _rows(3) + b"Broken,abc,1,1\nNo category,1,1,999\n"
+    resp = _import(client, shop, body)
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["inserted"] == 3 and data["error_count"] == 2
+    assert [e["row"] for e in data["errors"]] == [4, 5]
+
+
+def test_invalid_utf8_mid_stream_is_a_400_with_the_committed_count(app, client, shop):
+    app.config["PRODUCT_IMPORT_CHUNK_SIZE"] = 50
+    # well past the text decoder's read size, so chunks commit before the bad byte is read
+    body = HEADER + _rows(1000) + b"Bad \xff\xfe,1,1,1\n" + _rows(10, start=1000)
+    resp = _import(client, shop, body)
+    assert resp.status_code == 400
+    data = resp.get_json()
+    assert data["inserted"] == _imported(app) > 0
+    assert data["failed_at_row"] == data["inserted"] + 1
+    assert data["errors"][-1] == {"row": data["failed_at_row"], "error": "body is not valid UTF-8"}
+
+
+def test_malformed_csv_mid_stream_is_a_400(app, client, shop):
+    huge = b'"' + b"x" * 200_000 + b'"'  # past csv.field_size_limit()
+    body = HEADER + _rows(5) + huge + b",1,1,1\n"
+    resp = _import(client, shop, body)
+    assert resp.status_code == 400
+    data = resp.get_json()
+    assert data["inserted"] == _imported(app) == 5
+    assert data["failed_at_row"] == 6
+    assert data["errors"][-1]["error"].startswith("malformed CSV")
+
+
+def test_invalid_utf8_in_ndjson(app, client, shop):
+    body = b'{"name": "Imported 0", "price": 1, "stock": 1, "category_id": 1}\n\xff\n'
+    resp = _import(client, shop, body, "application/x-ndjson")
+    assert resp.status_code == 400
+    assert resp.get_json()["inserted"] == _imported(app)
+
+
+def test_bad_field_types_and_values_are_row_errors(app, client, shop):
+    good = {"name": "Imported 0", "price": 1, "stock": 1, "category_id": 1}
+    bad = [
+        {**good, "name": 5},
+        {**good, "description": ["x"]},
+        {**good, "image_url": {"src": "a.png"}},
+        {**good, "price": "NaN"},
+        {**good, "price": "inf"},
+        {**good, "stock": -1},
+        {**good, "stock": "1e999"},
+    ]
+    lines = [json.dumps(r) for r in bad] + ['{"name": "Imported 1", "price": 1e999, "stock": 1, "category_id": 1}',
+                                            json.dumps(good)]
+    resp = _import(client, shop, "\n".join(lines).encode(), "application/x-ndjson")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["inserted"] == _imported(app) == 1
+    assert [e["row"] for e in data["errors"]] == list(range(1, 9))
+    assert data["errors"][0]["error"] == "name must be a string"
+    assert data["errors"][5]["error"] == "stock must be >= 0"
+
+
+def test_plain_json_body_is_unsupported(client, shop):
+    resp = _import(client, shop, b'[{"name": "Imported 0"}]', "application/json")
+    assert resp.status_code == 415
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from app.routes import admin
+
+from conftest import auth
+
+
+def _profiled(client, token, mode):
+    return client.get("/api/admin/orders", headers={**auth(token), "X-Profile": mode})
+
+
+def _profile(client, shop, mode):
+    resp = _profiled(client, shop["admin"], mode)
+    assert resp.status_code == 200
+    profile_id = resp.headers["X-Profile-Id"]
+    resp = client.get(f"/api/admin/profiles/{profile_id}", headers=auth(shop["admin"]))
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_only_admins_can_ask_for_a_profile(client, shop):
+    resp = _profiled(client, shop["customer"], "trace")
+    assert resp.status_code == 403
+    assert "X-Profile-Id" not in resp.headers
+    resp = client.get("/api/products", headers={**auth(shop["customer"]), "X-Profile": "trace"})
+    assert resp.status_code == 200
+    assert "X-Profile-Id" not in resp.headers
+    assert client.get("/api/admin/profiles", headers=auth(shop["admin"])).get_json() == []
+
+
+@pytest.mark.parametrize("mode", ["sample", "trace"])
+def test_modes_record_stacks_and_sql(client, shop, monkeypatch, mode):
+    order_dicts = admin.order_dicts
+
+    def slow_order_dicts(*args, **kwargs):
+        time.sleep(0.02)  # long enough for the sampler to catch the view
+        return order_dicts(*args, **kwargs)
+
+    monkeypatch.setattr(admin, "order_dicts", slow_order_dicts)
+    data = _profile(client, shop, mode)
+
+    assert (data["mode"], data["trigger"], data["endpoint"]) == (mode, "header", "admin.all_orders")
+    assert any("all_orders (admin.py" in stack for stack, _ in data["stacks"])
+    assert data["sql_count"] == len(data["sql"]) >= 1
+    assert any('FROM "order"' in s["statement"] for s in data["sql"])
+
+    listed = client.get("/api/admin/profiles", headers=auth(shop["admin"])).get_json()
+    assert [p["id"] for p in listed] == [data["id"]]
+
+
+def test_collapsed_and_speedscope_downloads(client, shop):
+    data = _profile(client, shop, "trace")
+    url, headers = f"/api/admin/profiles/{data['id']}", auth(shop["admin"])
+
+    resp = client.get(url, query_string={"format": "collapsed"}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    assert resp.headers["Content-Disposition"].endswith(f"profile-{data['id']}.folded")
+    lines = resp.get_data(as_text=True).splitlines()
+    assert len(lines) == len(data["stacks"]) + len(data["sql"])
+    for line in lines:
+        stack, weight = line.rsplit(" ", 1)
+        assert stack and int(weight) >= 0
+    assert any(line.startswith("SQL;SELECT") for line in lines)
+
+    resp = client.get(url, query_string={"format": "speedscope"}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["Content-Disposition"].endswith(f"profile-{data['id']}.speedscope.json")
+    doc = resp.get_json()
+    stacks, sql = doc["profiles"]
+    assert len(stacks["samples"]) == len(data["stacks"])
+    assert len(sql["samples"]) == len(data["sql"])
+    names = [f["name"] for f in doc["shared"]["frames"]]
+    assert all(0 <= i < len(names) for sample in stacks["samples"] + sql["samples"] for i in sample)
+
+    assert client.get(url, query_string={"format": "pdf"}, headers=headers).status_code == 400
+    assert client.get("/api/admin/profiles/nope", headers=headers).status_code == 404
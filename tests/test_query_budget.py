@@ -0,0 +1,57 @@
+import pytest
+
+from app.utils.query_counter import count_queries, max_queries
+
+from conftest import auth
+
+# (url, token) for list/detail endpoints that used to lazy-load per row
+ENDPOINTS = [
+    ("/api/products?limit=20", None),
+    ("/api/products?limit=2", None),
+    ("/api/cart", "customer"),
+    ("/api/orders/list", "customer"),
+    ("/api/admin/orders", "admin"),
+    ("/api/admin/users", "admin"),
+    ("/api/admin/categories", "admin"),
+]
+
+
+def _budget(app, url):
+    adapter = app.url_map.bind("localhost")
+    endpoint, _ = adapter.match(url.split("?")[0])
+    return app.view_functions[endpoint]._query_budget
+
+
+@pytest.mark.parametrize("url,who", ENDPOINTS)
+def test_endpoint_stays_within_query_budget(app, client, shop, url, who):
+    headers = auth(shop[who]) if who else {}
+    budget = _budget(app, url)
+    # strict mode also raises from after_request if the budget is exceeded
+    with max_queries(budget) as statements:
+        resp = client.get(url, headers=headers)
+    assert resp.status_code == 200, resp.get_json()
+    assert int(resp.headers["X-Query-Count"]) == len(statements)
+
+
+def test_query_count_does_not_grow_with_rows(app, client, shop):
+    """One more order (with items) must not add a statement to the orders list."""
+    headers = auth(shop["customer"])
+    with count_queries() as before:
+        client.get("/api/orders/list", headers=headers)
+    client.post("/api/cart/add", json={"product_id": shop["product_ids"][4], "qty": 1}, headers=headers)
+    assert client.post("/api/orders/checkout", headers=headers).status_code == 201
+    with count_queries() as after:
+        resp = client.get("/api/orders/list", headers=headers)
+    assert len(resp.get_json()) == 4
+    assert len(after) == len(before)
+
+
+def test_strict_mode_fails_a_view_over_budget(app, client, shop):
+    view = app.view_functions["cart.get_cart"]
+    saved = view._query_budget
+    view._query_budget = 0
+    try:
+        with pytest.raises(AssertionError, match="budget 0"):
+            client.get("/api/cart", headers=auth(shop["customer"]))
+    finally:
+        view._query_budget = saved
@@ -0,0 +1,15 @@
+from app.seed import seed
+from app.utils import datagen
+from app.utils.query_plans import check_query_plans
+
+
+def test_no_full_scans_on_seed_bulk_data(app):
+    # same shape as `flask seed-bulk --users 2000 --products 3000 --orders 20000`:
+    # the heaviest customer has ~1000 orders, enough to flip SQLite's plan
+    seed(app)
+    with app.app_context():
+        datagen.generate(users=2000, products=3000, orders=20000, progress=lambda *a: None)
+
+    reports = check_query_plans(app)
+    assert reports
+    assert [(r.label, r.scans) for r in reports if r.scans] == []
@@ -0,0 +1,29 @@
+import logging
+
+from flask_jwt_extended import decode_token
+
+from app import create_app
+from app.config import Config
+from app.utils.revocation import revocation_list
+
+from conftest import auth
+
+
+def test_logout_revokes_the_token(client, shop):
+    headers = auth(shop["customer"])
+    assert client.get("/api/cart", headers=headers).status_code == 200
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/cart", headers=headers).status_code == 401
+
+
+def test_new_app_starts_from_its_own_unmigrated_database_quietly(app, client, shop, tmp_path, monkeypatch, caplog):
+    client.post("/api/auth/logout", headers=auth(shop["customer"]))
+    with app.app_context():
+        jti = decode_token(shop["customer"], allow_expired=True)["jti"]
+    assert revocation_list.is_revoked(jti)
+
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'empty.db'}")
+    with caplog.at_level(logging.WARNING, logger="app.utils.revocation"):
+        create_app()
+    assert not caplog.records  # no "no such table: revoked_token" before `flask db upgrade`
+    assert not revocation_list.is_revoked(jti)
@@ -0,0 +1,87 @@
+import shutil
+
+from flask_migrate import migrate
+
+from app.extensions import db
+from app.models import Category, Product
+
+from conftest import MIGRATIONS, auth
+
+
+def _search(client, q, **params):
+    resp = client.get("/api/products/search", query_string={"q": q, **params})
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def _names(client, q):
+    return [p["name"] for p in _search(client, q)["items"]]
+
+
+def _add_products(app, *products):
+    with app.app_context():
+        category = Category(name="Audio")
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all(Product(name=name, description=description, price=1, stock=1,
+                                   category_id=category.id) for name, description in products)
+        db.session.commit()
+
+
+def test_name_matches_rank_above_description_matches(app, client):
+    _add_products(
+        app,
+        ("Studio Monitor", "pairs well with any headphone amp"),
+        ("Wireless Headphones", "closed back"),
+        ("Cable", "for headphones and speakers"),
+    )
+    assert _names(client, "headphone")[0] == "Wireless Headphones"
+    assert _names(client, "wire head") == ["Wireless Headphones"]  # every word is a prefix term
+    assert _names(client, '"head*') == _names(client, "head")  # FTS5 syntax can't leak in
+
+
+def test_cursor_pages_cover_every_match_once(app, client):
+    _add_products(app, *((f"Speaker {i}", "") for i in range(7)))
+    seen, after, pages = [], None, 0
+    while True:
+        page = _search(client, "speaker", limit=3, **({"after": after} if after else {}))
+        seen += [p["id"] for p in page["items"]]
+        pages += 1
+        after = page["next_cursor"]
+        if after is None:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 7
+
+
+def test_bad_requests(client):
+    assert client.get("/api/products/search", query_string={"q": "  !? "}).status_code == 400
+    assert client.get("/api/products/search", query_string={"q": "x", "after": "nope"}).status_code == 400
+
+
+def test_triggers_follow_updates_and_deletes(client, shop):
+    headers = auth(shop["admin"])
+    pid, other = shop["product_ids"][3], shop["product_ids"][4]
+    assert _names(client, "tablet") == []
+
+    resp = client.put(f"/api/admin/products/{pid}", json={"name": "Tablet Pro"}, headers=headers)
+    assert resp.status_code == 200
+    assert _names(client, "tablet") == ["Tablet Pro"]
+    assert "Product 4" not in _names(client, "product")
+
+    client.put(f"/api/admin/products/{other}", json={"description": "a tablet stand"}, headers=headers)
+    assert _names(client, "tablet") == ["Tablet Pro", "Product 5"]
+
+    assert client.delete(f"/api/admin/products/{pid}", headers=headers).status_code == 200
+    assert _names(client, "tablet") == ["Product 5"]
+
+
+def test_autogenerate_leaves_the_fts_tables_alone(app, tmp_path):
+    directory = tmp_path / "migrations"
+    shutil.copytree(MIGRATIONS, directory, ignore=shutil.ignore_patterns("__pycache__"))
+    before = set((directory / "versions").iterdir())
+    with app.app_context():
+        migrate(directory=str(directory), message="probe")
+    new = set((directory / "versions").iterdir()) - before
+    script = "".join(path.read_text() for path in new)
+    assert "op." not in script  # no drop_table for product_fts or its shadow tables
@@ -0,0 +1,107 @@
+from sqlalchemy import text
+
+from app import create_app
+from app.extensions import db
+from app.models import Product
+from app.utils.query_counter import count_queries
+from app.utils.suggest import suggest_index
+
+from conftest import auth
+
+
+def _names(client, prefix):
+    resp = client.get("/api/products/suggest", query_string={"prefix": prefix})
+    assert resp.status_code == 200
+    return [s["name"] for s in resp.get_json()]
+
+
+def test_create_app_does_not_build_the_index(app):
+    with count_queries() as statements:
+        create_app()
+    assert not [s for s in statements if "order_item" in s]
+
+
+def test_built_on_first_request_and_updated_by_admin_writes(app, client, shop):
+    assert not suggest_index.ready
+    assert _names(client, "prod") == [f"Product {i}" for i in (2, 1, 5, 4, 3)]  # units sold, then id
+    assert suggest_index.ready
+
+    resp = client.post("/api/admin/products", headers=auth(shop["admin"]),
+                       json={"name": "Prodigy Drone", "price": 5, "stock": 1, "category_id": 1})
+    assert resp.status_code == 201
+    assert "Prodigy Drone" in _names(client, "drone")
+    # this worker applied its own write and took the bumped version: no rebuild
+    with app.app_context():
+        assert suggest_index.refresh() is False
+
+    pid = resp.get_json()["id"]
+    resp = client.put(f"/api/admin/products/{pid}", headers=auth(shop["admin"]), json={"name": "Prodigy Kite"})
+    assert resp.status_code == 200
+    assert _names(client, "drone") == []
+    assert _names(client, "kite") == ["Prodigy Kite"]
+    assert client.delete(f"/api/admin/products/{pid}", headers=auth(shop["admin"])).status_code == 200
+    assert _names(client, "prodigy") == []
+    with app.app_context():
+        assert suggest_index.refresh() is False
+
+
+def test_local_write_after_another_workers_write_still_rebuilds(app, client, shop):
+    _names(client, "prod")
+    with app.app_context():  # another worker
+        db.session.get(Product, shop["product_ids"][0]).name = "Zebra Lamp"
+        suggest_index.bump_version()
+        db.session.commit()
+
+    resp = client.post("/api/admin/products", headers=auth(shop["admin"]),
+                       json={"name": "Yak Rug", "price": 5, "stock": 1, "category_id": 1})
+    assert resp.status_code == 201
+    assert _names(client, "yak") == ["Yak Rug"]
+    with app.app_context():
+        assert suggest_index.refresh() is True  # the version skipped one: not ours alone
+    assert _names(client, "zebra") == ["Zebra Lamp"]
+
+
+def test_refresh_picks_up_writes_from_other_workers(app, client, shop):
+    _names(client, "prod")
+    with app.app_context():
+        assert suggest_index.refresh() is False  # nothing changed
+
+    # another worker: renames a product and bumps the version in its transaction
+    with app.app_context():
+        db.session.get(Product, shop["product_ids"][0]).name = "Zebra Lamp"
+        suggest_index.bump_version()
+        db.session.commit()
+    assert _names(client, "zebra") == []  # not seen until the refresher runs
+
+    with app.app_context():
+        assert suggest_index.refresh() is True
+    assert _names(client, "zebra") == ["Zebra Lamp"]
+    assert "Product 1" not in _names(client, "product")
+
+
+def test_bulk_import_and_seed_bump_the_version(app, client, shop):
+    _names(client, "prod")
+    with app.app_context():
+        before = db.session.execute(
+            text("SELECT version FROM cache_version WHERE name = 'suggest_index'")).scalar() or 0
+    resp = client.post("/api/admin/products/import", headers={**auth(shop["admin"]), "Content-Type": "text/csv"},
+                       data="name,price,stock,category_id\nQuartz Clock,3,1,1\n")
+    assert resp.status_code == 200 and resp.get_json()["inserted"] == 1
+    assert _names(client, "quartz") == ["Quartz Clock"]
+    with app.app_context():
+        after = db.session.execute(
+            text("SELECT version FROM cache_version WHERE name = 'suggest_index'")).scalar()
+    assert after > before
+
+
+def test_writes_edit_the_key_list_in_place(app, shop):
+    with app.app_context():
+        suggest_index.rebuild()
+    keys = suggest_index._snap.keys
+    suggest_index.upsert(10**6, "Blue Whale Poster")
+    suggest_index.upsert(10**6, "Blue Shark Poster")
+    assert suggest_index._snap.keys is keys and keys == sorted(keys)
+    assert [k for k, pid in keys if pid == 10**6] == ["blue shark poster", "poster", "shark poster"]
+    suggest_index.remove(10**6)
+    assert all(pid != 10**6 for _, pid in keys)
+    assert suggest_index.suggest("blue") == []